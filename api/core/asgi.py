@@ -12,5 +12,15 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Persistent connections leak under ASGI; settings fall back to per-request
+# connections unless DB_CONN_MODE=pool (see core/database.py)
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
 application = get_asgi_application()
+
+# Build URL tables and serializer fields before the first request (core/startup.py)
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_START:
+    from core.startup import warm_up
+    warm_up()
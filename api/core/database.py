@@ -0,0 +1,52 @@
+"""
+Connection management modes for DATABASES['default'] (DB_CONN_MODE):
+
+- close:      open a connection per request and close it afterwards
+              (Django's default; every request pays the connect cost)
+- persistent: keep each worker thread's connection open for up to
+              DB_CONN_MAX_AGE seconds, checked with a cheap query before it is
+              reused after an idle period (CONN_HEALTH_CHECKS)
+- pool:       psycopg 3 connection pool shared by the process, sized with
+              DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE; needs `psycopg[pool]`
+
+Persistent connections are tied to the thread that opened them. Under ASGI,
+sync code runs on a fresh thread per request, so persistent connections would
+pile up instead of being reused: core/asgi.py marks the process and
+`persistent` then falls back to `close`. Use `pool` for ASGI workers.
+"""
+from importlib.util import find_spec
+
+from django.core.exceptions import ImproperlyConfigured
+
+MODES = ('close', 'persistent', 'pool')
+
+
+def pool_available():
+    """Whether psycopg 3 and psycopg_pool are installed (Django's pool needs both)"""
+    return find_spec('psycopg') is not None and find_spec('psycopg_pool') is not None
+
+
+def connection_settings(mode, max_age=60, health_checks=True, pool_min_size=2, pool_max_size=10,
+                        pool_timeout=10, asgi=False):
+    """The DATABASES entry keys (CONN_MAX_AGE, CONN_HEALTH_CHECKS, OPTIONS) for a mode"""
+    if mode not in MODES:
+        raise ImproperlyConfigured(f'DB_CONN_MODE must be one of {", ".join(MODES)}, got "{mode}"')
+    if mode == 'persistent' and asgi:
+        mode = 'close'
+
+    if mode == 'persistent':
+        return {'CONN_MAX_AGE': max_age, 'CONN_HEALTH_CHECKS': health_checks, 'OPTIONS': {}}
+    if mode == 'pool':
+        if not pool_available():
+            raise ImproperlyConfigured(
+                'DB_CONN_MODE=pool needs psycopg 3 with its pool: pip install "psycopg[binary,pool]"'
+            )
+        if pool_min_size > pool_max_size:
+            raise ImproperlyConfigured('DB_POOL_MIN_SIZE must not exceed DB_POOL_MAX_SIZE')
+        # The pool hands out and checks connections itself; CONN_MAX_AGE must stay 0
+        return {
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': False,
+            'OPTIONS': {'pool': {'min_size': pool_min_size, 'max_size': pool_max_size, 'timeout': pool_timeout}},
+        }
+    return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}
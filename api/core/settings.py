@@ -2,6 +2,8 @@ from pathlib import Path
 from datetime import timedelta
 from decouple import config
 
+from .database import connection_settings
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = config('SECRET_KEY')
@@ -12,6 +14,17 @@ ALLOWED_HOSTS = []
 # Application definition
 # ------------------------------------------------------------------------------
 
+# API-only nodes (JWT clients, no admin site or browsable API) skip the
+# browser-facing apps and middleware, so workers start and serve faster.
+# Run the admin from a separate deployment with API_ONLY=False.
+API_ONLY = config('API_ONLY', default=False, cast=bool)
+BROWSER_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
 INSTALLED_APPS = [
     # Django core apps
     'django.contrib.admin',
@@ -31,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'lockers.metrics.MetricsMiddleware',  # First, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -41,6 +55,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BROWSER_APPS]
+    # DRF authenticates from the JWT and its views are CSRF-exempt
+    MIDDLEWARE = [name for name in MIDDLEWARE if name not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )]
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -52,14 +77,17 @@ TEMPLATES = [
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+            ] + ([] if API_ONLY else ['django.contrib.messages.context_processors.messages']),
         },
     },
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Build URL resolvers and serializers when a worker loads core.wsgi / core.asgi,
+# before it accepts traffic, instead of on its first requests (core/startup.py)
+WARMUP_ON_START = config('WARMUP_ON_START', default=True, cast=bool)
+
 # ------------------------------------------------------------------------------
 # Database (PostgreSQL)
 # ------------------------------------------------------------------------------
@@ -72,6 +100,17 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Connection reuse: close | persistent | pool (see core/database.py)
+        **connection_settings(
+            config('DB_CONN_MODE', default='persistent'),
+            max_age=config('DB_CONN_MAX_AGE', default=60, cast=int),
+            health_checks=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            pool_min_size=config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            pool_max_size=config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            pool_timeout=config('DB_POOL_TIMEOUT', default=10, cast=int),
+            # Set by core/asgi.py
+            asgi=config('DJANGO_ASGI', default=False, cast=bool),
+        ),
     }
 }
 
@@ -98,14 +137,78 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework
 # ------------------------------------------------------------------------------
 
+# Authorize requests from token claims plus a short-lived cache of the user's
+# status instead of loading the User row every time (lockers/authentication.py)
+JWT_CLAIMS_USER = config('JWT_CLAIMS_USER', default=True, cast=bool)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'lockers.authentication.ClaimsJWTAuthentication' if JWT_CLAIMS_USER
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        # Same output as JSONRenderer; faster for the list pages (see lockers/renderers.py)
+        'lockers.renderers.FastJSONRenderer',
+    ) + (() if API_ONLY else ('rest_framework.renderers.BrowsableAPIRenderer',)),
+}
+
+# List pages read values() rows and map them without DRF fields (lockers/fastread.py)
+FAST_READ_PATH = config('FAST_READ_PATH', default=True, cast=bool)
+
+# Default page size for the cursor-paginated list endpoints, and the
+# upper bound a client can request with ?page_size=
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Real-time event stream (GET /api/events/, needs the ASGI app)
+LOCKER_EVENTS_BACKEND = config('LOCKER_EVENTS_BACKEND', default='lockers.events.InProcessBackend')
+LOCKER_EVENTS_HEARTBEAT = config('LOCKER_EVENTS_HEARTBEAT', default=20, cast=int)  # seconds
+LOCKER_EVENTS_MAX_PENDING = config('LOCKER_EVENTS_MAX_PENDING', default=100, cast=int)  # per client
+
+# Cache for the unlock fast path (see lockers/unlock_cache.py) and user status
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='vaultkeeper'),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    }
 }
+UNLOCK_CACHE_ALIAS = 'default'
+UNLOCK_CACHE_TTL = config('UNLOCK_CACHE_TTL', default=30, cast=int)  # seconds
+USER_STATUS_CACHE_ALIAS = 'default'
+USER_STATUS_CACHE_TTL = config('USER_STATUS_CACHE_TTL', default=60, cast=int)  # seconds
+
+# Rows fetched per round trip by the reservation export (server-side cursor on PostgreSQL)
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Released reservations older than this (by updated_at) are moved to the
+# archive table by the archive_reservations command
+RESERVATION_ARCHIVE_DAYS = config('RESERVATION_ARCHIVE_DAYS', default=90, cast=int)
+
+# GET /api/sync/: rows per stream per response; how far back each poll
+# re-reads, to catch changes committed after a later one; how long tombstones
+# are kept (clients with older cursors get a fresh snapshot). Keep
+# SYNC_TOMBSTONE_DAYS below RESERVATION_ARCHIVE_DAYS: archive_reservations
+# refuses a shorter --days.
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_OVERLAP_SECONDS = config('SYNC_OVERLAP_SECONDS', default=5, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=30, cast=int)
+
+# Widest range GET /api/analytics/utilization/ will return
+ANALYTICS_MAX_DAYS = config('ANALYTICS_MAX_DAYS', default=31, cast=int)
+
+# Largest payload accepted by POST /api/lockers/bulk/
+LOCKER_BULK_MAX_ROWS = config('LOCKER_BULK_MAX_ROWS', default=10000, cast=int)
+
+# Request metrics (lockers/metrics.py): Server-Timing header and GET /metrics.
+# /metrics requires `Authorization: Bearer <METRICS_TOKEN>`; with no token
+# set it is only served when DEBUG is on.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
 
 # ------------------------------------------------------------------------------
 # JWT Settings
@@ -116,8 +219,11 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': False,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is written by lockers.authentication.record_login instead,
+    # at most once per LAST_LOGIN_INTERVAL per user
+    'UPDATE_LAST_LOGIN': False,
 }
+LAST_LOGIN_INTERVAL = config('LAST_LOGIN_INTERVAL', default=300, cast=int)  # seconds
 
 # ------------------------------------------------------------------------------
 # CORS Settings (for React frontend)
@@ -0,0 +1,164 @@
+"""
+Worker startup: warm-up and profiling.
+
+warm_up() runs from core/wsgi.py and core/asgi.py (WARMUP_ON_START) once the
+application is loaded, before the server hands the worker any traffic. It
+does the work Django and DRF otherwise leave to the first requests: compiling
+and indexing every URL pattern, importing the classes named in the DRF and
+simplejwt settings, and building the fields of every routed serializer. It
+needs no database, so it is safe before a fork (gunicorn --preload).
+
+`python -X importtime -m core.startup [--warm-up]` profiles a cold start in a
+fresh interpreter and prints the timings as JSON; the profile_startup command
+runs it and formats the result.
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def timed(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def routed_views(patterns=None):
+    """DRF view classes and their as_view() kwargs for every URL pattern"""
+    from django.urls import URLResolver, get_resolver
+
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            yield from routed_views(pattern.url_patterns)
+        elif hasattr(pattern.callback, 'cls'):
+            yield pattern.callback.cls, getattr(pattern.callback, 'initkwargs', {})
+
+
+def build_fields(serializer):
+    """Build a serializer's fields, and those of nested serializers"""
+    from rest_framework.serializers import BaseSerializer, ListSerializer
+
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    for field in getattr(serializer, 'fields', {}).values():
+        if isinstance(field, BaseSerializer):
+            build_fields(field)
+
+
+def warm_up():
+    """Prepare a loaded application for its first request; returns {step: seconds}"""
+    from django.urls import get_resolver
+    from django.utils import timezone
+    from rest_framework.settings import api_settings
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+    timings = {}
+    with timed(timings, 'urls'):
+        # Compiles every pattern's regex and builds the reverse lookup tables
+        get_resolver().reverse_dict
+
+    with timed(timings, 'api settings'):
+        for settings_object in (api_settings, jwt_settings):
+            for name in settings_object.import_strings:
+                getattr(settings_object, name)
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            authentication_class()
+        timezone.get_current_timezone()
+
+    with timed(timings, 'serializers'):
+        serializer_classes = set()
+        for view_class, initkwargs in routed_views():
+            serializer_class = initkwargs.get('serializer_class') or getattr(view_class, 'serializer_class', None)
+            if serializer_class is not None:
+                serializer_classes.add(serializer_class)
+        for serializer_class in serializer_classes:
+            build_fields(serializer_class())
+    return timings
+
+
+def call(application, path):
+    """One anonymous GET through the WSGI handler (answered 401: no database needed)"""
+    import io
+
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(b''),
+    }
+    statuses = []
+    response = application(environ, lambda status, response_headers: statuses.append(status))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+
+def profile(warm=False):
+    """
+    Time each startup phase of a fresh interpreter: settings, each app's
+    import / models / ready() (django.setup()), the request handler and its
+    middleware, then either warm_up() or nothing, then two requests.
+    """
+    from django.apps.config import AppConfig
+
+    phases = {}
+    apps = {}
+
+    # Wrap the three steps of apps.populate() to time them per app
+    create, import_models = AppConfig.create.__func__, AppConfig.import_models
+
+    def timed_create(cls, entry):
+        start = time.perf_counter()
+        app_config = create(cls, entry)
+        apps[app_config] = {'app': entry, 'import': time.perf_counter() - start}
+        ready = app_config.ready
+
+        def timed_ready():
+            start = time.perf_counter()
+            ready()
+            apps[app_config]['ready'] = time.perf_counter() - start
+        app_config.ready = timed_ready
+        return app_config
+
+    def timed_import_models(app_config):
+        start = time.perf_counter()
+        import_models(app_config)
+        apps[app_config]['models'] = time.perf_counter() - start
+
+    AppConfig.create = classmethod(timed_create)
+    AppConfig.import_models = timed_import_models
+
+    started = time.perf_counter()
+    with timed(phases, 'settings'):
+        from django.conf import settings
+        settings.INSTALLED_APPS
+    with timed(phases, 'apps'):
+        import django
+        django.setup(set_prefix=False)
+    AppConfig.create, AppConfig.import_models = classmethod(create), import_models
+
+    with timed(phases, 'handler'):
+        from django.core.handlers.wsgi import WSGIHandler
+        application = WSGIHandler()
+    if warm:
+        with timed(phases, 'warm_up'):
+            phases.update({f'warm_up: {step}': seconds for step, seconds in warm_up().items()})
+    phases['ready to serve'] = time.perf_counter() - started
+
+    # As the test runner does, so the requests below get past host validation
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    with timed(phases, 'first request'):
+        status = call(application, '/api/lockers/')
+    with timed(phases, 'second request'):
+        call(application, '/api/lockers/')
+    return {'phases': phases, 'apps': list(apps.values()), 'status': status}
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    result = profile(warm='--warm-up' in sys.argv)
+    print(json.dumps(result))
@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
+from lockers.metrics import metrics_view
 from lockers.views import register_user
 from lockers.serializers import MyTokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
@@ -11,9 +12,15 @@ class MyTokenObtainPairView(TokenObtainPairView):
 
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('api/async/', include('lockers.async_urls')),
     path('api/', include('lockers.urls')),
     path('api/auth/register/', register_user, name='register'),
     path('api/auth/login/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+]
+
+# Not installed with API_ONLY (see settings.py)
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))
\ No newline at end of file
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Build URL tables and serializer fields before the first request (core/startup.py)
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_START:
+    from core.startup import warm_up
+    warm_up()
@@ -1,5 +1,25 @@
 from django.contrib import admin
-from .models import Locker, Reservation
+from django.db import transaction
 
+from .models import ArchivedReservation, Locker, LocationUsage, Reservation, Site, Tombstone
+
+admin.site.register(Site)
 admin.site.register(Locker)
-admin.site.register(Reservation)
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    # Deletions leave tombstones for /api/sync/, as the API's do
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Reservation.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            Tombstone.objects.record_reservations(queryset)
+            queryset.delete()
+
+
+admin.site.register(ArchivedReservation)
+admin.site.register(LocationUsage)
+admin.site.register(Tombstone)
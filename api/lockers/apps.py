@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LockersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lockers'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import authentication, events, metrics, rollups, sync, unlock_cache  # noqa: F401
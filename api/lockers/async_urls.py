@@ -0,0 +1,21 @@
+from django.urls import path
+from . import async_views
+
+# Async read paths and unlock, mounted at /api/async/ (see async_views.py)
+# GET    /api/async/lockers/                 - List lockers
+# GET    /api/async/lockers/available/       - Get available lockers
+# GET    /api/async/lockers/<id>/            - Get locker details
+# POST   /api/async/lockers/unlock/          - Unlock locker with PIN
+# GET    /api/async/reservations/            - List reservations
+# GET    /api/async/reservations/active/     - Get active reservations
+# GET    /api/async/reservations/<id>/       - Get reservation details
+
+urlpatterns = [
+    path('lockers/', async_views.locker_list, name='async-locker-list'),
+    path('lockers/available/', async_views.locker_available, name='async-locker-available'),
+    path('lockers/unlock/', async_views.locker_unlock, name='async-locker-unlock'),
+    path('lockers/<int:pk>/', async_views.locker_detail, name='async-locker-detail'),
+    path('reservations/', async_views.reservation_list, name='async-reservation-list'),
+    path('reservations/active/', async_views.reservation_active, name='async-reservation-active'),
+    path('reservations/<int:pk>/', async_views.reservation_detail, name='async-reservation-detail'),
+]
@@ -0,0 +1,228 @@
+"""
+Async versions of the hot read paths and of unlock, for ASGI deployments.
+
+They answer the same URLs as the DRF viewsets under /api/async/ with the same
+JWT authentication, permission classes and response bodies, but run their
+queries through Django's async ORM, so a worker keeps serving other requests
+while one is waiting on the database. Lists use forward-only keyset pages
+(AsyncKeysetPagination). Locker lists take the same ?site=, ?status= and
+?search= filters, and reads the same ?fields= / ?expand= (fieldsets.py).
+Writes stay on the sync API.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import permissions, status
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, MethodNotAllowed, NotAuthenticated, NotFound,
+    ParseError, PermissionDenied
+)
+from rest_framework.renderers import JSONRenderer
+
+from . import unlock_cache
+from .authentication import AsyncJWTAuthentication, ClaimsJWTAuthentication
+from .fastread import locker_reader, reservation_reader
+from .fieldsets import ordering_columns, parse_selection
+from .models import Locker, Reservation
+from .pagination import AsyncKeysetPagination
+from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
+from .serializers import LockerSerializer, LockerUnlockSerializer, ReservationSerializer
+from .views import filter_locker_params
+
+authentication = ClaimsJWTAuthentication() if settings.JWT_CLAIMS_USER else AsyncJWTAuthentication()
+renderer = JSONRenderer()
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    # DRF's renderer, so the bytes match the sync API
+    return HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+
+
+def exception_response(request, exc):
+    """Mirror of rest_framework.views.exception_handler"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+    return response
+
+
+def async_api_view(methods, permission_classes):
+    """
+    Wrap an async view with what APIView does for the sync API:
+    method check, JWT authentication and permission checks.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+
+                result = await authentication.aauthenticate(request)
+                request.user, request.auth = result if result else (AnonymousUser(), None)
+
+                for permission_class in permission_classes:
+                    permission = permission_class()
+                    if not permission.has_permission(request, view):
+                        if not request.user.is_authenticated:
+                            raise NotAuthenticated()
+                        raise PermissionDenied(getattr(permission, 'message', None))
+
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return exception_response(request, exc)
+
+        # Token auth only, like the DRF views
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+def check_object_permissions(request, view, obj, permission_classes):
+    for permission_class in permission_classes:
+        if not permission_class().has_object_permission(request, view, obj):
+            raise PermissionDenied()
+
+
+async def get_object_or_404(queryset, **kwargs):
+    obj = await queryset.filter(**kwargs).afirst()
+    if obj is None:
+        raise NotFound(f'No {queryset.model._meta.object_name} matches the given query.')
+    return obj
+
+
+def select_fields(request, queryset, reader, columns=()):
+    """
+    ?fields= / ?expand= -> (queryset with only the selected columns plus
+    `columns`, serializer kwargs), as SparseFieldsetMixin does for the sync API
+    """
+    selection = parse_selection(request.GET, reader)
+    if selection is None:
+        return queryset, {}
+    return reader.subset(selection).narrow(queryset, columns), {'fields': selection}
+
+
+async def paginated_response(request, queryset, pagination, serializer_class, reader, columns=()):
+    queryset, fields = select_fields(request, queryset, reader, [*columns, *ordering_columns(pagination)])
+    rows, next_url = await pagination.paginate(request, queryset)
+    return json_response({
+        'next': next_url,
+        'previous': None,
+        'results': serializer_class(rows, many=True, **fields).data,
+    })
+
+
+locker_pagination = AsyncKeysetPagination(('id',))
+reservation_pagination = AsyncKeysetPagination(('-id',))
+active_reservation_pagination = AsyncKeysetPagination(('reserved_until', 'id'))
+
+
+@async_api_view(['GET'], [IsAdminOrReadOnly])
+async def locker_list(request):
+    """
+    List lockers (?site=<id>, ?status=, ?search=<text>)
+    GET /api/async/lockers/
+    """
+    queryset = filter_locker_params(Locker.objects.all(), request.GET)
+    return await paginated_response(request, queryset, locker_pagination, LockerSerializer, locker_reader)
+
+
+@async_api_view(['GET'], [IsAdminOrReadOnly])
+async def locker_available(request):
+    """
+    Get only available lockers (?site=<id>, ?search=<text>)
+    GET /api/async/lockers/available/
+    """
+    queryset = filter_locker_params(Locker.objects.filter(status='available'), request.GET)
+    return await paginated_response(request, queryset, locker_pagination, LockerSerializer, locker_reader)
+
+
+@async_api_view(['GET'], [IsAdminOrReadOnly])
+async def locker_detail(request, pk):
+    """
+    Get locker details
+    GET /api/async/lockers/<id>/
+    """
+    queryset, fields = select_fields(request, Locker.objects.all(), locker_reader)
+    locker = await get_object_or_404(queryset, pk=pk)
+    return json_response(LockerSerializer(locker, **fields).data)
+
+
+@async_api_view(['POST'], [permissions.IsAuthenticated])
+async def locker_unlock(request):
+    """
+    Unlock a locker with PIN; same rules as POST /api/lockers/unlock/
+    POST /api/async/lockers/unlock/
+    Body: {
+        "locker_number": "A1",
+        "access_pin": "123456"
+    }
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise ParseError(f'JSON parse error - {exc}')
+
+    serializer = LockerUnlockSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    locker_number = serializer.validated_data['locker_number']
+    access_pin = serializer.validated_data['access_pin']
+
+    entry, _ = await unlock_cache.aget_entry(locker_number)
+    response_status, body = unlock_cache.check_unlock(entry, locker_number, access_pin, request.user)
+    return json_response(body, response_status)
+
+
+OWNER_COLUMNS = ('user_id',)  # IsOwnerOrAdmin
+
+
+def reservation_queryset(request):
+    # Admin sees all reservations, users only their own
+    queryset = Reservation.objects.select_related('user', 'locker')
+    if request.user.is_staff:
+        return queryset
+    return queryset.filter(user_id=request.user.id)
+
+
+@async_api_view(['GET'], [IsOwnerOrAdmin])
+async def reservation_list(request):
+    """
+    List reservations, newest first
+    GET /api/async/reservations/
+    """
+    return await paginated_response(
+        request, reservation_queryset(request), reservation_pagination, ReservationSerializer,
+        reservation_reader, OWNER_COLUMNS
+    )
+
+
+@async_api_view(['GET'], [IsOwnerOrAdmin])
+async def reservation_active(request):
+    """
+    Get only active reservations (soonest to expire first)
+    GET /api/async/reservations/active/
+    """
+    queryset = reservation_queryset(request).filter(is_active=True)
+    return await paginated_response(
+        request, queryset, active_reservation_pagination, ReservationSerializer,
+        reservation_reader, OWNER_COLUMNS
+    )
+
+
+@async_api_view(['GET'], [IsOwnerOrAdmin])
+async def reservation_detail(request, pk):
+    """
+    Get reservation details
+    GET /api/async/reservations/<id>/
+    """
+    queryset, fields = select_fields(request, reservation_queryset(request), reservation_reader, OWNER_COLUMNS)
+    reservation = await get_object_or_404(queryset, pk=pk)
+    check_object_permissions(request, reservation_detail, reservation, [IsOwnerOrAdmin])
+    return json_response(ReservationSerializer(reservation, **fields).data)
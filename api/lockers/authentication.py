@@ -0,0 +1,196 @@
+"""
+JWT authentication classes for the lockers API.
+
+ClaimsJWTAuthentication (the default, see JWT_CLAIMS_USER) does not load the
+User row on every request. The token already carries the user id, and the few
+account fields permissions need (is_active, is_staff, username) come from a
+short-TTL cache keyed by user id, filled from the database on a miss and
+dropped whenever the User is saved or deleted. Staff changes and deactivation
+therefore apply within USER_STATUS_CACHE_TTL seconds on other workers
+(immediately with a shared cache backend).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+User = get_user_model()
+
+STATUS_KEY_PREFIX = 'user-status:v1:'
+STATUS_FIELDS = ('id', 'is_active', 'is_staff', 'username', 'password')
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication for the async views: same header parsing, token
+    validation and user checks, with the user loaded through the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        try:
+            user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+def get_status_cache():
+    return caches[settings.USER_STATUS_CACHE_ALIAS]
+
+
+def status_key(user_id):
+    return f'{STATUS_KEY_PREFIX}{user_id}'
+
+
+def build_status(row):
+    """The cached account fields; the password only as the revocation digest"""
+    if row is None:
+        return None
+    return {
+        'id': row['id'],
+        'is_active': row['is_active'],
+        'is_staff': row['is_staff'],
+        'username': row['username'],
+        'revoke': get_md5_hash_password(row['password']) if jwt_settings.CHECK_REVOKE_TOKEN else None,
+    }
+
+
+def status_queryset(user_id):
+    return User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).values(*STATUS_FIELDS)
+
+
+def get_status(user_id):
+    cache = get_status_cache()
+    status = cache.get(status_key(user_id))
+    if status is None:
+        status = build_status(status_queryset(user_id).first())
+        if status is not None:
+            cache.set(status_key(user_id), status, settings.USER_STATUS_CACHE_TTL)
+    return status
+
+
+async def aget_status(user_id):
+    cache = get_status_cache()
+    status = await cache.aget(status_key(user_id))
+    if status is None:
+        status = build_status(await status_queryset(user_id).afirst())
+        if status is not None:
+            await cache.aset(status_key(user_id), status, settings.USER_STATUS_CACHE_TTL)
+    return status
+
+
+@receiver(post_save, sender=User, dispatch_uid='lockers.authentication.user_saved')
+@receiver(post_delete, sender=User, dispatch_uid='lockers.authentication.user_deleted')
+def invalidate_status(sender, instance, **kwargs):
+    get_status_cache().delete(status_key(instance.pk))
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user backed by the token and the cached account status.
+    Has id/pk, username, is_staff and is_authenticated like a User; code that
+    needs the full row loads it with User.objects.get(pk=request.user.id).
+    """
+
+    def __init__(self, token, status):
+        super().__init__(token)
+        self.status = status
+
+    @cached_property
+    def id(self):
+        # The claim is a string; the status holds the real primary key
+        return self.status['id']
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def username(self):
+        return self.status['username']
+
+    @cached_property
+    def is_staff(self):
+        return self.status['is_staff']
+
+
+class ClaimsJWTAuthentication(AsyncJWTAuthentication):
+    """JWT authentication without a per-request User query (see module docstring)"""
+
+    def get_user(self, validated_token):
+        return self.user_from_status(validated_token, get_status(self.get_user_id(validated_token)))
+
+    async def aget_user(self, validated_token):
+        return self.user_from_status(validated_token, await aget_status(self.get_user_id(validated_token)))
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+    def user_from_status(self, validated_token, status):
+        # Same checks as JWTAuthentication.get_user, against the cached status
+        if status is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not status['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != status['revoke']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return ClaimsUser(validated_token, status)
+
+
+def record_login(user):
+    """
+    Coalesced replacement for simplejwt's UPDATE_LAST_LOGIN: last_login is
+    written at most once per LAST_LOGIN_INTERVAL per user, with a single-column
+    UPDATE instead of a full save().
+    """
+    now = timezone.now()
+    interval = timedelta(seconds=settings.LAST_LOGIN_INTERVAL)
+    if user.last_login is not None and now - user.last_login < interval:
+        return False
+    User.objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+    return True
@@ -0,0 +1,124 @@
+"""
+Push channel for locker and reservation changes.
+
+Transitions arrive through lockers.signals, are turned into small delta events
+and fanned out to the clients connected to GET /api/events/ (server-sent
+events, served by the ASGI app). Each client is one coroutine and a bounded
+asyncio queue, and holds no thread or database connection while idle.
+
+The fan-out backend is pluggable through settings.LOCKER_EVENTS_BACKEND.
+InProcessBackend only reaches clients connected to the same worker process;
+a multi-worker deployment needs a backend that relays publish() calls between
+workers (Redis pub/sub, PostgreSQL LISTEN/NOTIFY, ...) and hands them to
+local subscribers the same way.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .signals import lockers_changed, reservations_changed
+
+
+class Subscription:
+    """One connected client: a bounded queue living on the client's event loop"""
+
+    def __init__(self, user_id, is_staff, max_pending=None):
+        self.user_id = user_id
+        self.is_staff = is_staff
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending or settings.LOCKER_EVENTS_MAX_PENDING)
+
+    def wants(self, event):
+        # Reservation events only go to their owner and to admins
+        owner = event.get('user_id')
+        return owner is None or self.is_staff or owner == self.user_id
+
+    def deliver(self, events):
+        """Runs on self.loop"""
+        for event in events:
+            if not self.wants(event):
+                continue
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The client cannot keep up: drop its backlog and ask it to refetch
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait({'event': 'resync', 'data': {}})
+                return
+
+
+class InProcessBackend:
+    """Fan-out to clients connected to this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)  # event loop -> subscriptions
+
+    def subscribe(self, subscription):
+        with self.lock:
+            self.subscribers[subscription.loop].add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscribers[subscription.loop]
+
+    def publish(self, events):
+        """Thread-safe; called from sync views after commit"""
+        with self.lock:
+            targets = [(loop, list(subscriptions)) for loop, subscriptions in self.subscribers.items()]
+        # One wake-up per event loop, not per client
+        for loop, subscriptions in targets:
+            loop.call_soon_threadsafe(self.fan_out, subscriptions, events)
+
+    @staticmethod
+    def fan_out(subscriptions, events):
+        for subscription in subscriptions:
+            subscription.deliver(events)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.LOCKER_EVENTS_BACKEND)()
+    return _backend
+
+
+def format_event(event):
+    """Encode one event in the text/event-stream wire format"""
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+@receiver(lockers_changed, dispatch_uid='lockers.events.lockers_changed')
+def publish_locker_events(sender, lockers, **kwargs):
+    get_backend().publish([{'event': 'locker', 'data': locker} for locker in lockers])
+
+
+@receiver(reservations_changed, dispatch_uid='lockers.events.reservations_changed')
+def publish_reservation_events(sender, reservations, action, **kwargs):
+    get_backend().publish([{
+        'event': 'reservation',
+        'user_id': reservation['user_id'],
+        'data': {
+            'id': reservation['id'],
+            'locker': reservation['locker_id'],
+            'locker_number': reservation['locker_number'],
+            'is_active': reservation['is_active'],
+            'reserved_until': reservation['reserved_until'],
+            'action': action,
+        },
+    } for reservation in reservations])
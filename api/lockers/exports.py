@@ -0,0 +1,172 @@
+"""
+Streaming export of reservation history (NDJSON or CSV).
+
+Rows are read with values() and iterator(chunk_size), i.e. a server-side
+cursor on PostgreSQL, and written out one buffered block at a time, so memory
+stays flat however many reservations are exported.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import BooleanField, F, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ArchivedReservation, Reservation
+
+FIELDS = [
+    'id', 'user_id', 'username', 'locker_id', 'locker_number', 'location',
+    'reserved_at', 'reserved_until', 'is_active', 'updated_at',
+]
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_moment(value, name):
+    """ISO datetime, or a date meaning its local midnight"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name}: expected an ISO date or datetime, got "{value}"')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_id(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name}: expected an integer id, got "{value}"')
+
+
+def export_queryset(start=None, end=None, locker=None, user=None, active=None, archived=False):
+    """
+    Reservations to export, oldest first, as flat dicts.
+    start/end bound reserved_at (end is exclusive); locker/user are ids.
+    archived=True reads ArchivedReservation (all released) instead.
+    """
+    queryset = ArchivedReservation.objects.all() if archived else Reservation.objects.all()
+    if start is not None:
+        queryset = queryset.filter(reserved_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(reserved_at__lt=end)
+    if locker is not None:
+        queryset = queryset.filter(locker_id=locker)
+    if user is not None:
+        queryset = queryset.filter(user_id=user)
+    if archived:
+        if active:
+            return queryset.none().values()
+        queryset = queryset.annotate(is_active=Value(False, output_field=BooleanField()))
+    elif active is not None:
+        queryset = queryset.filter(is_active=active)
+    return queryset.order_by('id').values(
+        'id', 'user_id', 'locker_id', 'reserved_at', 'reserved_until', 'is_active', 'updated_at',
+        username=F('user__username'),
+        locker_number=F('locker__locker_number'),
+        location=F('locker__location'),
+    )
+
+
+def filters_from_params(params):
+    """
+    Parse export filters from a query dict or command options:
+    start, end (ISO date/datetime), locker, user (ids), active and
+    archived (true/false). Raises ValueError with a readable message.
+    """
+    filters = {}
+    for name in ('start', 'end'):
+        if params.get(name):
+            filters[name] = parse_moment(params[name], name)
+    for name in ('locker', 'user'):
+        if params.get(name) not in (None, ''):
+            filters[name] = parse_id(params[name], name)
+    for name in ('active', 'archived'):
+        if params.get(name) not in (None, ''):
+            value = str(params[name]).lower()
+            if value not in ('true', 'false', '1', '0'):
+                raise ValueError(f'{name}: expected true or false, got "{params[name]}"')
+            filters[name] = value in ('true', '1')
+    return filters
+
+
+def format_datetime(value, tz):
+    # Same rendering as the API (DRF DateTimeField)
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def flatten(row, tz):
+    for name in ('reserved_at', 'reserved_until', 'updated_at'):
+        row[name] = format_datetime(row[name], tz)
+    return {name: row[name] for name in FIELDS}
+
+
+class _Line:
+    """File-like target for csv.writer that hands back the formatted line"""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows):
+    # Resolve the timezone once, not per value (timezone.localtime looks it up every call)
+    tz = timezone.get_current_timezone()
+    for row in rows:
+        yield json.dumps(flatten(row, tz), separators=(',', ':')) + '\n'
+
+
+def iter_csv(rows):
+    tz = timezone.get_current_timezone()
+    writer = csv.writer(_Line())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(flatten(row, tz).values())
+
+
+def export_lines(queryset, export_format, chunk_size=None):
+    rows = queryset.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+    return iter_ndjson(rows) if export_format == 'ndjson' else iter_csv(rows)
+
+
+def buffered(lines, size=256):
+    """Join lines into blocks so the server writes fewer, larger chunks"""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def streaming_content(request, blocks):
+    """
+    Under ASGI, Django would read a plain iterator to the end before sending
+    it; hand it an async iterator that pulls one block at a time instead.
+    """
+    if getattr(request, 'scope', None) is None:
+        return blocks
+
+    async def pull():
+        next_block = sync_to_async(next)
+        while True:
+            block = await next_block(blocks, None)
+            if block is None:
+                return
+            yield block
+
+    return pull()
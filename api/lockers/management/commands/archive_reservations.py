@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from lockers.services import archive_reservations, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Move released reservations that ended more than --days ago '
+        '(RESERVATION_ARCHIVE_DAYS) to the archive table in batches, keeping the '
+        'reservations table down to active and recent rows, and prune sync tombstones '
+        'older than SYNC_TOMBSTONE_DAYS. Runs once by default '
+        '(for cron); use --loop to keep running as a worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive reservations that ended this many days ago or more '
+                                 '(default: RESERVATION_ARCHIVE_DAYS, at least SYNC_TOMBSTONE_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Reservations moved per transaction')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches, to spread out the load')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sleeping --interval seconds between runs')
+        parser.add_argument('--interval', type=float, default=3600,
+                            help='Seconds between runs in --loop mode')
+
+    def handle(self, *args, **options):
+        days = settings.RESERVATION_ARCHIVE_DAYS if options['days'] is None else options['days']
+        if days < 0:
+            raise CommandError('--days must be 0 or more')
+        # Archiving writes no tombstones, so a kiosk cursor must not outlive them
+        if days < settings.SYNC_TOMBSTONE_DAYS:
+            raise CommandError(
+                f'--days must be at least SYNC_TOMBSTONE_DAYS ({settings.SYNC_TOMBSTONE_DAYS}), '
+                'or /api/sync/ clients would keep reservations that were archived'
+            )
+
+        if not options['loop']:
+            self.run_once(days, options)
+            return
+
+        try:
+            while True:
+                self.run_once(days, options)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping archive worker')
+
+    def run_once(self, days, options):
+        """Archive batches until nothing old enough is left"""
+        started = time.perf_counter()
+        before = timezone.now() - timedelta(days=days)
+        total = batches = 0
+        while True:
+            moved = archive_reservations(before, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total} reservations ended before {before:%Y-%m-%d %H:%M} '
+            f'in {batches} batches, {elapsed:.2f}s ({rate:.0f} rows/s)'
+        ))
+
+        # Sync tombstones are kept as long as a kiosk cursor can use them
+        pruned = prune_tombstones(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS))
+        if pruned:
+            self.stdout.write(f'Pruned {pruned} sync tombstones older than {settings.SYNC_TOMBSTONE_DAYS} days')
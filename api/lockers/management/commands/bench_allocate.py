@@ -0,0 +1,184 @@
+import io
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from lockers.factories import scratch_database, seed_lockers, seed_users
+from lockers.models import Locker, Reservation
+from lockers.serializers import MyTokenObtainPairSerializer
+
+MODES = ('pick', 'allocate')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and compare reservations/s and latency when '
+        'hundreds of simultaneous users either pick a locker from /api/lockers/available/ '
+        'and retry on conflicts (pick), or call /api/reservations/allocate/ (allocate).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requesters', type=int, default=200,
+                            help='Simultaneous users (one thread and DB connection each)')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Reservations attempted per mode, one user each')
+        parser.add_argument('--lockers', type=int, default=None,
+                            help='Available lockers (default: as many as --requests)')
+        parser.add_argument('--max-attempts', type=int, default=10,
+                            help='Tries per user in pick mode before giving up')
+        parser.add_argument('--modes', default=','.join(MODES),
+                            help='Comma-separated modes to compare')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options['keepdb']):
+                if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+                    raise CommandError(
+                        'In-memory SQLite locks whole tables across threads; point DATABASES at '
+                        'PostgreSQL (or set a file TEST NAME) to run this benchmark'
+                    )
+                auths = self.seed(options)
+                self.stdout.write(
+                    f"{options['requests']} users per mode, {options['requesters']} at once, "
+                    f"{Locker.objects.count()} lockers ({connection.vendor})"
+                )
+                if connection.vendor == 'sqlite':
+                    self.stdout.write('Note: SQLite has no row locks; writers are serialized (BEGIN IMMEDIATE)')
+                    # Worker threads open their own connections with these; without
+                    # IMMEDIATE, concurrent read-then-write transactions fail with
+                    # "database is locked" instead of waiting
+                    connection.settings_dict['OPTIONS'].update(transaction_mode='IMMEDIATE', timeout=60)
+                for mode in modes:
+                    self.reset()
+                    self.report(mode, *self.run(mode, auths, options))
+                self.reset()
+        finally:
+            teardown_test_environment()
+
+    def seed(self, options):
+        if not User.objects.filter(username__startswith='bench_user_').exists():
+            self.stdout.write('Seeding data...')
+            seed_users(options['requests'])
+            seed_lockers(options['lockers'] or options['requests'])
+        users = User.objects.filter(username__startswith='bench_user_').order_by('id')[:options['requests']]
+        return [f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}' for user in users]
+
+    def reset(self):
+        """Every locker free again"""
+        Reservation.objects.all().delete()
+        Locker.objects.exclude(status='available').update(status='available', updated_at=timezone.now())
+
+    def run(self, mode, auths, options):
+        """
+        `requesters` threads call core.wsgi.application, each serving users from
+        `auths` until none are left. A user's latency runs from their first
+        request until they hold a reservation, give up, or get a server error.
+        """
+        from core.wsgi import application
+
+        until = (timezone.now() + timedelta(hours=1)).isoformat()
+        pending = iter(auths)
+        lock = threading.Lock()
+        timings = []
+        counts = {'requests': 0, 'reserved': 0, 'failed': 0, 'errors': 0}
+        errors = []
+
+        def call(method, path, auth, body=None, query=''):
+            payload = json.dumps(body).encode() if body is not None else b''
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(payload),
+                'CONTENT_LENGTH': str(len(payload)), 'CONTENT_TYPE': 'application/json',
+                'HTTP_AUTHORIZATION': auth,
+            }
+            statuses = []
+            response = application(environ, lambda status, response_headers: statuses.append(status))
+            content = b''.join(response)
+            response.close()
+            return int(statuses[0].split()[0]), content
+
+        def pick(auth):
+            """
+            The current client flow: list, pick one of the first lockers, POST,
+            retry on 400. Returns (outcome, requests made).
+            """
+            requests = 0
+            for _ in range(options['max_attempts']):
+                code, content = call('GET', '/api/lockers/available/', auth, query='page_size=20')
+                requests += 1
+                if code != 200:
+                    return 'errors', requests
+                lockers = json.loads(content)['results']
+                if not lockers:
+                    return 'failed', requests
+                code, _ = call('POST', '/api/reservations/', auth,
+                               {'locker': random.choice(lockers)['id'], 'reserved_until': until})
+                requests += 1
+                if code == 201:
+                    return 'reserved', requests
+                if code != 400:
+                    return 'errors', requests
+            return 'failed', requests
+
+        def allocate(auth):
+            code, _ = call('POST', '/api/reservations/allocate/', auth, {'reserved_until': until})
+            return {201: 'reserved', 409: 'failed'}.get(code, 'errors'), 1
+
+        reserve = pick if mode == 'pick' else allocate
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        auth = next(pending, None)
+                    if auth is None:
+                        return
+                    start = time.perf_counter()
+                    outcome, requests = reserve(auth)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        timings.append(elapsed)
+                        counts['requests'] += requests
+                        counts[outcome] += 1
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['requesters'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise CommandError(f'Request failed: {errors[0]}')
+        return timings, elapsed, counts
+
+    def report(self, mode, timings, elapsed, counts):
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f"{mode:>9}: {counts['reserved'] / elapsed:8.1f} reservations/s  "
+            f"p50={percentiles[49]:.1f}ms p99={percentiles[98]:.1f}ms  "
+            f"{counts['requests'] / len(timings):.2f} requests/user  "
+            f"no locker={counts['failed']}  server errors={counts['errors']}"
+        )
@@ -0,0 +1,205 @@
+import asyncio
+import io
+import json
+import random
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from lockers.factories import scratch_database, seed_lockers, seed_users
+from lockers.models import Locker, Reservation
+from lockers.serializers import MyTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and compare throughput of the sync API '
+        '(core.wsgi, fixed worker threads) with the async views under /api/async/ '
+        '(core.asgi, one event loop) at high concurrency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lockers', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help='Requests in flight at once')
+        parser.add_argument('--sync-workers', type=int, default=8,
+                            help='Worker threads serving the sync API (like gunicorn --threads)')
+        parser.add_argument('--db-latency', type=float, default=0.0,
+                            help='Extra milliseconds added to every query, to emulate a remote database')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        if options['db_latency']:
+            delay = options['db_latency'] / 1000
+
+            def slow_execute(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+
+            # Every connection, including the ones opened by worker threads
+            def add_latency(sender, connection, **kwargs):
+                connection.execute_wrappers.append(slow_execute)
+            connection_created.connect(add_latency, weak=False)
+
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options['keepdb']):
+                targets = self.seed(options['lockers'])
+                self.stdout.write(
+                    f"{options['requests']} requests per run, {options['concurrency']} in flight, "
+                    f"{options['sync_workers']} sync workers, +{options['db_latency']}ms per query"
+                )
+                for name, method, path, body in self.scenarios():
+                    for mode in ('sync', 'async'):
+                        prefix = '/api/async/' if mode == 'async' else '/api/'
+                        run = self.run_sync if mode == 'sync' else self.run_async
+                        timings, elapsed = run(method, prefix + path, body, targets, options)
+                        self.report(name, mode, timings, elapsed)
+        finally:
+            teardown_test_environment()
+
+    def seed(self, count):
+        if not Reservation.objects.filter(is_active=True).exists():
+            self.stdout.write('Seeding data...')
+            user_ids = seed_users(max(1, count // 10))
+            locker_ids = seed_lockers(count)
+            until = timezone.now() + timedelta(days=1)
+            # Half the lockers reserved, one reservation per locker
+            reserved = locker_ids[:count // 2]
+            Reservation.objects.bulk_create([
+                Reservation(locker_id=locker_id, user_id=random.choice(user_ids),
+                            reserved_until=until, access_pin=f'{random.randint(0, 999999):06d}')
+                for locker_id in reserved
+            ], batch_size=1000)
+            Locker.objects.filter(id__in=reserved).update(status='reserved', updated_at=timezone.now())
+
+        users = User.objects.in_bulk()
+        return [
+            {
+                'locker_number': locker_number,
+                'access_pin': pin,
+                'auth': f'Bearer {MyTokenObtainPairSerializer.get_token(users[user_id]).access_token}',
+            }
+            for locker_number, pin, user_id in Reservation.objects.filter(is_active=True).values_list(
+                'locker__locker_number', 'access_pin', 'user_id'
+            )
+        ]
+
+    def scenarios(self):
+        return [
+            ('unlock', 'POST', 'lockers/unlock/', True),
+            ('available', 'GET', 'lockers/available/', False),
+            ('active', 'GET', 'reservations/active/', False),
+        ]
+
+    def request_parts(self, target, body):
+        headers = {'authorization': target['auth']}
+        payload = b''
+        if body:
+            payload = json.dumps({
+                'locker_number': target['locker_number'], 'access_pin': target['access_pin']
+            }).encode()
+            headers['content-type'] = 'application/json'
+        return headers, payload
+
+    def run_sync(self, method, path, body, targets, options):
+        """
+        Call core.wsgi.application from `sync_workers` threads while keeping
+        `concurrency` requests outstanding; latency includes the time a request
+        waits for a free worker.
+        """
+        from core.wsgi import application
+
+        def call(target):
+            headers, payload = self.request_parts(target, body)
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(payload),
+                'CONTENT_LENGTH': str(len(payload)), 'CONTENT_TYPE': headers.get('content-type', ''),
+                'HTTP_AUTHORIZATION': headers['authorization'],
+            }
+            statuses = []
+            response = application(environ, lambda status, response_headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            if not statuses[0].startswith('200'):
+                raise RuntimeError(f'{method} {path}: {statuses[0]}')
+            return time.perf_counter()
+
+        remaining = options['requests']
+        timings = []
+        pending = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['sync_workers']) as pool:
+            while remaining or pending:
+                while remaining and len(pending) < options['concurrency']:
+                    pending[pool.submit(call, random.choice(targets))] = time.perf_counter()
+                    remaining -= 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    timings.append((future.result() - pending.pop(future)) * 1000)
+        return timings, time.perf_counter() - start
+
+    def run_async(self, method, path, body, targets, options):
+        """Call core.asgi.application from one event loop, `concurrency` requests at a time"""
+        from core.asgi import application
+
+        async def call(semaphore, target):
+            headers, payload = self.request_parts(target, body)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'server': ('testserver', 80),
+                'client': ('127.0.0.1', 0),
+                'headers': [(name.encode(), value.encode()) for name, value in headers.items()]
+                           + [(b'host', b'testserver'), (b'content-length', str(len(payload)).encode())],
+            }
+            finished = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+            statuses = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body'):
+                    finished.set()
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(scope, receive, send)
+                if statuses[0] != 200:
+                    raise RuntimeError(f'{method} {path}: {statuses[0]}')
+                return (time.perf_counter() - start) * 1000
+
+        async def run():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            chosen = [random.choice(targets) for _ in range(options['requests'])]
+            start = time.perf_counter()
+            timings = await asyncio.gather(*(call(semaphore, target) for target in chosen))
+            return timings, time.perf_counter() - start
+
+        return asyncio.run(run())
+
+    def report(self, name, mode, timings, elapsed):
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{name:>9} {mode:>5}: {len(timings) / elapsed:8.1f} req/s  '
+            f'p50={percentiles[49]:.2f}ms p99={percentiles[98]:.2f}ms'
+        )
@@ -0,0 +1,167 @@
+import io
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.database import MODES, connection_settings, pool_available
+from lockers.factories import scratch_database, seed_lockers, seed_users
+from lockers.models import Locker
+from lockers.serializers import MyTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and compare requests/s, latency and connections '
+        'opened for each DB_CONN_MODE (close, persistent, pool) with concurrent '
+        'workers calling core.wsgi.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=4000,
+                            help='Requests per mode')
+        parser.add_argument('--workers', type=int, default=16,
+                            help='Worker threads (like gunicorn --threads)')
+        parser.add_argument('--modes', default=','.join(MODES),
+                            help='Comma-separated modes to compare')
+        parser.add_argument('--connect-latency', type=float, default=0.0,
+                            help='Extra milliseconds per new connection, to emulate a remote '
+                                 'database (TCP + TLS + authentication)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+
+        opened = []
+        delay = options['connect_latency'] / 1000
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(1)
+            if delay:
+                time.sleep(delay)
+        connection_created.connect(count_connection, weak=False)
+
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options['keepdb']):
+                if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+                    raise CommandError(
+                        'In-memory SQLite connections are never closed; point DATABASES at '
+                        'PostgreSQL (or set a file TEST NAME) to compare connection modes'
+                    )
+                target = self.seed()
+                self.stdout.write(
+                    f"{options['requests']} requests per mode, {options['workers']} workers, "
+                    f"+{options['connect_latency']}ms per new connection ({connection.vendor})"
+                )
+                original = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+                original['OPTIONS'] = dict(connection.settings_dict['OPTIONS'])
+                try:
+                    for mode in modes:
+                        if mode == 'pool' and (connection.vendor != 'postgresql' or not pool_available()):
+                            self.stdout.write(f'{mode:>10}: skipped, needs PostgreSQL with psycopg 3')
+                            continue
+                        self.use_mode(mode, options['workers'])
+                        opened.clear()
+                        timings, elapsed = self.run(target, options)
+                        self.report(mode, timings, elapsed, len(opened))
+                finally:
+                    self.restore(original)
+        finally:
+            teardown_test_environment()
+            connection_created.disconnect(count_connection)
+
+    def seed(self):
+        if not Locker.objects.exists():
+            self.stdout.write('Seeding data...')
+            seed_users(10)
+            seed_lockers(100)
+        locker = Locker.objects.order_by('id').first()
+        user = User.objects.order_by('id').first()
+        return {
+            'path': f'/api/lockers/{locker.id}/',
+            'auth': f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}',
+        }
+
+    def use_mode(self, mode, workers):
+        """Apply DB_CONN_MODE=mode to the scratch database, as settings.py does under WSGI"""
+        connections.close_all()
+        if connection.vendor == 'postgresql':
+            connection.close_pool()
+        # One pooled connection per worker thread, so no request waits for one
+        connection.settings_dict.update(
+            connection_settings(mode, pool_min_size=min(2, workers), pool_max_size=workers)
+        )
+
+    def restore(self, original):
+        connections.close_all()
+        if connection.vendor == 'postgresql':
+            connection.close_pool()
+        connection.settings_dict.update(original)
+
+    def run(self, target, options):
+        """
+        `workers` threads call core.wsgi.application back to back; each closes its
+        own connections when it runs out of requests, like a worker shutting down.
+        """
+        from core.wsgi import application
+
+        remaining = iter(range(options['requests']))
+        lock = threading.Lock()
+        timings = []
+        errors = []
+
+        def call():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': target['path'], 'QUERY_STRING': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(b''),
+                'HTTP_AUTHORIZATION': target['auth'],
+            }
+            statuses = []
+            response = application(environ, lambda status, response_headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            if not statuses[0].startswith('200'):
+                raise RuntimeError(f"GET {target['path']}: {statuses[0]}")
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    start = time.perf_counter()
+                    call()
+                    timings.append((time.perf_counter() - start) * 1000)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise CommandError(f'Request failed: {errors[0]}')
+        return timings, elapsed
+
+    def report(self, mode, timings, elapsed, opened):
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{mode:>10}: {len(timings) / elapsed:8.1f} req/s  p50={percentiles[49]:.2f}ms '
+            f'p99={percentiles[98]:.2f}ms  connections opened={opened}'
+        )
@@ -0,0 +1,403 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from itertools import count
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from lockers import rollups
+from lockers import urls as locker_urls
+from lockers.factories import LOCATIONS, scratch_database, seed_lockers, seed_reservations, seed_users
+from lockers.models import ArchivedReservation, Locker, Reservation
+from lockers.serializers import MyTokenObtainPairSerializer
+from lockers.services import archive_reservations
+from lockers.sync import delta_cursor
+
+PASSWORD = 'bench-pass-123'
+AUTH_ROUTES = ('register', 'token_obtain_pair', 'token_refresh')
+# Routes that cannot be timed as a request/response pair
+SKIPPED = {
+    'events': 'server-sent event stream; stays open until the client disconnects',
+}
+
+
+class Route:
+    """
+    One benchmarked endpoint. `prepare(i)` runs untimed before request i and
+    returns (path, body); it creates whatever rows a write endpoint consumes.
+    """
+
+    def __init__(self, name, method, template, role, prepare):
+        self.name = name
+        self.method = method
+        self.template = template
+        self.role = role
+        self.prepare = prepare
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database at production-like volume and time every route '
+        'in lockers/urls.py plus the auth endpoints: latency percentiles, queries '
+        'per request and peak Python memory, optionally written as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--lockers', type=int, default=100000)
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--archived', type=int, default=100000,
+                            help='Released reservations moved to the archive table while seeding')
+        parser.add_argument('--iterations', type=int, default=30,
+                            help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=3,
+                            help='Untimed requests per route before timing')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only routes whose name contains this (repeatable)')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2')
+        baseline = self.load(options['compare']) if options['compare'] else None
+
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options['keepdb']):
+                dataset = self.seed(options)
+                routes = self.routes(options)
+                uncovered = [] if options['only'] else sorted(
+                    registered_routes() - {route.name for route in routes} - set(SKIPPED)
+                )
+                results = [self.measure(route, options) for route in routes]
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta': self.meta(dataset, options),
+            'results': results,
+            'skipped': [{'route': name, 'reason': reason} for name, reason in SKIPPED.items()],
+            'uncovered': uncovered,
+        }
+        self.print_table(results, baseline)
+        for name in uncovered:
+            self.stdout.write(self.style.WARNING(f'No benchmark for route {name}'))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+                output.write('\n')
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def load(self, path):
+        try:
+            with open(path) as baseline:
+                return {result['route']: result for result in json.load(baseline)['results']}
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def seed(self, options):
+        if not Locker.objects.filter(locker_number__startswith='BENCH-').exists():
+            self.stdout.write(
+                f"Seeding {options['users']} users, {options['lockers']} lockers, "
+                f"{options['reservations']} reservations..."
+            )
+            start = time.perf_counter()
+            user_ids = seed_users(options['users'])
+            locker_ids = seed_lockers(options['lockers'])
+            seed_reservations(options['reservations'], locker_ids, user_ids)
+            self.archive(options['archived'])
+            rollups.rebuild()
+            self.stdout.write(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+        self.admin = self.account('bench_admin', is_staff=True)
+        self.member = self.account('bench_member')
+        return {
+            'users': User.objects.count(),
+            'lockers': Locker.objects.count(),
+            'reservations': Reservation.objects.count(),
+            'active_reservations': Reservation.objects.filter(is_active=True).count(),
+            'archived_reservations': ArchivedReservation.objects.count(),
+        }
+
+    def archive(self, limit):
+        """Move up to `limit` old released reservations out, as archive_reservations does in production"""
+        before = timezone.now() - timedelta(days=settings.RESERVATION_ARCHIVE_DAYS)
+        archived = 0
+        while archived < limit:
+            moved = archive_reservations(before, batch_size=min(5000, limit - archived))
+            if not moved:
+                break
+            archived += moved
+
+    def account(self, username, is_staff=False):
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            user = User.objects.create_user(username, password=PASSWORD, is_staff=is_staff)
+        return user
+
+    def client(self, role):
+        client = APIClient()
+        user = {'admin': self.admin, 'user': self.member}.get(role)
+        if user is not None:
+            token = MyTokenObtainPairSerializer.get_token(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def routes(self, options):
+        """Every route worth timing, named like the metrics view tags"""
+        # Rows created for write routes get a per-run prefix, so --keepdb reruns never collide
+        run = f'{int(time.time()) % 100000:05d}'
+        numbers = count()
+        now = timezone.now()
+        until = (now + timedelta(hours=4)).isoformat()
+        sample = Locker.objects.filter(locker_number__startswith='BENCH-').order_by('id').first()
+        history = Reservation.objects.filter(locker_id=sample.id).count()
+
+        def new_lockers(n, status='available'):
+            lockers = [
+                Locker(locker_number=f'W{run}-{next(numbers)}', location='Bench Wing', status=status)
+                for _ in range(n)
+            ]
+            return Locker.objects.bulk_create(lockers)
+
+        def new_reservation(locker=None, active=True):
+            locker = locker or new_lockers(1, 'reserved' if active else 'available')[0]
+            return Reservation.objects.create(
+                user=self.member, locker=locker, is_active=active,
+                reserved_until=now + timedelta(hours=2) if active else now - timedelta(hours=1),
+            )
+
+        held = new_reservation()
+
+        def fixed(path, body=None):
+            return lambda i: (path, body)
+
+        def lockers_body(i):
+            return '/api/lockers/', {'locker_number': f'C{run}-{next(numbers)}', 'location': 'Bench Wing'}
+
+        def locker_update(i):
+            locker = new_lockers(1)[0]
+            return f'/api/lockers/{locker.id}/', {
+                'locker_number': locker.locker_number, 'location': 'Bench Annex', 'status': 'available'
+            }
+
+        def locker_partial_update(i):
+            return f'/api/lockers/{new_lockers(1)[0].id}/', {'location': 'Bench Annex'}
+
+        def locker_destroy(i):
+            # With a reservation to release, like deactivating a locker in use
+            return f'/api/lockers/{new_reservation().locker_id}/', None
+
+        def bulk(i):
+            return '/api/lockers/bulk/', [
+                {'locker_number': f'B{run}-{next(numbers)}', 'location': LOCATIONS[n % len(LOCATIONS)]}
+                for n in range(100)
+            ]
+
+        def bulk_deactivate(i):
+            return '/api/lockers/bulk/deactivate/', {'ids': [locker.id for locker in new_lockers(20)]}
+
+        def bulk_reactivate(i):
+            return '/api/lockers/bulk/reactivate/', {
+                'ids': [locker.id for locker in new_lockers(20, 'inactive')]
+            }
+
+        def reservation_create(i):
+            return '/api/reservations/', {'locker': new_lockers(1)[0].id, 'reserved_until': until}
+
+        def reservation_destroy(i):
+            return f'/api/reservations/{new_reservation(active=False).id}/', None
+
+        def release(i):
+            return f'/api/reservations/{new_reservation().id}/release/', {}
+
+        def register(i):
+            return '/api/auth/register/', {
+                'username': f'bench_new_{run}_{next(numbers)}', 'password': PASSWORD, 'password_confirm': PASSWORD
+            }
+
+        refresh = str(MyTokenObtainPairSerializer.get_token(self.member))
+        yesterday = (now - timedelta(days=1)).date().isoformat()
+
+        return [route for route in [
+            Route('api-root', 'GET', '/api/', 'user', fixed('/api/')),
+            Route('locker-list', 'GET', '/api/lockers/', 'user', fixed('/api/lockers/')),
+            Route('locker-create', 'POST', '/api/lockers/', 'admin', lockers_body),
+            Route('locker-retrieve', 'GET', '/api/lockers/<id>/', 'user', fixed(f'/api/lockers/{sample.id}/')),
+            Route('locker-update', 'PUT', '/api/lockers/<id>/', 'admin', locker_update),
+            Route('locker-partial_update', 'PATCH', '/api/lockers/<id>/', 'admin', locker_partial_update),
+            Route('locker-destroy', 'DELETE', '/api/lockers/<id>/', 'admin', locker_destroy),
+            Route('locker-available', 'GET', '/api/lockers/available/', 'user', fixed('/api/lockers/available/')),
+            Route('locker-reactivate', 'POST', '/api/lockers/<id>/reactivate/', 'admin',
+                  lambda i: (f"/api/lockers/{new_lockers(1, 'inactive')[0].id}/reactivate/", {})),
+            Route('locker-unlock', 'POST', '/api/lockers/unlock/', 'user', fixed(
+                '/api/lockers/unlock/', {'locker_number': held.locker.locker_number, 'access_pin': held.access_pin}
+            )),
+            Route('locker-bulk', 'POST', '/api/lockers/bulk/ (100 rows)', 'admin', bulk),
+            Route('locker-bulk_deactivate', 'POST', '/api/lockers/bulk/deactivate/ (20 ids)', 'admin',
+                  bulk_deactivate),
+            Route('locker-bulk_reactivate', 'POST', '/api/lockers/bulk/reactivate/ (20 ids)', 'admin',
+                  bulk_reactivate),
+            Route('site-list', 'GET', '/api/sites/', 'user', fixed('/api/sites/')),
+            Route('site-retrieve', 'GET', '/api/sites/<id>/', 'user', fixed(f'/api/sites/{sample.site_id}/')),
+            Route('site-lockers', 'GET', '/api/sites/<id>/lockers/', 'user',
+                  fixed(f'/api/sites/{sample.site_id}/lockers/')),
+            Route('site-lockers-available', 'GET', '/api/sites/<id>/lockers/available/', 'user',
+                  fixed(f'/api/sites/{sample.site_id}/lockers/available/')),
+            Route('reservation-list', 'GET', '/api/reservations/', 'user', fixed('/api/reservations/')),
+            Route('reservation-create', 'POST', '/api/reservations/', 'user', reservation_create),
+            # Each request claims another free locker at the sample's site
+            Route('reservation-allocate', 'POST', '/api/reservations/allocate/ (site)', 'user', fixed(
+                '/api/reservations/allocate/', {'reserved_until': until, 'site': sample.site_id}
+            )),
+            Route('reservation-retrieve', 'GET', '/api/reservations/<id>/', 'user',
+                  fixed(f'/api/reservations/{held.id}/')),
+            Route('reservation-update', 'PUT', '/api/reservations/<id>/', 'admin',
+                  fixed(f'/api/reservations/{held.id}/', {'reserved_until': until})),
+            Route('reservation-partial_update', 'PATCH', '/api/reservations/<id>/', 'admin',
+                  fixed(f'/api/reservations/{held.id}/', {'reserved_until': until})),
+            Route('reservation-destroy', 'DELETE', '/api/reservations/<id>/', 'admin', reservation_destroy),
+            Route('reservation-release', 'PUT', '/api/reservations/<id>/release/', 'user', release),
+            Route('reservation-active', 'GET', '/api/reservations/active/', 'admin',
+                  fixed('/api/reservations/active/')),
+            Route('reservation-all', 'GET', '/api/reservations/all/', 'admin', fixed('/api/reservations/all/')),
+            Route('reservation-export', 'GET', f'/api/reservations/export/?locker=<id> ({history} rows)', 'admin',
+                  fixed(f'/api/reservations/export/?locker={sample.id}')),
+            Route('reservation-archived', 'GET', '/api/reservations/archived/', 'admin',
+                  fixed('/api/reservations/archived/')),
+            Route('analytics-utilization', 'GET', '/api/analytics/utilization/', 'admin',
+                  fixed(f'/api/analytics/utilization/?start={yesterday}')),
+            Route('sync', 'GET', '/api/sync/?site=<id>&cursor=<1 minute ago>', 'admin', fixed(
+                f'/api/sync/?site={sample.site_id}&cursor={delta_cursor(sample.site_id, now - timedelta(minutes=1))}'
+            )),
+            Route('register', 'POST', '/api/auth/register/', None, register),
+            Route('token_obtain_pair', 'POST', '/api/auth/login/', None, fixed(
+                '/api/auth/login/', {'username': self.member.username, 'password': PASSWORD}
+            )),
+            Route('token_refresh', 'POST', '/api/auth/refresh/', None,
+                  fixed('/api/auth/refresh/', {'refresh': refresh})),
+        ] if not options['only'] or any(part in route.name for part in options['only'])]
+
+    def call(self, client, route, i):
+        path, body = route.prepare(i)
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        request = getattr(client, route.method.lower())
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            response = request(path, body, format='json') if body is not None else request(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        if response.status_code >= 300:
+            raise CommandError(f'{route.method} {path}: {response.status_code} {response.content[:200]!r}')
+        return elapsed, len(queries), response.status_code
+
+    def measure(self, route, options):
+        client = self.client(route.role)
+        for i in range(options['warmup']):
+            self.call(client, route, i)
+
+        timings, query_counts = [], []
+        for i in range(options['iterations']):
+            elapsed, queries, status_code = self.call(client, route, i)
+            timings.append(elapsed)
+            query_counts.append(queries)
+
+        # One more request under tracemalloc, which would distort the timings above
+        tracemalloc.start()
+        try:
+            self.call(client, route, options['iterations'])
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+        return {
+            'route': route.name,
+            'method': route.method,
+            'path': route.template,
+            'role': route.role or 'anonymous',
+            'status': status_code,
+            'iterations': len(timings),
+            'latency_ms': {
+                'p50': round(percentiles[49], 3),
+                'p95': round(percentiles[94], 3),
+                'p99': round(percentiles[98], 3),
+                'mean': round(statistics.mean(timings), 3),
+                'min': round(min(timings), 3),
+                'max': round(max(timings), 3),
+            },
+            'queries': {'median': statistics.median(query_counts), 'max': max(query_counts)},
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def meta(self, dataset, options):
+        return {
+            'commit': git('rev-parse', 'HEAD'),
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': dataset,
+            'iterations': options['iterations'],
+        }
+
+    def print_table(self, results, baseline):
+        self.stdout.write(
+            f"{'route':<28}{'method':<8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}"
+            + ('   vs baseline' if baseline else '')
+        )
+        for result in results:
+            latency = result['latency_ms']
+            line = (
+                f"{result['route']:<28}{result['method']:<8}{latency['p50']:>10.2f}{latency['p95']:>10.2f}"
+                f"{latency['p99']:>10.2f}{result['queries']['median']:>9g}{result['peak_memory_kb']:>10.1f}"
+            )
+            previous = baseline and baseline.get(result['route'])
+            if previous:
+                change = (latency['p50'] / previous['latency_ms']['p50'] - 1) * 100
+                queries = result['queries']['median'] - previous['queries']['median']
+                line += f'   p50 {change:+.1f}%, queries {queries:+g}'
+            self.stdout.write(line)
+
+
+def registered_routes():
+    """Names of every method on the lockers routes and the auth endpoints, as metrics tags"""
+    names = set(AUTH_ROUTES)
+    for pattern in locker_urls.router.urls:
+        actions = getattr(pattern.callback, 'actions', None)
+        if actions:
+            basename = pattern.callback.initkwargs['basename']
+            names.update(f'{basename}-{action}' for action in actions.values())
+        else:
+            names.add(pattern.name)
+    names.update(pattern.name for pattern in locker_urls.urlpatterns if getattr(pattern, 'name', None))
+    return names
+
+
+def git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
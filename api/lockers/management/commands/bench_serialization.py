@@ -0,0 +1,87 @@
+import re
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from lockers import renderers
+from lockers.factories import scratch_database, seed_lockers, seed_reservations, seed_users
+from lockers.models import Locker
+
+TIMING = re.compile(r'(\w+);dur=([\d.]+)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and compare rows/s of the list endpoints with '
+        'the DRF serializers and with the fast read path (FAST_READ_PATH), end to '
+        'end and for serialization + rendering alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lockers', type=int, default=20000)
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--page-size', type=int, default=500)
+        parser.add_argument('--pages', type=int, default=40,
+                            help='Pages fetched per endpoint and mode')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options['keepdb']):
+                if not Locker.objects.exists():
+                    self.stdout.write('Seeding data...')
+                    user_ids = seed_users(max(1, options['lockers'] // 20))
+                    locker_ids = seed_lockers(options['lockers'])
+                    # Enough active reservations to fill the active pages
+                    seed_reservations(options['reservations'], locker_ids, user_ids, active_ratio=0.5)
+                admin = User.objects.filter(username='bench_reader').first() or User.objects.create_user(
+                    'bench_reader', password='!', is_staff=True
+                )
+                client = APIClient()
+                client.force_authenticate(admin)
+
+                self.stdout.write(
+                    f"page_size={options['page_size']}, {options['pages']} pages per run, "
+                    f"renderer: {'orjson' if renderers.orjson else 'json (install orjson for the fast renderer)'}"
+                )
+                for path in ('/api/lockers/', '/api/reservations/', '/api/reservations/active/'):
+                    for fast in (False, True):
+                        with override_settings(FAST_READ_PATH=fast):
+                            self.run(client, path, fast, options)
+        finally:
+            teardown_test_environment()
+
+    def run(self, client, path, fast, options):
+        """Walk the first `pages` pages by cursor; Server-Timing splits out serialize + render"""
+        url = f"{path}?page_size={options['page_size']}"
+        rows = 0
+        elapsed = 0.0
+        encoding = 0.0
+        for _ in range(options['pages']):
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed += time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {url}: {response.status_code}')
+            if not response.has_header('Server-Timing'):
+                raise CommandError(
+                    'No Server-Timing header to split out serialize + render; '
+                    'set METRICS_ENABLED=True and METRICS_SERVER_TIMING=True'
+                )
+            timings = dict(TIMING.findall(response['Server-Timing']))
+            encoding += (float(timings['serialize']) + float(timings['render'])) / 1000
+            rows += len(response.data['results'])
+            url = response.data['next']
+            if not url:
+                break
+
+        self.stdout.write(
+            f"{path:<28}{'fast' if fast else 'drf':>5}: {rows / elapsed:9.0f} rows/s end to end  "
+            f"{rows / encoding:9.0f} rows/s serialize+render  "
+            f"({elapsed / rows * 1e6:.1f} / {encoding / rows * 1e6:.1f} us per row)"
+        )
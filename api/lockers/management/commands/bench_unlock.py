@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from lockers import unlock_cache
+from lockers.factories import scratch_database, seed_lockers, seed_users
+from lockers.models import Locker, Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and report p50/p99 latency of '
+        'POST /api/lockers/unlock/ for cache hits and cache misses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lockers', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Unlock requests per scenario')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options['keepdb']):
+                targets = self.seed(options['lockers'])
+                client = APIClient()
+                cache = unlock_cache.get_cache()
+
+                def miss(target):
+                    cache.delete(unlock_cache.cache_key(target[0]))
+
+                self.report('miss', client, targets, options['requests'], before=miss)
+                # Warm every entry, then measure hits only
+                for target in targets:
+                    self.unlock(client, target)
+                self.report('hit', client, targets, options['requests'])
+        finally:
+            teardown_test_environment()
+
+    def seed(self, count):
+        if not Reservation.objects.filter(is_active=True).exists():
+            self.stdout.write('Seeding data...')
+            user_ids = seed_users(max(1, count // 10))
+            locker_ids = seed_lockers(count)
+            until = timezone.now() + timedelta(days=1)
+            Reservation.objects.bulk_create([
+                Reservation(locker_id=locker_id, user_id=random.choice(user_ids),
+                            reserved_until=until, access_pin=f'{random.randint(0, 999999):06d}')
+                for locker_id in locker_ids
+            ], batch_size=1000)
+            Locker.objects.filter(id__in=locker_ids).update(status='reserved', updated_at=timezone.now())
+
+        users = User.objects.in_bulk()
+        return [
+            (locker_number, pin, users[user_id])
+            for locker_number, pin, user_id in Reservation.objects.filter(is_active=True).values_list(
+                'locker__locker_number', 'access_pin', 'user_id'
+            )
+        ]
+
+    def unlock(self, client, target):
+        locker_number, pin, user = target
+        client.force_authenticate(user)
+        response = client.post('/api/lockers/unlock/', {
+            'locker_number': locker_number, 'access_pin': pin
+        }, format='json')
+        if response.status_code != 200:
+            raise RuntimeError(f'Unlock of {locker_number} failed: {response.status_code}')
+
+    def report(self, label, client, targets, requests, before=None):
+        timings = []
+        for _ in range(requests):
+            target = random.choice(targets)
+            if before:
+                before(target)
+            start = time.perf_counter()
+            self.unlock(client, target)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{label:>4}: n={len(timings)} p50={percentiles[49]:.3f}ms '
+            f'p99={percentiles[98]:.3f}ms mean={statistics.mean(timings):.3f}ms'
+        )
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lockers.services import expire_overdue_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        'Expire reservations past reserved_until and free their lockers. '
+        'Runs once by default (for cron); use --loop to keep running as a worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Reservations expired per transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sleeping --interval seconds between runs')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between runs in --loop mode')
+        parser.add_argument('--quiet-batches', action='store_true',
+                            help='Only report per-run totals')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.run_once(options)
+            return
+
+        try:
+            while True:
+                self.run_once(options)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping expiry worker')
+
+    def run_once(self, options):
+        """Expire batches until nothing is overdue"""
+        run_started = time.perf_counter()
+        total_expired = total_freed = batches = 0
+
+        while True:
+            batch_started = time.perf_counter()
+            expired, freed = expire_overdue_reservations(options['batch_size'])
+            if not expired:
+                break
+            batches += 1
+            total_expired += expired
+            total_freed += freed
+            if not options['quiet_batches']:
+                elapsed_ms = (time.perf_counter() - batch_started) * 1000
+                self.stdout.write(
+                    f'batch {batches}: expired {expired} reservations, '
+                    f'freed {freed} lockers in {elapsed_ms:.1f} ms'
+                )
+
+        elapsed = time.perf_counter() - run_started
+        rate = total_expired / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'run: expired {total_expired} reservations, freed {total_freed} lockers '
+            f'in {batches} batches, {elapsed:.2f}s ({rate:.0f} rows/s)'
+        ))
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from lockers.factories import scratch_database, seed_lockers, seed_reservations, seed_users
+from lockers.models import Locker, Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and print EXPLAIN plans for the hot reservation '
+        'and locker queries, without and with the lockers indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lockers', type=int, default=20000)
+        parser.add_argument('--reservations', type=int, default=200000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run EXPLAIN ANALYZE (PostgreSQL only)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database between runs')
+
+    def handle(self, *args, **options):
+        with scratch_database(keepdb=options['keepdb']):
+            if not Locker.objects.exists():
+                self.stdout.write('Seeding data...')
+                user_ids = seed_users(options['users'])
+                locker_ids = seed_lockers(options['lockers'])
+                seed_reservations(options['reservations'], locker_ids, user_ids)
+            self.refresh_statistics()
+
+            drop_statements = self.drop_index_sql()
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for sql in drop_statements:
+                        cursor.execute(sql)
+                self.refresh_statistics()
+                self.print_plans('WITHOUT indexes', options['analyze'])
+                transaction.set_rollback(True)
+
+            self.print_plans('WITH indexes', options['analyze'])
+
+    def hot_queries(self):
+        """The queries behind validate, release, destroy, unlock, available and active"""
+        now = timezone.now()
+        reservation = Reservation.objects.filter(is_active=True).order_by('id').first()
+        locker_id = reservation.locker_id if reservation else 0
+        user_id = reservation.user_id if reservation else 0
+        active_for_locker = Reservation.objects.filter(
+            locker_id=locker_id, is_active=True, reserved_until__gte=now
+        )
+        return [
+            ('validate / release (active reservation for locker)',
+             active_for_locker.values('id')[:1]),
+            ('destroy (active reservations + users)',
+             active_for_locker.select_related('user')),
+            ('unlock (locker + pin + user)',
+             active_for_locker.filter(
+                 access_pin=reservation.access_pin if reservation else '000000',
+                 user_id=user_id
+             ).select_related('user')[:1]),
+            ('available lockers (first page)',
+             Locker.objects.filter(status='available').order_by('id')[:51]),
+            ('active reservations for a user',
+             Reservation.objects.filter(user_id=user_id, is_active=True)
+             .order_by('reserved_until', 'id')[:51]),
+            ('active reservations (admin)',
+             Reservation.objects.filter(is_active=True).order_by('reserved_until', 'id')[:51]),
+        ]
+
+    def print_plans(self, title, analyze):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n==== {title} ===='))
+        explain_options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+        for label, queryset in self.hot_queries():
+            self.stdout.write(self.style.SUCCESS(f'\n-- {label}'))
+            self.stdout.write(queryset.explain(**explain_options))
+
+    def drop_index_sql(self):
+        """
+        DROP INDEX statements for the lockers indexes. They are executed inside
+        a transaction that is rolled back, so the database keeps its indexes.
+        """
+        with connection.schema_editor(collect_sql=True) as editor:
+            for model in (Locker, Reservation):
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        return [sql.rstrip(';') for sql in editor.collected_sql]
+
+    def refresh_statistics(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE lockers_locker')
+                cursor.execute('ANALYZE lockers_reservation')
+            else:
+                cursor.execute('ANALYZE')
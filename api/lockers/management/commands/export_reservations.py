@@ -0,0 +1,56 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lockers import exports
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream reservation history as NDJSON or CSV to a file or stdout, '
+        'reading it through a server-side cursor in constant memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(exports.FORMATS), default='ndjson')
+        parser.add_argument('--output', '-o', default='-',
+                            help='Output file (default: stdout)')
+        parser.add_argument('--start', help='Only reservations made at or after this ISO date/datetime')
+        parser.add_argument('--end', help='Only reservations made before this ISO date/datetime')
+        parser.add_argument('--locker', help='Locker id')
+        parser.add_argument('--user', help='User id')
+        parser.add_argument('--active', help='true or false')
+        parser.add_argument('--archived', action='store_true',
+                            help='Export archived reservations (archive_reservations) instead')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per cursor fetch (default: EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        try:
+            filters = exports.filters_from_params(options)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        started = time.perf_counter()
+        queryset = exports.export_queryset(**filters)
+        lines = exports.export_lines(queryset, options['format'], chunk_size=options['chunk_size'])
+
+        path = options['output']
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        written = [0]
+
+        def counted(lines):
+            for line in lines:
+                written[0] += 1
+                yield line
+
+        try:
+            for block in exports.buffered(counted(lines)):
+                stream.write(block)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        rows = written[0] - (1 if options['format'] == 'csv' else 0)  # CSV header
+        self.stderr.write(f'Exported {rows} reservations in {time.perf_counter() - started:.2f}s')
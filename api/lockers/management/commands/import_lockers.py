@@ -0,0 +1,77 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+
+from lockers.services import bulk_create_lockers
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream lockers from a CSV (locker_number,location[,status]) or NDJSON file '
+        'and insert them in batches. Use "-" to read from stdin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows validated per duplicate-check query')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per INSERT statement')
+        parser.add_argument('--max-errors', type=int, default=50,
+                            help='Row errors to print (all are counted)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        started = time.perf_counter()
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc.strerror}')
+        try:
+            rows = self.read_csv(stream) if input_format == 'csv' else self.read_ndjson(stream)
+            result = bulk_create_lockers(
+                rows,
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size']
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - started
+
+        for error in result['errors'][:options['max_errors']]:
+            self.stderr.write(f"row {error['row']} ({error['locker_number']}): {json.dumps(error['errors'])}")
+        if result['failed'] > options['max_errors']:
+            self.stderr.write(f"... {result['failed'] - options['max_errors']} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} lockers, {result['failed']} rows rejected, "
+            f"in {elapsed:.2f}s"
+        ))
+
+    def read_csv(self, stream):
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or 'locker_number' not in reader.fieldnames:
+            raise CommandError('CSV needs a header row with at least locker_number and location')
+        for row in reader:
+            # Leave out empty optional columns so serializer defaults apply
+            yield {key: value for key, value in row.items() if value not in (None, '')}
+
+    def read_ndjson(self, stream):
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                # Reported with the other row errors; the import goes on
+                yield serializers.ValidationError({'non_field_errors': [f'Line {line_number}: invalid JSON ({exc})']})
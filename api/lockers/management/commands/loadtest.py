@@ -0,0 +1,425 @@
+import http.client
+import json
+import platform
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from lockers.models import LocationUsage, Locker, Site, Tombstone
+from lockers.services import deactivate_lockers, reactivate_lockers
+
+from .bench_endpoints import git
+
+PASSWORD = 'loadtest-pass-123'
+# The fleet only reserves lockers at this site, so other data is left alone
+LOCATION = 'Load test'
+KIOSK_PREFIX = 'loadtest_kiosk'
+DASHBOARD_PREFIX = 'loadtest_dashboard'
+KIOSK_ACTIONS = ('available', 'sync', 'active', 'reserve', 'unlock', 'release', 'refresh', 'login')
+DASHBOARD_ACTIONS = ('lockers', 'reservations', 'available', 'utilization', 'refresh')
+KIOSK_MIX = 'available=25,sync=10,active=15,reserve=15,unlock=20,release=10,refresh=3,login=2'
+DASHBOARD_MIX = 'lockers=40,reservations=30,available=20,utilization=10'
+# Statuses that are a normal answer to an action; anything else counts as an error
+EXPECTED = {'reserve': {201, 409}}
+
+
+def parse_mix(text, allowed):
+    """'available=35,unlock=20' -> {'available': 35, 'unlock': 20}"""
+    mix = {}
+    for item in filter(None, text.split(',')):
+        action, _, weight = item.partition('=')
+        if action not in allowed:
+            raise CommandError(f'Unknown action {action!r}; choose from {", ".join(allowed)}')
+        try:
+            mix[action] = float(weight)
+        except ValueError:
+            raise CommandError(f'Weight of {action} must be a number, got {weight!r}')
+    if not mix or sum(mix.values()) <= 0:
+        raise CommandError(f'Mix {text!r} has no positive weights')
+    return mix
+
+
+def summarize(samples, seconds):
+    """
+    Per-action throughput, error rate, statuses and latency percentiles from
+    {action: [(ms, status)]} collected over `seconds`. Status 0 is a failed
+    connection.
+    """
+    endpoints = {}
+    for action, rows in sorted(samples.items()):
+        timings = sorted(ms for ms, _ in rows)
+        statuses = Counter(status for _, status in rows)
+        errors = sum(count for status, count in statuses.items() if status not in EXPECTED.get(action, {200}))
+        percentiles = (statistics.quantiles(timings, n=100, method='inclusive')
+                       if len(timings) > 1 else timings * 99)
+        endpoints[action] = {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / seconds, 1),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'latency_ms': {
+                'p50': round(percentiles[49], 2),
+                'p95': round(percentiles[94], 2),
+                'p99': round(percentiles[98], 2),
+                'mean': round(statistics.mean(timings), 2),
+                'max': round(timings[-1], 2),
+            },
+        }
+    requests = sum(endpoint['requests'] for endpoint in endpoints.values())
+    errors = sum(endpoint['errors'] for endpoint in endpoints.values())
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / seconds, 1),
+        'error_rate': round(errors / requests, 4) if requests else 0,
+        'endpoints': endpoints,
+    }
+
+
+class Client:
+    """
+    One simulated kiosk or dashboard: its own keep-alive connection and
+    tokens, and at most one held reservation. Samples are kept per client
+    and merged after the run, so recording needs no lock.
+    """
+
+    def __init__(self, url, username, site_id, window):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+        self.username = username
+        self.site_id = site_id
+        self.window = window  # (start, stop) perf_counter times of the measured run
+        self.samples = defaultdict(list)
+        self.access = self.refresh_token = None
+        self.reservation = None
+        self.cursor = None
+
+    def request(self, action, method, path, body=None, auth=True):
+        headers = {'Content-Type': 'application/json'}
+        if auth:
+            headers['Authorization'] = f'Bearer {self.access}'
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, self.prefix + path,
+                                    body=None if body is None else json.dumps(body), headers=headers)
+            response = self.connection.getresponse()
+            status, content = response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnects on the next request
+            self.connection.close()
+            status, content = 0, b''
+        if self.window[0] <= start < self.window[1]:
+            self.samples[action].append(((time.perf_counter() - start) * 1000, status))
+        return status, content
+
+    def act(self, action):
+        # Kiosks hold one reservation at a time: unlocking or releasing
+        # without one reserves first, reserving while holding one releases it.
+        # A client whose login failed logs in again before anything else.
+        if self.access is None:
+            action = 'login'
+        elif action in ('unlock', 'release') and self.reservation is None:
+            action = 'reserve'
+        elif action == 'reserve' and self.reservation is not None:
+            action = 'release'
+        getattr(self, action)()
+
+    def login(self):
+        status, content = self.request('login', 'POST', '/api/auth/login/',
+                                       {'username': self.username, 'password': PASSWORD}, auth=False)
+        if status == 200:
+            tokens = json.loads(content)
+            self.access, self.refresh_token = tokens['access'], tokens['refresh']
+
+    def refresh(self):
+        status, content = self.request('refresh', 'POST', '/api/auth/refresh/',
+                                       {'refresh': self.refresh_token}, auth=False)
+        if status == 200:
+            self.access = json.loads(content)['access']
+
+    def available(self):
+        self.request('available', 'GET', '/api/lockers/available/?' + urlencode({'site': self.site_id, 'page_size': 20}))
+
+    def sync(self):
+        query = {'site': self.site_id, **({'cursor': self.cursor} if self.cursor else {})}
+        status, content = self.request('sync', 'GET', '/api/sync/?' + urlencode(query))
+        if status == 200:
+            self.cursor = json.loads(content)['cursor']
+
+    def active(self):
+        self.request('active', 'GET', '/api/reservations/active/')
+
+    def reserve(self):
+        until = (timezone.now() + timedelta(hours=1)).isoformat()
+        status, content = self.request('reserve', 'POST', '/api/reservations/allocate/',
+                                       {'reserved_until': until, 'site': self.site_id})
+        if status == 201:
+            self.reservation = json.loads(content)
+
+    def unlock(self):
+        self.request('unlock', 'POST', '/api/lockers/unlock/', {
+            'locker_number': self.reservation['locker_details']['locker_number'],
+            'access_pin': self.reservation['access_pin'],
+        })
+
+    def release(self):
+        self.request('release', 'PUT', f"/api/reservations/{self.reservation['id']}/release/")
+        self.reservation = None
+
+    def lockers(self):
+        self.request('lockers', 'GET', '/api/lockers/?' + urlencode({'site': self.site_id, 'page_size': 50}))
+
+    def reservations(self):
+        self.request('reservations', 'GET', '/api/reservations/all/?page_size=50')
+
+    def utilization(self):
+        self.request('utilization', 'GET', '/api/analytics/utilization/?' + urlencode({'location': LOCATION}))
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a running server (runserver, gunicorn, uvicorn) with a fleet of '
+        'simulated kiosks and admin dashboards over HTTP: log in, refresh tokens, '
+        'list, reserve, unlock and release in configurable mixes, then report '
+        'throughput, error rate and p50/p95/p99 latency per endpoint for each fleet '
+        'size. Run it with the same settings as the server: it creates its '
+        'accounts and lockers (site "Load test") in that database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Base URL of the running server')
+        parser.add_argument('--kiosks', default='50',
+                            help='Simultaneous kiosks; a comma-separated list runs each fleet size in turn')
+        parser.add_argument('--dashboards', type=int, default=2,
+                            help='Simultaneous admin dashboards')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Measured seconds per fleet size')
+        parser.add_argument('--warmup', type=float, default=5,
+                            help='Seconds of load before measuring (logins happen here)')
+        parser.add_argument('--think', type=float, default=500,
+                            help='Mean pause between a client\'s requests in ms (0: as fast as possible)')
+        parser.add_argument('--kiosk-mix', default=KIOSK_MIX,
+                            help=f'Kiosk action weights ({", ".join(KIOSK_ACTIONS)})')
+        parser.add_argument('--dashboard-mix', default=DASHBOARD_MIX,
+                            help=f'Dashboard action weights ({", ".join(DASHBOARD_ACTIONS)})')
+        parser.add_argument('--lockers', type=int, default=None,
+                            help='Lockers at the load test site (default: the largest fleet size)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--max-regression', type=float, default=None,
+                            help='With --compare, fail if an endpoint\'s p95 or a fleet\'s throughput '
+                                 'is this many percent worse, or its error rate is 1 point higher')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the load test accounts, lockers and reservations afterwards')
+
+    def handle(self, *args, **options):
+        try:
+            fleets = [int(size) for size in options['kiosks'].split(',') if size]
+        except ValueError:
+            raise CommandError('--kiosks must be a number or a comma-separated list of numbers')
+        if not fleets or min(fleets) < 0 or options['dashboards'] < 0:
+            raise CommandError('Fleet sizes must be 0 or more')
+        if options['duration'] <= 0:
+            raise CommandError('--duration must be positive')
+        mixes = {
+            KIOSK_PREFIX: parse_mix(options['kiosk_mix'], KIOSK_ACTIONS),
+            DASHBOARD_PREFIX: parse_mix(options['dashboard_mix'], DASHBOARD_ACTIONS),
+        }
+        baseline = self.load(options['compare']) if options['compare'] else None
+        self.check_server(options['url'])
+
+        site_id = self.prepare(max(fleets), options['dashboards'], options['lockers'] or max(fleets))
+        results = []
+        try:
+            for kiosks in fleets:
+                self.reset(site_id)
+                self.stdout.write(f"Running {kiosks} kiosks and {options['dashboards']} dashboards...")
+                result = {'kiosks': kiosks, 'dashboards': options['dashboards'],
+                          **self.run(kiosks, options, mixes, site_id)}
+                results.append(result)
+                self.print_result(result, baseline)
+            self.reset(site_id)
+        finally:
+            if options['cleanup']:
+                self.cleanup(site_id)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'meta': self.meta(options), 'results': results}, output, indent=2, sort_keys=True)
+                output.write('\n')
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline and options['max_regression'] is not None:
+            regressions = find_regressions(results, baseline, options['max_regression'])
+            if regressions:
+                raise CommandError('Performance regressed:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"No regression beyond {options['max_regression']:g}%"))
+
+    def check_server(self, url):
+        parts = urlsplit(url)
+        server = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        try:
+            server.request('GET', parts.path.rstrip('/') + '/api/lockers/')
+            server.getresponse().read()
+        except OSError as exc:
+            raise CommandError(f'No server at {url}: {exc}')
+        finally:
+            server.close()
+
+    def load(self, path):
+        try:
+            with open(path) as baseline:
+                return {(result['kiosks'], result['dashboards']): result for result in json.load(baseline)['results']}
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def prepare(self, kiosks, dashboards, lockers):
+        """Create the accounts and lockers the fleet uses; returns the load test site id"""
+        site_id = Site.objects.ids_for([LOCATION])[LOCATION]
+        # One hash for every account; logins still pay the full hasher cost
+        password = make_password(PASSWORD)
+        self.accounts(KIOSK_PREFIX, kiosks, password)
+        self.accounts(DASHBOARD_PREFIX, dashboards, password, is_staff=True)
+        existing = set(Locker.objects.filter(site_id=site_id).values_list('locker_number', flat=True))
+        Locker.objects.bulk_create([
+            Locker(locker_number=f'LOAD-{i}', location=LOCATION)
+            for i in range(lockers) if f'LOAD-{i}' not in existing
+        ])
+        return site_id
+
+    def accounts(self, prefix, count, password, is_staff=False):
+        existing = set(User.objects.filter(username__startswith=f'{prefix}_').values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username=username, password=password, is_staff=is_staff)
+            for username in (f'{prefix}_{i}' for i in range(count)) if username not in existing
+        ])
+
+    def reset(self, site_id):
+        """Release whatever the previous run still holds, so every fleet starts with all lockers free"""
+        lockers = Locker.objects.filter(site_id=site_id)
+        deactivate_lockers(lockers.exclude(status='available'))
+        reactivate_lockers(lockers)
+
+    def cleanup(self, site_id):
+        for prefix in (KIOSK_PREFIX, DASHBOARD_PREFIX):
+            User.objects.filter(username__startswith=f'{prefix}_').delete()
+        Locker.objects.filter(site_id=site_id).delete()
+        Site.objects.filter(id=site_id).delete()
+        Tombstone.objects.filter(site_id=site_id).delete()
+        LocationUsage.objects.filter(location=LOCATION).delete()
+        self.stdout.write('Removed the load test accounts and lockers')
+
+    def run(self, kiosks, options, mixes, site_id):
+        """One thread per client; samples from the warm-up period are dropped"""
+        start = time.perf_counter() + options['warmup']
+        window = (start, start + options['duration'])
+        think = options['think'] / 1000
+        clients = [
+            (Client(options['url'], f'{prefix}_{i}', site_id, window), mixes[prefix])
+            for prefix, count in ((KIOSK_PREFIX, kiosks), (DASHBOARD_PREFIX, options['dashboards']))
+            for i in range(count)
+        ]
+
+        def drive(client, mix, seed):
+            rng = random.Random(seed)
+            actions, weights = zip(*mix.items())
+            try:
+                while time.perf_counter() < window[1]:
+                    client.act(rng.choices(actions, weights)[0])
+                    if think:
+                        time.sleep(rng.uniform(0, 2 * think))
+            finally:
+                client.connection.close()
+
+        threads = [
+            threading.Thread(target=drive, args=(client, mix, options['seed'] * 100003 + n))
+            for n, (client, mix) in enumerate(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        samples = defaultdict(list)
+        for client, _ in clients:
+            for action, rows in client.samples.items():
+                samples[action].extend(rows)
+        return summarize(samples, options['duration'])
+
+    def meta(self, options):
+        return {
+            'commit': git('rev-parse', 'HEAD'),
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+            'timestamp': timezone.now().isoformat(),
+            'url': options['url'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'duration': options['duration'],
+            'warmup': options['warmup'],
+            'think_ms': options['think'],
+            'kiosk_mix': options['kiosk_mix'],
+            'dashboard_mix': options['dashboard_mix'],
+        }
+
+    def print_result(self, result, baseline):
+        previous = baseline and baseline.get((result['kiosks'], result['dashboards']))
+        self.stdout.write(
+            f"{result['kiosks']} kiosks, {result['dashboards']} dashboards: "
+            f"{result['throughput_rps']:.1f} requests/s, {result['error_rate']:.2%} errors"
+            + (f" (baseline {previous['throughput_rps']:.1f} requests/s)" if previous else '')
+        )
+        self.stdout.write(
+            f"  {'endpoint':<14}{'requests':>9}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            + ('   vs baseline' if previous else '')
+        )
+        for action, endpoint in result['endpoints'].items():
+            latency = endpoint['latency_ms']
+            line = (
+                f"  {action:<14}{endpoint['requests']:>9}{endpoint['throughput_rps']:>9.1f}"
+                f"{endpoint['error_rate']:>8.1%}{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+            )
+            before = previous and previous['endpoints'].get(action)
+            if before:
+                change = (latency['p95'] / before['latency_ms']['p95'] - 1) * 100
+                line += f"   p95 {change:+.1f}%, errors {(endpoint['error_rate'] - before['error_rate']) * 100:+.1f} pt"
+            self.stdout.write(line)
+
+
+def find_regressions(results, baseline, max_regression):
+    """Descriptions of every fleet size and endpoint that got worse than the allowed margin"""
+    regressions = []
+    limit = max_regression / 100
+    for result in results:
+        fleet = f"{result['kiosks']} kiosks"
+        previous = baseline.get((result['kiosks'], result['dashboards']))
+        if previous is None:
+            continue
+        if result['throughput_rps'] < previous['throughput_rps'] * (1 - limit):
+            regressions.append(f"{fleet}: {result['throughput_rps']} requests/s, was {previous['throughput_rps']}")
+        for action, endpoint in result['endpoints'].items():
+            before = previous['endpoints'].get(action)
+            if before is None:
+                continue
+            if endpoint['latency_ms']['p95'] > before['latency_ms']['p95'] * (1 + limit):
+                regressions.append(
+                    f"{fleet}, {action}: p95 {endpoint['latency_ms']['p95']} ms, was {before['latency_ms']['p95']} ms"
+                )
+            if endpoint['error_rate'] > before['error_rate'] + 0.01:
+                regressions.append(
+                    f"{fleet}, {action}: error rate {endpoint['error_rate']:.2%}, was {before['error_rate']:.2%}"
+                )
+    return regressions
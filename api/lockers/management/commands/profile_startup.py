@@ -0,0 +1,122 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def package(module):
+    """Group django by subpackage (django.db, django.contrib.admin), everything else by top-level package"""
+    parts = module.split('.')
+    if parts[0] == 'django':
+        return '.'.join(parts[:3 if len(parts) > 2 and parts[1] == 'contrib' else 2])
+    return parts[0]
+
+
+def import_times(stderr):
+    """Self time in seconds per package from `python -X importtime` output"""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[package(name.strip())] += int(self_us)
+    return {name: us / 1e6 for name, us in totals.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a cold worker start in fresh interpreters: settings, each app\'s '
+        'import / models / ready() during django.setup(), middleware, import time '
+        'per package (python -X importtime), and the first request with and '
+        'without core.startup.warm_up(). Reports the median of --runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Interpreters started per variant (the median is reported)')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Packages listed by import time')
+        parser.add_argument('--compare-api-only', action='store_true',
+                            help='Profile with API_ONLY=False and API_ONLY=True instead of the current setting')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the medians as JSON instead of a report')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be 1 or more')
+        if options['compare_api_only']:
+            variants = [('API_ONLY=False', {'API_ONLY': 'False'}), ('API_ONLY=True', {'API_ONLY': 'True'})]
+        else:
+            variants = [(f'API_ONLY={settings.API_ONLY}', {})]
+
+        results = {label: self.profile(env, options['runs']) for label, env in variants}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for label, result in results.items():
+            self.report(label, result, options)
+
+    def run(self, env, warm):
+        command = [sys.executable, '-X', 'importtime', '-m', 'core.startup'] + (['--warm-up'] if warm else [])
+        process = subprocess.run(
+            command, cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE'], **env},
+        )
+        if process.returncode:
+            raise CommandError(f'Startup profile failed:\n{process.stderr[-2000:]}')
+        return json.loads(process.stdout.splitlines()[-1]), import_times(process.stderr)
+
+    def profile(self, env, runs):
+        """Medians (in ms) of `runs` cold starts, and of `runs` starts with warm_up()"""
+        cold = [self.run(env, warm=False) for _ in range(runs)]
+        warm = [self.run(env, warm=True) for _ in range(runs)]
+
+        def median(values):
+            return round(statistics.median(values) * 1000, 1)
+
+        def phases(samples):
+            return {name: median([sample['phases'][name] for sample, _ in samples])
+                    for name in samples[0][0]['phases']}
+
+        apps = {
+            row['app']: {step: median([next(r for r in sample['apps'] if r['app'] == row['app']).get(step, 0)
+                                       for sample, _ in cold])
+                         for step in ('import', 'models', 'ready')}
+            for row in cold[0][0]['apps']
+        }
+        packages = {name: median([imports.get(name, 0) for _, imports in cold])
+                    for name in set().union(*(imports for _, imports in cold))}
+        return {
+            'cold': phases(cold),
+            'warm': phases(warm),
+            'apps': apps,
+            'imports': dict(sorted(packages.items(), key=lambda item: -item[1])),
+        }
+
+    def report(self, label, result, options):
+        cold, warm = result['cold'], result['warm']
+        self.stdout.write(f"{label} (median of {options['runs']} starts, ms)")
+        self.stdout.write(f"  {'settings':<30}{cold['settings']:>8.1f}")
+        self.stdout.write(f"  {'django.setup()':<30}{cold['apps']:>8.1f}    import  models   ready")
+        for app, steps in result['apps'].items():
+            self.stdout.write(f"    {app:<42}{steps['import']:>6.1f}  {steps['models']:>6.1f}  {steps['ready']:>6.1f}")
+        self.stdout.write(f"  {'handler (middleware)':<30}{cold['handler']:>8.1f}")
+        self.stdout.write(f"  {'ready to serve':<30}{cold['ready to serve']:>8.1f}")
+        self.stdout.write(f"  {'first request':<30}{cold['first request']:>8.1f}")
+        self.stdout.write(f"  {'second request':<30}{cold['second request']:>8.1f}")
+
+        steps = ', '.join(f"{name.split(': ', 1)[1]} {ms:.1f}" for name, ms in warm.items()
+                          if name.startswith('warm_up: '))
+        self.stdout.write(f"  With warm_up() ({warm['warm_up']:.1f}: {steps})")
+        self.stdout.write(f"  {'ready to serve':<30}{warm['ready to serve']:>8.1f}")
+        self.stdout.write(f"  {'first request':<30}{warm['first request']:>8.1f}")
+
+        self.stdout.write(f"  Import time by package (self, {sum(result['imports'].values()):.1f} total)")
+        for name, ms in list(result['imports'].items())[:options['top']]:
+            self.stdout.write(f"    {name:<40}{ms:>8.1f}")
+        self.stdout.write('')
@@ -0,0 +1,273 @@
+"""
+Per-request performance instrumentation.
+
+MetricsMiddleware times every request and tags it with the view that served
+it (`<basename>-<action>` for the viewsets, e.g. `locker-unlock`, otherwise
+the URL name). Each request records:
+- total latency
+- number of SQL queries and time spent in them (an execute wrapper installed
+  on every database connection; it is a no-op outside a request)
+- serialization time (TimedSerializerMixin) and response rendering time
+They are sent back in a Server-Timing header and aggregated into in-process
+histograms that GET /metrics exposes in the Prometheus text format.
+
+The histograms live in the worker process. With several worker processes each
+scrape sees one worker; scrape workers individually or put the metrics behind
+a multi-process collector.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework import serializers
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Any other request method is labelled `other`, so clients cannot add label values
+METHODS = frozenset({'GET', 'POST', 'PUT', 'PATCH', 'DELETE'})
+
+_current = ContextVar('lockers_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings collected while one request is being served"""
+    __slots__ = ('view', 'queries', 'db_time', 'serialize_time', 'render_time')
+
+    def __init__(self):
+        self.view = 'unmatched'
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, label_values, value):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+        # Non-cumulative here; exposition adds them up
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self.series.items()):
+            labels = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram(
+            'locker_api_request_duration_seconds', 'Total request latency.',
+            LATENCY_BUCKETS, ('view', 'method', 'status'))
+        self.db_time = Histogram(
+            'locker_api_request_db_seconds', 'Time spent in SQL queries per request.',
+            LATENCY_BUCKETS, ('view',))
+        self.db_queries = Histogram(
+            'locker_api_request_db_queries', 'SQL queries per request.',
+            QUERY_BUCKETS, ('view',))
+        self.serialize_time = Histogram(
+            'locker_api_request_serialize_seconds', 'Serializer and renderer time per request.',
+            LATENCY_BUCKETS, ('view',))
+
+    def record(self, metrics, method, status, duration):
+        view = (metrics.view,)
+        with self.lock:
+            self.duration.observe((metrics.view, method_label(method), str(status)), duration)
+            self.db_time.observe(view, metrics.db_time)
+            self.db_queries.observe(view, metrics.queries)
+            self.serialize_time.observe(view, metrics.serialize_time + metrics.render_time)
+
+    def expose(self):
+        with self.lock:
+            lines = []
+            for histogram in (self.duration, self.db_time, self.db_queries, self.serialize_time):
+                lines.extend(histogram.expose())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.__init__()
+
+
+registry = Registry()
+
+
+def method_label(method):
+    return method if method in METHODS else 'other'
+
+
+def view_tag(view_func, request):
+    """`<basename>-<action>` for viewset routes, else the URL name"""
+    actions = getattr(view_func, 'actions', None)
+    initkwargs = getattr(view_func, 'initkwargs', None) or {}
+    if actions and initkwargs.get('basename'):
+        method = method_label(request.method).lower()
+        return f"{initkwargs['basename']}-{actions.get(method, method)}"
+    match = request.resolver_match
+    return (match and match.url_name) or getattr(view_func, '__name__', 'unknown')
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+@receiver(connection_created, dispatch_uid='lockers.metrics.connection_created')
+def instrument_connection(sender, connection, **kwargs):
+    if settings.METRICS_ENABLED and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's duration to the current request's `<phase>_time`"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, f'{phase}_time', getattr(metrics, f'{phase}_time') + time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """Counts top-level serializer.data evaluation as serialization time"""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """list_serializer_class for timed serializers, so many=True is timed too"""
+
+
+def server_timing(metrics, duration):
+    return (
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+        f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+        f'render;dur={metrics.render_time * 1000:.2f}, '
+        f'total;dur={duration * 1000:.2f}'
+    )
+
+
+class MetricsMiddleware:
+    """Outermost middleware: times the request and records it (see module docstring)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def start(self):
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, start):
+        duration = time.perf_counter() - start
+        if metrics.view != 'metrics':
+            registry.record(metrics, request.method, response.status_code, duration)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(metrics, duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = view_tag(view_func, request)
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that too
+        metrics = _current.get()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_time += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    GET /metrics
+    Requires `Authorization: Bearer <METRICS_TOKEN>`; without a METRICS_TOKEN
+    it is only served with DEBUG on.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
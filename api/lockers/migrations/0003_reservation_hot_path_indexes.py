@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0002_reservation_access_pin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='locker',
+            index=models.Index(fields=['status'], name='locker_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='locker',
+            index=models.Index(condition=models.Q(('status', 'available')), fields=['id'], name='locker_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['locker', 'reserved_until'], name='reservation_active_locker_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'reserved_until'], name='reservation_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['reserved_until', 'id'], name='reservation_active_until_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', '-id'], name='reservation_user_history_idx'),
+        ),
+    ]
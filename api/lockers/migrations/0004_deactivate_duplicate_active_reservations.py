@@ -0,0 +1,30 @@
+# Data cleanup ahead of the one-active-reservation-per-locker constraint
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def deactivate_duplicate_active_reservations(apps, schema_editor):
+    """Keep only the latest-ending active reservation for each locker"""
+    Reservation = apps.get_model('lockers', 'Reservation')
+    duplicated = (
+        Reservation.objects.filter(is_active=True)
+        .values('locker_id')
+        .annotate(active=Count('id'))
+        .filter(active__gt=1)
+    )
+    for row in duplicated:
+        active = Reservation.objects.filter(locker_id=row['locker_id'], is_active=True)
+        keep = active.order_by('-reserved_until', '-id').values_list('id', flat=True).first()
+        active.exclude(id=keep).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0003_reservation_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(deactivate_duplicate_active_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0004_deactivate_duplicate_active_reservations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('locker',), name='one_active_reservation_per_locker'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0006_reservation_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=100)),
+                ('hour', models.DateTimeField()),
+                ('started', models.PositiveIntegerField(default=0)),
+                ('ended', models.PositiveIntegerField(default=0)),
+                ('occupied_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='location_usage_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location', 'hour'), name='location_usage_unique_hour')],
+            },
+        ),
+    ]
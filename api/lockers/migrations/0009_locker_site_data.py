@@ -0,0 +1,31 @@
+# Sites from the existing free-text locker locations
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def create_sites(apps, schema_editor):
+    """One site per distinct location, then one set-based UPDATE linking every locker to its site"""
+    Locker = apps.get_model('lockers', 'Locker')
+    Site = apps.get_model('lockers', 'Site')
+    names = Locker.objects.filter(site__isnull=True).values_list('location', flat=True).distinct()
+    now = timezone.now()
+    Site.objects.bulk_create(
+        [Site(name=name, created_at=now) for name in names], ignore_conflicts=True, batch_size=1000
+    )
+    # Site.name is unique and indexed, so the subquery is an index lookup per locker
+    Locker.objects.filter(site__isnull=True).update(
+        site_id=Subquery(Site.objects.filter(name=OuterRef('location')).values('id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0008_site'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Substring / prefix search (?search=) on PostgreSQL. The expressions match
+# what icontains compiles to there: UPPER("column"::text) LIKE UPPER('%term%')
+TRIGRAM_INDEXES = {
+    'locker_number_trgm_idx': ('lockers_locker', 'locker_number'),
+    'site_name_trgm_idx': ('lockers_site', 'name'),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0009_locker_site_data'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='locker',
+            name='site',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='lockers', to='lockers.site'),
+        ),
+        migrations.AddIndex(
+            model_name='locker',
+            index=models.Index(fields=['site', 'id'], name='locker_site_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='locker',
+            index=models.Index(condition=models.Q(('status', 'available')), fields=['site', 'id'], name='locker_site_available_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:29
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0011_archived_reservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=12)),
+                ('object_id', models.BigIntegerField()),
+                ('site_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField(null=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='locker',
+            index=models.Index(fields=['site', 'updated_at', 'id'], name='locker_site_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['updated_at', 'id'], name='reservation_active_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['site_id', 'deleted_at', 'id'], name='tombstone_site_deleted_idx'),
+        ),
+    ]
@@ -1,18 +1,100 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import random
 import string
 
+class SiteManager(models.Manager):
+
+    def ids_for(self, names):
+        """{name: site id} for these location names, creating missing sites"""
+        names = set(names)
+        ids = dict(self.filter(name__in=names).values_list('name', 'id'))
+        missing = names - ids.keys()
+        if missing:
+            # ignore_conflicts: a concurrent writer may create the same site
+            self.bulk_create([Site(name=name) for name in missing], ignore_conflicts=True)
+            ids.update(self.filter(name__in=missing).values_list('name', 'id'))
+        return ids
+
+
+class Site(models.Model):
+    """
+    A building or area holding lockers. Lockers keep the free-text `location`
+    they are created with; `Locker.site` is derived from it on save and bulk_create.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SiteManager()
+
+    def __str__(self):
+        return self.name
+
+
+class LockerManager(models.Manager):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() is not called here, so fill in the sites the same way in one pass
+        objs = list(objs)
+        unresolved = [locker for locker in objs if locker.site_id is None]
+        if unresolved:
+            ids = Site.objects.ids_for(locker.location for locker in unresolved)
+            for locker in unresolved:
+                locker.site_id = ids[locker.location]
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Locker(models.Model):
     locker_number = models.CharField(max_length=20, unique=True)
     location = models.CharField(max_length=100)
+    # Indexed by the (site, id) indexes below
+    site = models.ForeignKey(Site, on_delete=models.PROTECT, related_name='lockers',
+                             db_index=False, editable=False)
     status = models.CharField(max_length=20, default='available')  # available, reserved, inactive
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Last-Modified / ETag validators for the locker lists
+            models.Index(fields=['updated_at'], name='locker_updated_at_idx'),
+            # ?status= filter on the locker list
+            models.Index(fields=['status'], name='locker_status_idx'),
+            # /lockers/available/ pages through available lockers by id
+            models.Index(fields=['id'], condition=models.Q(status='available'),
+                         name='locker_available_idx'),
+            # /sites/<id>/lockers/ and ?site=, paged by id
+            models.Index(fields=['site', 'id'], name='locker_site_idx'),
+            # /sites/<id>/lockers/available/
+            models.Index(fields=['site', 'id'], condition=models.Q(status='available'),
+                         name='locker_site_available_idx'),
+            # /sync/?site= changes, in (updated_at, id) order
+            models.Index(fields=['site', 'updated_at', 'id'], name='locker_site_updated_idx'),
+            # ?search= uses trigram indexes on PostgreSQL (migration 0010)
+        ]
+
+    objects = LockerManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_location = instance.__dict__.get('location')
+        return instance
+
     def __str__(self):
         return f"Locker {self.locker_number} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        # Follow the location to its site on create and when it changes
+        if 'location' not in self.get_deferred_fields() and (
+                self.site_id is None or self.location != getattr(self, '_loaded_location', None)):
+            self.site_id = Site.objects.ids_for([self.location])[self.location]
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'site'}
+        super().save(*args, **kwargs)
+        self._loaded_location = self.location
+
 
 class Reservation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -21,6 +103,34 @@ class Reservation(models.Model):
     reserved_until = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     access_pin = models.CharField(max_length=6, blank=True)  # 6-digit PIN for physical access
+    updated_at = models.DateTimeField(auto_now=True)  # also set explicitly by bulk UPDATEs
+
+    class Meta:
+        indexes = [
+            # locker + is_active=True + reserved_until >= now
+            # (validate, release, destroy and unlock)
+            models.Index(fields=['locker', 'reserved_until'], condition=models.Q(is_active=True),
+                         name='reservation_active_locker_idx'),
+            # /reservations/active/ for a single user, soonest expiry first
+            models.Index(fields=['user', 'reserved_until'], condition=models.Q(is_active=True),
+                         name='reservation_active_user_idx'),
+            # /reservations/active/ for admins, and the expiry scan
+            models.Index(fields=['reserved_until', 'id'], condition=models.Q(is_active=True),
+                         name='reservation_active_until_idx'),
+            # /reservations/ history for a single user, newest first
+            models.Index(fields=['user', '-id'], name='reservation_user_history_idx'),
+            # Last-Modified / ETag validators (all reservations, and per user)
+            models.Index(fields=['updated_at'], name='reservation_updated_at_idx'),
+            models.Index(fields=['user', 'updated_at'], name='reservation_user_updated_idx'),
+            # /sync/ snapshot: active reservations in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], condition=models.Q(is_active=True),
+                         name='reservation_active_updated_idx'),
+        ]
+        constraints = [
+            # A locker can never be double-booked, whatever races the app layer has
+            models.UniqueConstraint(fields=['locker'], condition=models.Q(is_active=True),
+                                    name='one_active_reservation_per_locker'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} reserved {self.locker.locker_number}"
@@ -33,4 +143,96 @@ class Reservation(models.Model):
         # Auto-generate PIN on creation
         if not self.access_pin:
             self.access_pin = self.generate_pin()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class ArchivedReservation(models.Model):
+    """
+    Released reservations moved out of Reservation by archive_reservations
+    (services.archive_reservations), so the hot table holds only active and
+    recent rows. Keeps the original id; updated_at is when it ended.
+    Read with GET /api/reservations/archived/.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    locker = models.ForeignKey(Locker, on_delete=models.CASCADE)
+    reserved_at = models.DateTimeField()
+    reserved_until = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # /reservations/archived/ for a single user, newest first
+            models.Index(fields=['user', '-id'], name='archived_user_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} reserved {self.locker.locker_number} (archived)"
+
+
+class LocationUsage(models.Model):
+    """
+    Hourly reservation rollup per location, for the analytics endpoint.
+    Maintained from reservations_written (lockers/rollups.py) and rebuilt from
+    history with the rebuild_rollups command. Hours are UTC.
+    - started: reservations made during the hour
+    - ended: reservations released, expired or cut short by deactivation
+    - occupied_seconds: time ended reservations held a locker within the hour
+    """
+    location = models.CharField(max_length=100)
+    hour = models.DateTimeField()
+    started = models.PositiveIntegerField(default=0)
+    ended = models.PositiveIntegerField(default=0)
+    occupied_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'hour'], name='location_usage_unique_hour'),
+        ]
+        indexes = [
+            # Dashboard range queries across all locations
+            models.Index(fields=['hour'], name='location_usage_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.location} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+class TombstoneManager(models.Manager):
+
+    def record_reservations(self, reservations):
+        """Tombstones for the reservations in this queryset, before they are deleted (one INSERT)"""
+        return self.bulk_create([
+            Tombstone(kind='reservation', object_id=reservation_id, site_id=site_id, user_id=user_id)
+            for reservation_id, site_id, user_id in reservations.values_list('id', 'locker__site_id', 'user_id')
+        ])
+
+
+class Tombstone(models.Model):
+    """
+    A deleted locker or reservation, so GET /api/sync/ can tell kiosks to drop
+    it. Written where rows are deleted (lockers/sync.py); a locker's tombstone
+    also stands for its reservations. Archiving writes none: archived rows were
+    released long before and synced as such. Pruned by archive_reservations
+    after SYNC_TOMBSTONE_DAYS.
+    """
+    kind = models.CharField(max_length=12)  # locker, reservation
+    object_id = models.BigIntegerField()
+    # Plain ids, not foreign keys: tombstones outlive the rows they point at
+    site_id = models.BigIntegerField()
+    user_id = models.BigIntegerField(null=True)  # reservations only
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [
+            # /sync/ for every site (admins), and pruning
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+            # /sync/?site=
+            models.Index(fields=['site_id', 'deleted_at', 'id'], name='tombstone_site_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
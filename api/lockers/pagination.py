@@ -0,0 +1,109 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from urllib.parse import urlencode
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination shared by the locker and reservation lists.
+    Pages are fetched with `WHERE <ordering column> > <cursor>` instead of
+    OFFSET, so page N costs the same as page 1.
+    Clients can pick a page size with ?page_size=<n> (capped by API_MAX_PAGE_SIZE).
+    """
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class LockerCursorPagination(KeysetPagination):
+    """Lockers ordered by primary key"""
+    ordering = 'id'
+
+
+class SiteCursorPagination(KeysetPagination):
+    """Sites in name order"""
+    ordering = 'name'
+
+
+class ReservationCursorPagination(KeysetPagination):
+    """Reservation history, newest first"""
+    ordering = '-id'
+
+
+class ActiveReservationCursorPagination(KeysetPagination):
+    """Active reservations, soonest to expire first"""
+    ordering = ('reserved_until', 'id')
+
+
+class AsyncKeysetPagination:
+    """
+    Forward-only keyset pagination for the async views (DRF's paginators
+    evaluate querysets synchronously). Same page shape as the DRF lists:
+    {"next", "previous", "results"}; `previous` is always null.
+    The cursor is the ordering values of the last row on the page.
+    """
+    page_size = settings.API_PAGE_SIZE
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self, request, model):
+        encoded = request.GET.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            fields = [model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+            return [field.to_python(value) for field, value in zip(fields, values, strict=True)]
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def position_filter(self, values):
+        """WHERE (a, b) > (x, y), spelled out so each column can have its own direction"""
+        condition = Q()
+        for index in reversed(range(len(self.ordering))):
+            name = self.ordering[index].lstrip('-')
+            lookup = 'lt' if self.ordering[index].startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            if index < len(self.ordering) - 1:
+                step |= Q(**{name: values[index]}) & condition
+            condition = step
+        return condition
+
+    async def paginate(self, request, queryset):
+        """Fetch one page; returns (rows, next_url)"""
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position))
+
+        rows = [row async for row in queryset[:page_size + 1]]
+        if len(rows) <= page_size:
+            return rows, None
+
+        rows = rows[:page_size]
+        last = [getattr(rows[-1], name.lstrip('-')) for name in self.ordering]
+        # Full isoformat: DjangoJSONEncoder would drop microseconds from datetimes
+        last = [value.isoformat() if hasattr(value, 'isoformat') else value for value in last]
+        cursor = urlsafe_b64encode(json.dumps(last).encode()).decode()
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{urlencode({**request.GET.dict(), self.cursor_query_param: cursor})}'
+        )
+        return rows, next_url
@@ -35,4 +35,5 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         if request.user.is_staff:
             return True
         # Users can only access their own reservations
-        return obj.user == request.user
\ No newline at end of file
+        # (compare ids: request.user may be a token-backed ClaimsUser)
+        return obj.user_id == request.user.id
\ No newline at end of file
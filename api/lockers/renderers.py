@@ -0,0 +1,34 @@
+"""
+JSON renderer for the fast list path (lockers/fastread.py).
+
+Responses marked with `native_json = True` hold only dicts, lists, str, int,
+bool and None. For those, orjson (optional: pip install orjson) produces the
+same bytes as DRF's JSONRenderer in its default compact, UTF-8 mode, several
+times faster. Everything else, and every response when orjson is missing or
+an indent was asked for, is rendered by DRF as before.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if (
+            orjson is None or data is None or not getattr(response, 'native_json', False)
+            or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            # e.g. an integer beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        return rendered.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
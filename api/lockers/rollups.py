@@ -0,0 +1,164 @@
+"""
+Hourly usage rollup (LocationUsage) behind GET /api/analytics/utilization/.
+
+Kept current by a reservations_written receiver, i.e. by every create,
+release, expiry and deactivation path. A reservation counts as `started` in
+the hour it was made; when it ends, its occupancy is split over the hours it
+spanned and added to `occupied_seconds`, and it counts as `ended` in the hour
+it ended. rebuild() regenerates the table from history.
+
+The counters are incremented with F() upserts inside the transaction that
+changes the reservation, not after commit: a rollback undoes both, and a
+process dying between commit and an on_commit callback cannot lose an
+increment. The price is that the touched (location, hour) rows stay locked
+until that transaction commits; every caller announces last, just before
+committing, and rows are updated in key order so two writers cannot deadlock.
+"""
+from collections import defaultdict
+from itertools import chain
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, F, Q, Value
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ArchivedReservation, Locker, LocationUsage, Reservation
+from .signals import reservations_written
+
+HOUR = timedelta(hours=1)
+ENDING_ACTIONS = ('released', 'expired', 'deactivated')
+
+
+def truncate_hour(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def hour_buckets(start, end):
+    """Split [start, end) into (utc hour, seconds within that hour)"""
+    hour = truncate_hour(start)
+    while hour < end:
+        next_hour = hour + HOUR
+        seconds = (min(end, next_hour) - max(start, hour)).total_seconds()
+        if seconds > 0:
+            yield hour, seconds
+        hour = next_hour
+
+
+class Deltas:
+    """Counter increments per (location, hour), applied in one pass"""
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: {'started': 0, 'ended': 0, 'occupied_seconds': 0.0})
+
+    def started(self, location, reserved_at):
+        self.rows[location, truncate_hour(reserved_at)]['started'] += 1
+
+    def ended(self, location, reserved_at, ended_at):
+        self.rows[location, truncate_hour(ended_at)]['ended'] += 1
+        for hour, seconds in hour_buckets(reserved_at, ended_at):
+            self.rows[location, hour]['occupied_seconds'] += seconds
+
+    def apply(self):
+        """
+        Add the increments to LocationUsage; one UPDATE per touched row, in
+        the caller's transaction if there is one
+        """
+        with transaction.atomic(savepoint=False):
+            for (location, hour), values in sorted(self.rows.items()):
+                increments = {name: F(name) + value for name, value in values.items() if value}
+                if LocationUsage.objects.filter(location=location, hour=hour).update(**increments):
+                    continue
+                try:
+                    with transaction.atomic():
+                        LocationUsage.objects.create(location=location, hour=hour, **values)
+                except IntegrityError:
+                    # Created by a concurrent writer in the meantime
+                    LocationUsage.objects.filter(location=location, hour=hour).update(**increments)
+
+
+@receiver(reservations_written, dispatch_uid='lockers.rollups.reservations_written')
+def record_reservations(sender, reservations, action, **kwargs):
+    if action != 'created' and action not in ENDING_ACTIONS:
+        return
+    now = timezone.now()
+    deltas = Deltas()
+    for reservation in reservations:
+        if action == 'created':
+            deltas.started(reservation['location'], reservation['reserved_at'])
+        else:
+            # Expired reservations held the locker until reserved_until
+            ended_at = min(now, reservation['reserved_until'])
+            deltas.ended(reservation['location'], reservation['reserved_at'], ended_at)
+    deltas.apply()
+
+
+def rebuild(since=None, chunk_size=5000):
+    """
+    Regenerate LocationUsage from reservation history (all of it, or the
+    hours from `since` on). For ended reservations the release time is taken
+    from updated_at, which every release path sets. Archived reservations
+    (all ended) are read too. Returns rows written.
+    """
+    reservations = Reservation.objects.order_by()
+    archived = ArchivedReservation.objects.order_by()
+    rollups = LocationUsage.objects.all()
+    if since is not None:
+        since = truncate_hour(since)
+        # Reservations contributing to any hour >= since
+        reservations = reservations.filter(Q(reserved_at__gte=since) | Q(is_active=False, updated_at__gte=since))
+        archived = archived.filter(Q(reserved_at__gte=since) | Q(updated_at__gte=since))
+        rollups = rollups.filter(hour__gte=since)
+
+    deltas = Deltas()
+    columns = ('reserved_at', 'reserved_until', 'updated_at')
+    rows = chain(
+        reservations.values(*columns, 'is_active', location=F('locker__location')).iterator(chunk_size=chunk_size),
+        archived.values(*columns, location=F('locker__location'))
+        .annotate(is_active=Value(False, output_field=BooleanField())).iterator(chunk_size=chunk_size),
+    )
+    for row in rows:
+        deltas.started(row['location'], row['reserved_at'])
+        if not row['is_active']:
+            deltas.ended(row['location'], row['reserved_at'], min(row['updated_at'], row['reserved_until']))
+
+    new_rows = [
+        LocationUsage(location=location, hour=hour, **values)
+        for (location, hour), values in deltas.rows.items()
+        if since is None or hour >= since
+    ]
+    with transaction.atomic():
+        rollups.delete()
+        LocationUsage.objects.bulk_create(new_rows, batch_size=1000)
+    return len(new_rows)
+
+
+def utilization(start, end, location=None):
+    """
+    Dashboard data for [start, end): live locker counts per location and
+    status, and the hourly rollup rows with utilization = occupied time over
+    the location's bookable (not inactive) locker-hours.
+    """
+    lockers = Locker.objects.order_by()
+    usage = LocationUsage.objects.filter(hour__gte=truncate_hour(start), hour__lt=end)
+    if location:
+        lockers = lockers.filter(location=location)
+        usage = usage.filter(location=location)
+
+    status_counts = list(
+        lockers.values('location', 'status').annotate(count=Count('id')).order_by('location', 'status')
+    )
+    capacity = defaultdict(int)
+    for row in status_counts:
+        if row['status'] != 'inactive':
+            capacity[row['location']] += row['count']
+
+    hourly = list(usage.order_by('hour', 'location').values(
+        'location', 'hour', 'started', 'ended', 'occupied_seconds'
+    ))
+    for row in hourly:
+        lockers_available = capacity.get(row['location'])
+        row['utilization'] = (
+            round(row['occupied_seconds'] / (lockers_available * 3600), 4) if lockers_available else None
+        )
+    return {'status_counts': status_counts, 'hourly': hourly}
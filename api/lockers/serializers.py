@@ -1,11 +1,20 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Locker, Reservation
+from django.db import IntegrityError, OperationalError, connection, transaction
+from .authentication import record_login
+from .metrics import TimedListSerializer, TimedSerializerMixin
+from .models import ArchivedReservation, Locker, Reservation, Site
+from .signals import announce_lockers, announce_reservations
 from django.utils import timezone
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -49,10 +58,32 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_staff']
 
 
-class LockerSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Accepts fields={key: None | {nested keys}} (see fieldsets.parse_selection)
+    and renders only those fields
+    """
+
+    def __init__(self, *args, **kwargs):
+        selection = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if selection is None:
+            return
+        for name in list(self.fields):
+            if name not in selection:
+                self.fields.pop(name)
+            elif selection[name]:
+                nested = self.fields[name]
+                for nested_name in list(nested.fields):
+                    if nested_name not in selection[name]:
+                        nested.fields.pop(nested_name)
+
+
+class LockerSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Locker
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
         read_only_fields = ['created_at', 'updated_at']
 
     def validate_locker_number(self, value):
@@ -67,7 +98,37 @@ class LockerSerializer(serializers.ModelSerializer):
         return value
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class SiteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Site
+        fields = ['id', 'name', 'created_at']
+
+
+class LockerBulkItemSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk locker import.
+    Uniqueness of locker_number is checked per chunk by bulk_create_lockers,
+    not with a query per row.
+    """
+    status = serializers.ChoiceField(choices=['available', 'inactive'], default='available')
+
+    class Meta:
+        model = Locker
+        fields = ['locker_number', 'location', 'status']
+        extra_kwargs = {'locker_number': {'validators': []}}
+
+
+# SQLSTATE lock_not_available: raised by SELECT ... FOR UPDATE NOWAIT on PostgreSQL
+LOCK_NOT_AVAILABLE = '55P03'
+
+
+def lock_not_available(exc):
+    """Whether a database error is a NOWAIT lock conflict (psycopg2 or psycopg 3)"""
+    cause = exc.__cause__
+    return (getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)) == LOCK_NOT_AVAILABLE
+
+
+class ReservationSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     locker = serializers.PrimaryKeyRelatedField(queryset=Locker.objects.all())
     locker_details = LockerSerializer(source='locker', read_only=True)
@@ -77,6 +138,7 @@ class ReservationSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'locker', 'locker_details', 'reserved_at', 
                   'reserved_until', 'is_active', 'access_pin']
         read_only_fields = ['id', 'user', 'reserved_at', 'is_active', 'access_pin']
+        list_serializer_class = TimedListSerializer
 
     def validate_reserved_until(self, value):
         if value <= timezone.now():
@@ -84,22 +146,23 @@ class ReservationSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
+        # Cheap early rejection; create() re-checks under a row lock
         locker = data.get('locker')
-        
-        # Check if locker is available
-        if locker.status != 'available':
-            raise serializers.ValidationError({
-                'locker': f"Locker {locker.locker_number} is not available."
-            })
 
         # Check for overlapping reservations
-        reserved_until = data.get('reserved_until')
         overlapping = Reservation.objects.filter(
             locker=locker,
             is_active=True,
             reserved_until__gte=timezone.now()
         ).exists()
 
+        # Check if locker is available. A 'reserved' locker whose reservation
+        # has run out is left to create(), which expires it under the row lock.
+        if locker.status != 'available' and (locker.status != 'reserved' or overlapping):
+            raise serializers.ValidationError({
+                'locker': f"Locker {locker.locker_number} is not available."
+            })
+
         if overlapping:
             raise serializers.ValidationError({
                 'locker': f"Locker {locker.locker_number} is already reserved."
@@ -108,17 +171,82 @@ class ReservationSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        # Create reservation
-        reservation = Reservation.objects.create(**validated_data)
-        
-        # Update locker status
-        locker = reservation.locker
-        locker.status = 'reserved'
-        locker.save()
-        
+        locker = validated_data.pop('locker')
+        already_reserved = serializers.ValidationError({
+            'locker': f"Locker {locker.locker_number} is already reserved."
+        })
+
+        with transaction.atomic():
+            # Lock the locker row so concurrent reservations for it cannot interleave.
+            # NOWAIT: if someone else is reserving it right now, fail fast instead of queueing.
+            # Other errors (lost connection, statement timeout) are not a conflict and propagate.
+            nowait = connection.features.has_select_for_update_nowait
+            try:
+                locker = Locker.objects.select_for_update(nowait=nowait).get(pk=locker.pk)
+            except OperationalError as exc:
+                if not lock_not_available(exc):
+                    raise
+                raise already_reserved
+
+            # Reservations that ran out but were not picked up by the expiry worker yet
+            now = timezone.now()
+            stale = list(locker.reservation_set.filter(is_active=True, reserved_until__lt=now))
+            if stale:
+                Reservation.objects.filter(id__in=[r.id for r in stale]).update(
+                    is_active=False, updated_at=now
+                )
+                for reservation in stale:
+                    reservation.is_active = False
+                announce_reservations(stale, 'expired')
+            if stale and locker.status == 'reserved':
+                locker.status = 'available'
+
+            if locker.status != 'available':
+                raise serializers.ValidationError({
+                    'locker': f"Locker {locker.locker_number} is not available."
+                })
+
+            # The one_active_reservation_per_locker constraint is the final word on double booking
+            try:
+                with transaction.atomic():
+                    reservation = Reservation.objects.create(locker=locker, **validated_data)
+            except IntegrityError:
+                raise already_reserved
+
+            Locker.objects.filter(pk=locker.pk).update(status='reserved', updated_at=now)
+            locker.status = 'reserved'
+            locker.updated_at = now
+            reservation.locker = locker
+            announce_lockers([locker])
+            announce_reservations([reservation], 'created')
+
         return reservation
 
 
+class ReservationAllocateSerializer(serializers.Serializer):
+    """Input of POST /api/reservations/allocate/: when, and optionally where"""
+    reserved_until = serializers.DateTimeField()
+    site = serializers.IntegerField(required=False)
+    location = serializers.CharField(required=False, max_length=100)
+
+    def validate_reserved_until(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError("Reservation end time must be in the future.")
+        return value
+
+
+class ArchivedReservationSerializer(serializers.ModelSerializer):
+    """Read-only: archived reservations are released ones, so there is no PIN or is_active"""
+    user = serializers.StringRelatedField()
+    locker_details = LockerSerializer(source='locker', read_only=True)
+
+    class Meta:
+        model = ArchivedReservation
+        fields = ['id', 'user', 'locker', 'locker_details', 'reserved_at',
+                  'reserved_until', 'updated_at', 'archived_at']
+        read_only_fields = fields
+
+
 class ReservationReleaseSerializer(serializers.Serializer):
     """Serializer for releasing a reservation"""
     pass  # No fields needed, just for endpoint consistency
@@ -0,0 +1,281 @@
+"""
+Set-based state transitions for lockers and reservations.
+These run as a handful of UPDATE statements instead of per-row save() calls,
+so they stay cheap no matter how many rows they touch.
+"""
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import ArchivedReservation, Locker, Reservation, Tombstone
+from .serializers import LockerBulkItemSerializer
+from .signals import announce_lockers, announce_reservations
+
+
+def active_reservations(now=None):
+    """Reservations that are active and not yet past reserved_until"""
+    return Reservation.objects.filter(
+        is_active=True,
+        reserved_until__gte=now or timezone.now()
+    )
+
+
+def free_lockers(locker_ids, now=None):
+    """
+    Move reserved lockers back to available, skipping any locker that still
+    has an active reservation. Returns the number of lockers freed.
+    """
+    now = now or timezone.now()
+    return Locker.objects.filter(
+        id__in=locker_ids,
+        status='reserved'
+    ).exclude(
+        Exists(active_reservations(now).filter(locker=OuterRef('pk')))
+    ).update(status='available', updated_at=now)
+
+
+def expire_overdue_reservations(batch_size=1000, now=None):
+    """
+    Expire one batch of reservations whose reserved_until has passed and free
+    their lockers, in a single transaction.
+    Rows locked by a concurrent worker are skipped, so several workers can run
+    side by side. Returns (expired_reservations, freed_lockers).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Reservation.objects.filter(is_active=True, reserved_until__lt=now)
+            .order_by('reserved_until', 'id')
+            .select_for_update(skip_locked=True, of=('self',))
+            .values('id', 'user_id', 'locker_id', 'reserved_at', 'reserved_until',
+                    locker_number=F('locker__locker_number'),
+                    location=F('locker__location'))[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        expired = Reservation.objects.filter(
+            id__in=[reservation['id'] for reservation in batch]
+        ).update(is_active=False, updated_at=now)
+        locker_ids = {reservation['locker_id'] for reservation in batch}
+        freed = free_lockers(locker_ids, now)
+
+        for reservation in batch:
+            reservation['is_active'] = False
+        announce_reservations(batch, 'expired')
+        if freed:
+            announce_lockers(list(locker_ids))
+    return expired, freed
+
+
+def archive_reservations(before, batch_size=1000, now=None):
+    """
+    Move one batch of released reservations that ended (updated_at) before
+    `before` to ArchivedReservation, in a single transaction: one SELECT,
+    one INSERT, one DELETE. Rows locked by a concurrent worker are skipped.
+    Returns the number of reservations archived.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Reservation.objects.filter(is_active=False, updated_at__lt=before)
+            .order_by('updated_at', 'id')
+            .select_for_update(skip_locked=True)
+            .values('id', 'user_id', 'locker_id', 'reserved_at', 'reserved_until', 'updated_at')[:batch_size]
+        )
+        if not batch:
+            return 0
+        ArchivedReservation.objects.bulk_create(
+            [ArchivedReservation(archived_at=now, **row) for row in batch]
+        )
+        Reservation.objects.filter(id__in=[row['id'] for row in batch]).delete()
+    return len(batch)
+
+
+def prune_tombstones(before):
+    """Delete sync tombstones older than `before`; returns how many"""
+    return Tombstone.objects.filter(deleted_at__lt=before).delete()[0]
+
+
+def allocate_locker(user_id, reserved_until, site_id=None, location=None, attempts=5):
+    """
+    Reserve any available locker (optionally at one site or location) for
+    user_id, in one transaction: claim the lowest free locker id with
+    SELECT ... FOR UPDATE SKIP LOCKED, create the reservation (and its PIN),
+    mark the locker reserved. Concurrent callers skip each other's locked rows
+    instead of queueing behind them or failing on the same locker.
+    Returns the Reservation with its locker, or None if nothing is free.
+    """
+    lockers = Locker.objects.filter(status='available')
+    if site_id is not None:
+        lockers = lockers.filter(site_id=site_id)
+    if location is not None:
+        lockers = lockers.filter(location=location)
+
+    tried = []
+    for _ in range(attempts):
+        with transaction.atomic():
+            locker = (
+                lockers.exclude(id__in=tried).order_by('id')
+                .select_for_update(skip_locked=True).first()
+            )
+            if locker is None:
+                return None
+            try:
+                # An active reservation the status does not reflect yet; the
+                # one_active_reservation_per_locker constraint catches it
+                with transaction.atomic():
+                    reservation = Reservation.objects.create(
+                        user_id=user_id, locker=locker, reserved_until=reserved_until
+                    )
+            except IntegrityError:
+                tried.append(locker.id)
+                continue
+
+            now = timezone.now()
+            Locker.objects.filter(pk=locker.pk).update(status='reserved', updated_at=now)
+            locker.status = 'reserved'
+            locker.updated_at = now
+            announce_lockers([locker])
+            announce_reservations([reservation], 'created')
+            return reservation
+    return None
+
+
+def deactivate_lockers(lockers, now=None):
+    """
+    Deactivate every locker in the `lockers` queryset and release their active
+    reservations, in one transaction:
+    - one SELECT ... FOR UPDATE of the lockers
+    - one SELECT of their active reservations joined with the users
+    - one UPDATE for the reservations, one for the lockers
+    Returns {'locker_ids', 'reservations'}; each reservation dict also has
+    username and email.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Locking the lockers keeps new reservations out while we release
+        locker_ids = list(lockers.select_for_update().order_by('id').values_list('id', flat=True))
+        if not locker_ids:
+            return {'locker_ids': [], 'reservations': []}
+
+        reservations = list(
+            Reservation.objects.filter(locker_id__in=locker_ids, is_active=True)
+            .order_by('locker_id', 'id')
+            .values('id', 'user_id', 'locker_id', 'reserved_at', 'reserved_until',
+                    locker_number=F('locker__locker_number'),
+                    location=F('locker__location'),
+                    username=F('user__username'),
+                    email=F('user__email'))
+        )
+        if reservations:
+            Reservation.objects.filter(
+                id__in=[reservation['id'] for reservation in reservations]
+            ).update(is_active=False, updated_at=now)
+            for reservation in reservations:
+                reservation['is_active'] = False
+            announce_reservations(reservations, 'deactivated')
+
+        Locker.objects.filter(id__in=locker_ids).update(status='inactive', updated_at=now)
+        announce_lockers(locker_ids)
+    return {'locker_ids': locker_ids, 'reservations': reservations}
+
+
+def reactivate_lockers(lockers, now=None):
+    """
+    Make the inactive lockers in the `lockers` queryset available again with a
+    single UPDATE. Returns the ids that changed.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        locker_ids = list(
+            lockers.filter(status='inactive').select_for_update().order_by('id').values_list('id', flat=True)
+        )
+        if locker_ids:
+            Locker.objects.filter(id__in=locker_ids).update(status='available', updated_at=now)
+            announce_lockers(locker_ids)
+    return locker_ids
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_create_lockers(rows, chunk_size=5000, batch_size=1000):
+    """
+    Validate and insert lockers from an iterable of dicts, chunk by chunk, so
+    the input can be streamed. Each chunk costs one query to find locker
+    numbers that already exist plus the bulk INSERTs.
+    Invalid rows are reported and skipped; they never abort the import.
+    A row may be a ValidationError, for input the caller could not parse;
+    it is reported like any other invalid row.
+    Created lockers are announced (lockers_changed) as each chunk commits.
+    Returns {'created': int, 'failed': int, 'errors': [{'row', 'locker_number', 'errors'}]}.
+    """
+    item_serializer = LockerBulkItemSerializer()
+    seen = set()
+    created = 0
+    errors = []
+
+    def reject(row_number, locker_number, detail):
+        errors.append({'row': row_number, 'locker_number': locker_number, 'errors': detail})
+
+    for chunk_index, chunk in enumerate(_chunks(rows, chunk_size)):
+        first_row = chunk_index * chunk_size + 1
+        valid = []
+        for row_number, row in enumerate(chunk, start=first_row):
+            if isinstance(row, serializers.ValidationError):
+                reject(row_number, None, row.detail)
+                continue
+            try:
+                data = item_serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                reject(row_number, row.get('locker_number') if isinstance(row, dict) else None, exc.detail)
+                continue
+            if data['locker_number'] in seen:
+                reject(row_number, data['locker_number'],
+                       {'locker_number': ['Duplicate locker number in import.']})
+                continue
+            seen.add(data['locker_number'])
+            valid.append((row_number, data))
+
+        existing = set(Locker.objects.filter(
+            locker_number__in=[data['locker_number'] for _, data in valid]
+        ).values_list('locker_number', flat=True))
+        pending = []
+        for row_number, data in valid:
+            if data['locker_number'] in existing:
+                reject(row_number, data['locker_number'],
+                       {'locker_number': ['Locker number already exists.']})
+            else:
+                pending.append((row_number, Locker(**data)))
+
+        try:
+            with transaction.atomic():
+                Locker.objects.bulk_create([locker for _, locker in pending], batch_size=batch_size)
+        except IntegrityError:
+            # Another writer inserted some of these numbers after the check above;
+            # check once more and insert whatever is still free
+            taken = set(Locker.objects.filter(
+                locker_number__in=[locker.locker_number for _, locker in pending]
+            ).values_list('locker_number', flat=True))
+            for row_number, locker in pending:
+                if locker.locker_number in taken:
+                    reject(row_number, locker.locker_number,
+                           {'locker_number': ['Locker number already exists.']})
+            pending = [(row_number, locker) for row_number, locker in pending
+                       if locker.locker_number not in taken]
+            Locker.objects.bulk_create([locker for _, locker in pending], batch_size=batch_size)
+        created += len(pending)
+        announce_lockers([locker for _, locker in pending])
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'failed': len(errors), 'errors': errors}
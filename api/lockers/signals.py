@@ -0,0 +1,77 @@
+"""
+Signals for locker and reservation state transitions.
+
+They are sent once the surrounding transaction commits, from every code path
+that changes state, including the set-based bulk UPDATEs that bypass
+post_save. Receivers get plain dicts, never model instances.
+
+reservations_written carries the same arguments as reservations_changed but is
+sent straight away, inside the caller's transaction, for receivers whose
+writes must commit or roll back with the change (lockers/rollups.py).
+
+lockers_changed:      lockers=[{'id', 'locker_number', 'location', 'status'}]
+reservations_changed: reservations=[{'id', 'user_id', 'locker_id', 'locker_number',
+                      'location', 'is_active', 'reserved_at', 'reserved_until'}],
+                      action='created' | 'updated' | 'released' | 'expired' | 'deactivated'
+"""
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Locker, Reservation
+
+lockers_changed = Signal()
+reservations_changed = Signal()
+reservations_written = Signal()
+
+LOCKER_FIELDS = ('id', 'locker_number', 'location', 'status')
+
+
+def announce_lockers(lockers):
+    """
+    Send lockers_changed after commit. lockers can mix Locker instances and ids;
+    ids are loaded in one query after commit, so receivers see the final state.
+    """
+    payload = [
+        {field: getattr(locker, field) for field in LOCKER_FIELDS}
+        for locker in lockers if isinstance(locker, Locker)
+    ]
+    pending_ids = [locker for locker in lockers if not isinstance(locker, Locker)]
+
+    def send():
+        if pending_ids:
+            payload.extend(Locker.objects.filter(id__in=pending_ids).values(*LOCKER_FIELDS))
+        if payload:
+            lockers_changed.send(sender=Locker, lockers=payload)
+
+    transaction.on_commit(send)
+
+
+def reservation_payload(reservation):
+    # reservation.locker must already be loaded (select_related or assigned)
+    return {
+        'id': reservation.id,
+        'user_id': reservation.user_id,
+        'locker_id': reservation.locker_id,
+        'locker_number': reservation.locker.locker_number,
+        'location': reservation.locker.location,
+        'is_active': reservation.is_active,
+        'reserved_at': reservation.reserved_at,
+        'reserved_until': reservation.reserved_until,
+    }
+
+
+def announce_reservations(reservations, action):
+    """
+    Send reservations_written now and reservations_changed after commit.
+    reservations is a list of Reservation instances or of dicts shaped like
+    reservation_payload().
+    """
+    payload = [
+        reservation_payload(reservation) if isinstance(reservation, Reservation) else reservation
+        for reservation in reservations
+    ]
+    if payload:
+        reservations_written.send(sender=Reservation, reservations=payload, action=action)
+        transaction.on_commit(
+            lambda: reservations_changed.send(sender=Reservation, reservations=payload, action=action)
+        )
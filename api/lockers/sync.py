@@ -0,0 +1,201 @@
+"""
+Delta sync for kiosks (GET /api/sync/).
+
+A client starts without a cursor and receives a snapshot of the lockers and
+active reservations in its scope, then polls with the returned cursor and
+receives only what changed since. Every response is at most SYNC_PAGE_SIZE
+rows per stream; `more` asks the client to call again straight away.
+
+Three streams are read in (timestamp, id) order, each with one indexed query:
+- lockers by updated_at: changed lockers, or a tombstone when inactive
+- reservations by updated_at: active ones, or a tombstone once released,
+  expired or deactivated
+- tombstones by deleted_at: lockers and reservations deleted outright
+
+updated_at is set before commit, so a transaction can commit with an older
+timestamp than one already synced. Caught-up streams therefore restart
+SYNC_OVERLAP_SECONDS back; clients upsert by id, so the repeats are harmless.
+
+The cursor is base64 JSON: the site, whether a snapshot is still being sent
+and when it began, and each stream's (microseconds, id) position.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .fastread import locker_reader, reservation_reader
+from .models import Locker, Reservation, Tombstone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+STREAMS = ('lockers', 'reservations', 'tombstones')
+
+
+def to_micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Cursor state, or ValueError if the token was not made by encode_cursor"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        positions = [state['positions'][stream] for stream in STREAMS]
+        if not all(isinstance(value, int) for position in positions for value in position) or any(
+                len(position) != 2 for position in positions):
+            raise ValueError
+        if not isinstance(state['started'], int) or not isinstance(state['snapshot'], bool):
+            raise ValueError
+        return state
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def snapshot_state(site_id, now):
+    """A cursor state that sends everything in scope, as of now"""
+    return {
+        'site': site_id,
+        'snapshot': True,
+        'started': to_micros(now),
+        'positions': {
+            'lockers': [0, 0],
+            'reservations': [0, 0],
+            # Deletions from the moment the snapshot starts
+            'tombstones': [to_micros(now) - overlap(), 0],
+        },
+    }
+
+
+def delta_cursor(site_id, since):
+    """A cursor for the changes after `since`, as if a client had synced then"""
+    position = [to_micros(since), 0]
+    return encode_cursor({
+        'site': site_id, 'snapshot': False, 'started': position[0],
+        'positions': dict.fromkeys(STREAMS, position),
+    })
+
+
+def overlap():
+    """SYNC_OVERLAP_SECONDS in microseconds"""
+    return settings.SYNC_OVERLAP_SECONDS * 1_000_000
+
+
+def scoped(user, site_id, snapshot):
+    """{stream: (queryset, timestamp field)} visible to `user`"""
+    lockers = Locker.objects.all()
+    reservations = Reservation.objects.all()
+    tombstones = Tombstone.objects.all()
+    if site_id is not None:
+        lockers = lockers.filter(site_id=site_id)
+        reservations = reservations.filter(locker__site_id=site_id)
+        tombstones = tombstones.filter(site_id=site_id)
+    if not user.is_staff:
+        reservations = reservations.filter(user_id=user.id)
+        tombstones = tombstones.filter(Q(kind='locker') | Q(user_id=user.id))
+    if snapshot:
+        # Rows that change while the snapshot is paged are sent again afterwards
+        lockers = lockers.exclude(status='inactive')
+        reservations = reservations.filter(is_active=True)
+    return {
+        'lockers': (locker_reader.read(lockers), 'updated_at'),
+        'reservations': (reservation_reader.read(reservations, extra=('updated_at',)), 'updated_at'),
+        'tombstones': (tombstones.values('id', 'kind', 'object_id', 'deleted_at'), 'deleted_at'),
+    }
+
+
+def read_page(rows, field, position, limit):
+    """Rows after position in (field, id) order; limit + 1 are fetched to tell if more remain"""
+    moment, last_id = from_micros(position[0]), position[1]
+    # A plain range on the timestamp (not "> t OR (= t AND id >)"), so the
+    # planner can start from the timestamp index rather than the site's rows
+    after = Q(**{f'{field}__gte': moment}) & ~Q(**{field: moment, 'id__lte': last_id})
+    return list(rows.filter(after).order_by(field, 'id')[:limit + 1])
+
+
+def changes(user, site_id=None, cursor=None, now=None):
+    """
+    One sync response for `user`: lockers and reservations in scope (a site,
+    or all), tombstones, the next cursor, and whether more remain. Raises
+    ValueError for a cursor that is malformed or belongs to another site.
+    """
+    now = now or timezone.now()
+    limit = settings.SYNC_PAGE_SIZE
+    state = decode_cursor(cursor) if cursor else None
+    if state is not None and state['site'] != site_id:
+        raise ValueError('Cursor belongs to a different site')
+    # Tombstones older than the cursor may have been pruned: start over
+    expired = state is not None and not state['snapshot'] and (
+        state['positions']['tombstones'][0] < to_micros(now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)))
+    reset = state is None or expired
+    if reset:
+        state = snapshot_state(site_id, now)
+
+    horizon = [to_micros(now) - overlap(), 0]
+    positions = dict(state['positions'])
+    pages = {}
+    more = False
+    for stream, (rows, field) in scoped(user, site_id, state['snapshot']).items():
+        page = read_page(rows, field, positions[stream], limit)
+        if len(page) > limit:
+            page = page[:limit]
+            positions[stream] = [to_micros(page[-1][field]), page[-1]['id']]
+            more = True
+        else:
+            positions[stream] = max(positions[stream], horizon)
+        pages[stream] = page
+
+    snapshot = state['snapshot']
+    if snapshot and not more:
+        # Snapshot complete: resend everything that changed since it began
+        snapshot = False
+        positions['lockers'] = positions['reservations'] = [state['started'] - overlap(), 0]
+
+    tz = timezone.get_current_timezone()
+    lockers, reservations, tombstones = [], [], []
+    for row in pages['lockers']:
+        if row['status'] == 'inactive':
+            tombstones.append({'type': 'locker', 'id': row['id'], 'reason': 'inactive'})
+        else:
+            lockers.append(locker_reader.represent(row, tz))
+    for row in pages['reservations']:
+        if row['is_active']:
+            reservations.append(reservation_reader.represent(row, tz))
+        else:
+            tombstones.append({'type': 'reservation', 'id': row['id'], 'reason': 'released'})
+    tombstones.extend({'type': row['kind'], 'id': row['object_id'], 'reason': 'deleted'} for row in pages['tombstones'])
+
+    return {
+        'reset': reset,
+        'lockers': lockers,
+        'reservations': reservations,
+        'tombstones': tombstones,
+        'more': more,
+        'cursor': encode_cursor({**state, 'snapshot': snapshot, 'positions': positions}),
+    }
+
+
+@receiver(post_delete, sender=Locker, dispatch_uid='lockers.sync.locker_deleted')
+def locker_deleted(sender, instance, **kwargs):
+    # Lockers are deactivated by the API; this covers the admin site and scripts.
+    # Their reservations are deleted with them and need no tombstones of their own.
+    Tombstone.objects.create(kind='locker', object_id=instance.id, site_id=instance.site_id)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='lockers.sync.user_deleted')
+def user_deleted(sender, instance, **kwargs):
+    # Released ones were already synced as released
+    Tombstone.objects.record_reservations(Reservation.objects.filter(user_id=instance.id, is_active=True))
@@ -1,3 +1,1534 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.database import connection_settings
+from core.startup import routed_views, warm_up
+
+from .events import Subscription, get_backend
+from .management.commands.loadtest import KIOSK_ACTIONS, find_regressions, parse_mix, summarize
+from .management.commands.profile_startup import import_times
+from . import metrics
+from . import rollups
+from . import unlock_cache
+from .models import ArchivedReservation, Locker, LocationUsage, Reservation, Site, Tombstone
+from .services import archive_reservations, deactivate_lockers, expire_overdue_reservations, prune_tombstones
+from .signals import announce_reservations, lockers_changed, reservations_changed
+from .sync import delta_cursor
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountTests(APITestCase):
+    """
+    Every list and detail endpoint must run a fixed number of queries,
+    no matter how many rows it returns.
+    Requests are force-authenticated, so the JWT user lookup is not counted.
+    Conditional lists add two validator aggregates (max updated_at, count).
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('alice', password='pass12345')
+        self.until = timezone.now() + timedelta(hours=2)
+        cache.clear()
+
+    def make_reservations(self, count, user=None):
+        reservations = []
+        for i in range(count):
+            locker = Locker.objects.create(
+                locker_number=f'Q{Locker.objects.count() + 1}',
+                location='Block A',
+                status='reserved'
+            )
+            reservations.append(Reservation.objects.create(
+                user=user or self.user,
+                locker=locker,
+                reserved_until=self.until
+            ))
+        return reservations
+
+    def assert_constant_queries(self, url, expected, user=None, grow=None):
+        """Request url, add more rows with grow(), and request it again"""
+        self.client.force_authenticate(user or self.admin)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        if grow:
+            grow()
+            with self.assertNumQueries(expected):
+                self.client.get(url)
+        return response
+
+    def test_locker_list(self):
+        self.make_reservations(3)
+        self.assert_constant_queries('/api/lockers/', 3,
+                                     grow=lambda: self.make_reservations(5))
+
+    def test_locker_available(self):
+        Locker.objects.create(locker_number='F1', location='Block A')
+        self.assert_constant_queries(
+            '/api/lockers/available/', 3,
+            grow=lambda: Locker.objects.create(locker_number='F2', location='Block B')
+        )
+
+    def test_locker_detail(self):
+        locker = Locker.objects.create(locker_number='D1', location='Block A')
+        self.assert_constant_queries(f'/api/lockers/{locker.id}/', 1)
+
+    def test_reservation_list_admin(self):
+        self.make_reservations(3)
+        response = self.assert_constant_queries('/api/reservations/', 1,
+                                                grow=lambda: self.make_reservations(5))
+        self.assertEqual(response.data['results'][0]['user'], 'alice')
+
+    def test_reservation_list_user(self):
+        self.make_reservations(3)
+        self.assert_constant_queries('/api/reservations/', 1, user=self.user,
+                                     grow=lambda: self.make_reservations(5))
+
+    def test_reservation_active(self):
+        self.make_reservations(3)
+        self.assert_constant_queries('/api/reservations/active/', 3, user=self.user,
+                                     grow=lambda: self.make_reservations(5))
+
+    def test_reservation_all(self):
+        self.make_reservations(3)
+        self.assert_constant_queries('/api/reservations/all/', 1,
+                                     grow=lambda: self.make_reservations(5))
+
+    def test_reservation_detail(self):
+        reservation = self.make_reservations(1)[0]
+        response = self.assert_constant_queries(f'/api/reservations/{reservation.id}/', 1,
+                                                user=self.user)
+        self.assertEqual(response.data['locker_details']['id'], reservation.locker_id)
+
+    def test_unlock(self):
+        reservation = self.make_reservations(1)[0]
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(2):  # cache miss: locker + reservation
+            response = self.client.post('/api/lockers/unlock/', {
+                'locker_number': reservation.locker.locker_number,
+                'access_pin': reservation.access_pin
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reservation']['user'], 'alice')
+
+    def test_destroy_releases_reservations_in_fixed_queries(self):
+        reservation = self.make_reservations(1)[0]
+        self.client.force_authenticate(self.admin)
+        # get_object, savepoint, lock, select reservations + users, 2 UPDATEs,
+        # rollup upsert (UPDATE, savepoint, INSERT, release), release
+        with self.assertNumQueries(11):
+            response = self.client.delete(f'/api/lockers/{reservation.locker_id}/')
+        self.assertEqual(response.data['affected_reservations']['count'], 1)
+        self.assertEqual(response.data['affected_reservations']['users'][0]['username'], 'alice')
+        self.assertFalse(Reservation.objects.filter(locker=reservation.locker, is_active=True).exists())
+
+
+class PaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='pass12345')
+        self.client.force_authenticate(self.user)
+        Locker.objects.bulk_create(
+            Locker(locker_number=f'P{i}', location='Block P') for i in range(7)
+        )
+
+    def test_follows_cursor_through_all_pages(self):
+        seen = []
+        url = '/api/lockers/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            seen.extend(locker['locker_number'] for locker in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [f'P{i}' for i in range(7)])
+
+
+class FastReadTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('reader', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('zoë', password='pass12345')
+        lockers = [
+            Locker.objects.create(locker_number=f'F{i}', location=['Bloc É', 'Hall\u2028East', 'Gym "B"'][i % 3])
+            for i in range(7)
+        ]
+        until = timezone.now() + timedelta(hours=1, microseconds=123)
+        for i, locker in enumerate(lockers[:4]):
+            Reservation.objects.create(user=self.user if i % 2 else self.admin, locker=locker,
+                                       reserved_until=until + timedelta(minutes=i), access_pin=f'{i:06d}')
+        Locker.objects.filter(pk__in=[locker.pk for locker in lockers[:4]]).update(status='reserved')
+        Reservation.objects.filter(locker=lockers[3]).update(is_active=False)
+
+    def pages(self, url, fast):
+        bodies = []
+        with self.settings(FAST_READ_PATH=fast):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                bodies.append(response.content)
+                url = json.loads(response.content)['next']
+        return bodies
+
+    def test_list_pages_are_byte_identical_to_the_serializers(self):
+        urls = [
+            '/api/lockers/?page_size=3', '/api/lockers/available/?page_size=2',
+            '/api/reservations/?page_size=3', '/api/reservations/active/?page_size=2',
+            '/api/reservations/all/?page_size=3',
+        ]
+        for user in (self.admin, self.user):
+            self.client.force_authenticate(user)
+            for url in urls:
+                if url.endswith('all/?page_size=3') and not user.is_staff:
+                    continue
+                with self.subTest(user=user.username, url=url):
+                    fast = self.pages(url, True)
+                    self.assertEqual(fast, self.pages(url, False))
+                    self.assertIn(b'\\u2028', b''.join(fast))
+
+        with timezone.override('UTC'):
+            self.client.force_authenticate(self.admin)
+            fast = self.pages('/api/reservations/', True)
+            self.assertEqual(fast, self.pages('/api/reservations/', False))
+            self.assertIn(b'Z"', fast[0])
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('kiosk', password='pass12345')
+        self.client.force_authenticate(self.user)
+        lockers = [Locker.objects.create(locker_number=f'K{i}', location='Block K') for i in range(3)]
+        until = timezone.now() + timedelta(hours=1)
+        self.reservations = [
+            Reservation.objects.create(user=self.user, locker=locker, reserved_until=until + timedelta(minutes=i))
+            for i, locker in enumerate(lockers[:2])
+        ]
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, [query['sql'] for query in queries]
+
+    def test_locker_fields_narrow_output_and_columns(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(FAST_READ_PATH=fast):
+                response, queries = self.get('/api/lockers/?fields=id,locker_number,status&page_size=2')
+                self.assertEqual(list(response.data['results'][0]), ['id', 'locker_number', 'status'])
+                self.assertIsNotNone(response.data['next'])
+                page_query = queries[-1]
+                self.assertIn('"locker_number"', page_query)
+                self.assertNotIn('"created_at"', page_query)
+
+    def test_reservations_skip_the_locker_join_unless_selected(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), self.settings(FAST_READ_PATH=fast):
+                response, queries = self.get('/api/reservations/active/?fields=id,reserved_until')
+                self.assertEqual([list(row) for row in response.data['results']], [['id', 'reserved_until']] * 2)
+                self.assertNotIn('lockers_locker', queries[-1])
+                self.assertNotIn('auth_user', queries[-1])
+
+                response, queries = self.get(
+                    '/api/reservations/?fields=id,locker_details.locker_number,locker_details.status'
+                )
+                self.assertEqual(response.data['results'][0]['locker_details'], {
+                    'locker_number': 'K1', 'status': 'available'
+                })
+                self.assertIn('lockers_locker', queries[-1])
+
+                response, _ = self.get('/api/reservations/?fields=id&expand=locker_details')
+                self.assertEqual(list(response.data['results'][0]), ['id', 'locker_details'])
+                self.assertEqual(len(response.data['results'][0]['locker_details']), 7)
+
+    def test_retrieve_with_fields(self):
+        reservation = self.reservations[0]
+        response, queries = self.get(f'/api/reservations/{reservation.id}/?fields=id,locker,is_active')
+        self.assertEqual(response.data, {'id': reservation.id, 'locker': reservation.locker_id, 'is_active': True})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('lockers_locker', queries[0])
+
+    def test_unknown_fields_are_rejected(self):
+        for url in ('/api/lockers/?fields=id,secret', '/api/reservations/?fields=locker.id',
+                    '/api/reservations/?fields=id&expand=user', '/api/lockers/?fields=,'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 400)
+
+
+class SiteTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('siteadmin', password='pass12345', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        Locker.objects.bulk_create([
+            Locker(locker_number='N-101', location='North Hall'),
+            Locker(locker_number='N-102', location='North Hall', status='reserved'),
+            Locker(locker_number='S-201', location='South Hall'),
+            Locker(locker_number='GYM-1', location='Gym'),
+        ])
+        self.north = Site.objects.get(name='North Hall')
+
+    def numbers(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [locker['locker_number'] for locker in response.data['results']]
+
+    def test_site_follows_location(self):
+        self.assertEqual(Site.objects.count(), 3)
+        self.assertEqual(Locker.objects.filter(site=self.north).count(), 2)
+
+        response = self.client.post('/api/lockers/', {'locker_number': 'N-103', 'location': 'North Hall'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['site'], self.north.id)
+
+        response = self.client.patch(f"/api/lockers/{response.data['id']}/", {'location': 'East Wing'})
+        self.assertEqual(response.data['site'], Site.objects.get(name='East Wing').id)
+        # The site is read-only; location decides it
+        response = self.client.patch(f"/api/lockers/{response.data['id']}/", {'site': self.north.id})
+        self.assertEqual(response.data['site'], Site.objects.get(name='East Wing').id)
+
+        result = self.client.post('/api/lockers/bulk/', [
+            {'locker_number': 'W-1', 'location': 'West Hall'},
+            {'locker_number': 'N-104', 'location': 'North Hall'},
+        ], format='json')
+        self.assertEqual(result.data['created'], 2)
+        self.assertEqual(Locker.objects.get(locker_number='N-104').site_id, self.north.id)
+        self.assertTrue(Site.objects.filter(name='West Hall').exists())
+
+    def test_lockers_by_site(self):
+        self.assertEqual(self.numbers(f'/api/sites/{self.north.id}/lockers/'), ['N-101', 'N-102'])
+        self.assertEqual(self.numbers(f'/api/sites/{self.north.id}/lockers/available/'), ['N-101'])
+        self.assertEqual(self.numbers(f'/api/lockers/?site={self.north.id}&status=reserved'), ['N-102'])
+        self.assertEqual(self.numbers(f'/api/lockers/available/?site={self.north.id}'), ['N-101'])
+        self.assertEqual(self.client.get('/api/sites/999999/lockers/').status_code, 404)
+        self.assertEqual(self.client.get('/api/lockers/?site=north').status_code, 400)
+
+    def test_search(self):
+        # Substring of a locker number or of a site name, case-insensitive
+        self.assertEqual(self.numbers('/api/lockers/?search=gym'), ['GYM-1'])
+        self.assertEqual(self.numbers('/api/lockers/?search=hall'), ['N-101', 'N-102', 'S-201'])
+        self.assertEqual(self.numbers('/api/lockers/?search=-20'), ['S-201'])
+        self.assertEqual(self.numbers(f'/api/sites/{self.north.id}/lockers/?search=102'), ['N-102'])
+
+        response = self.client.get('/api/sites/?search=HALL')
+        self.assertEqual([site['name'] for site in response.data['results']], ['North Hall', 'South Hall'])
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('frank', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.locker = Locker.objects.create(locker_number='C1', location='Block C')
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_list_returns_304_without_listing(self):
+        response = self.client.get('/api/lockers/available/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(2):  # validators only
+            cached = self.revalidate('/api/lockers/available/', response)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_status_change_invalidates_filtered_list(self):
+        Locker.objects.create(locker_number='C2', location='Block C')
+        response = self.client.get('/api/lockers/available/')
+        # One locker leaves the list and another enters: the count stays the same
+        Locker.objects.filter(pk=self.locker.pk).update(status='inactive', updated_at=timezone.now())
+        Locker.objects.create(locker_number='C3', location='Block C')
+        self.assertEqual(self.revalidate('/api/lockers/available/', response).status_code, 200)
+
+    def test_release_invalidates_active_reservations(self):
+        reservation = self.client.post('/api/reservations/', {
+            'locker': self.locker.id,
+            'reserved_until': (timezone.now() + timedelta(hours=1)).isoformat()
+        }, format='json').data
+        response = self.client.get('/api/reservations/active/')
+        self.assertEqual(self.revalidate('/api/reservations/active/', response).status_code, 304)
+        self.client.put(f"/api/reservations/{reservation['id']}/release/")
+        refreshed = self.revalidate('/api/reservations/active/', response)
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(refreshed.data['results'], [])
+
+    def test_locker_edit_invalidates_active_reservations(self):
+        self.client.post('/api/reservations/', {
+            'locker': self.locker.id,
+            'reserved_until': (timezone.now() + timedelta(hours=1)).isoformat()
+        }, format='json')
+        response = self.client.get('/api/reservations/active/')
+        Locker.objects.filter(pk=self.locker.pk).update(location='Block D', updated_at=timezone.now())
+        refreshed = self.revalidate('/api/reservations/active/', response)
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed['ETag'], response['ETag'])
+        self.assertEqual(refreshed.data['results'][0]['locker_details']['location'], 'Block D')
+
+
+class EventTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('gina', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.locker = Locker.objects.create(locker_number='S1', location='Block S')
+        self.received = []
+        for signal in (lockers_changed, reservations_changed):
+            signal.connect(self.record, dispatch_uid=f'test-{id(signal)}')
+            self.addCleanup(signal.disconnect, dispatch_uid=f'test-{id(signal)}')
+
+    def record(self, signal, **kwargs):
+        self.received.append((kwargs.get('action', 'locker'), kwargs))
+
+    def test_transitions_are_announced_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = self.client.post('/api/reservations/', {
+                'locker': self.locker.id,
+                'reserved_until': (timezone.now() + timedelta(hours=1)).isoformat()
+            }, format='json').data
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/reservations/{reservation['id']}/release/")
+
+        self.assertEqual([kind for kind, _ in self.received], ['locker', 'created', 'locker', 'released'])
+        self.assertEqual(self.received[2][1]['lockers'][0]['status'], 'available')
+
+    def test_expiry_is_announced(self):
+        Reservation.objects.create(user=self.user, locker=self.locker,
+                                   reserved_until=timezone.now() - timedelta(minutes=1))
+        Locker.objects.filter(pk=self.locker.pk).update(status='reserved')
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_overdue_reservations()
+        self.assertEqual([kind for kind, _ in self.received], ['expired', 'locker'])
+        self.assertEqual(self.received[0][1]['reservations'][0]['locker_number'], 'S1')
+
+    async def test_reservation_events_only_reach_owner_and_admins(self):
+        owner = Subscription(user_id=1, is_staff=False)
+        other = Subscription(user_id=2, is_staff=False)
+        admin = Subscription(user_id=3, is_staff=True)
+        backend = get_backend()
+        for subscription in (owner, other, admin):
+            backend.subscribe(subscription)
+        try:
+            reservations_changed.send(sender=Reservation, action='updated', reservations=[{
+                'id': 7, 'user_id': 1, 'locker_id': 1, 'locker_number': 'S1',
+                'location': 'Block S', 'is_active': True, 'reserved_at': timezone.now(),
+                'reserved_until': timezone.now()
+            }])
+            lockers_changed.send(sender=Locker, lockers=[
+                {'id': 1, 'locker_number': 'S1', 'location': 'Block S', 'status': 'reserved'}
+            ])
+            await asyncio.sleep(0)
+        finally:
+            for subscription in (owner, other, admin):
+                backend.unsubscribe(subscription)
+
+        self.assertEqual(owner.queue.qsize(), 2)
+        self.assertEqual(other.queue.qsize(), 1)
+        self.assertEqual(admin.queue.qsize(), 2)
+        self.assertEqual((await other.queue.get())['event'], 'locker')
+
+    async def test_stream_requires_a_valid_token(self):
+        response = await self.async_client.get('/api/events/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/events/?token=not-a-token')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_sends_events(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get(f'/api/events/?token={token}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        lockers_changed.send(sender=Locker, lockers=[
+            {'id': 1, 'locker_number': 'S1', 'location': 'Block S', 'status': 'inactive'}
+        ])
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertTrue(chunk.startswith(b'event: locker\ndata: {"id":1,'))
+        await stream.aclose()
+
+    async def test_stream_authorizes_from_user_status_not_claims(self):
+        cache.clear()
+        token = AccessToken.for_user(self.user)
+        token['is_staff'] = True
+        response = await self.async_client.get(f'/api/events/?token={token}')
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        subscriptions = get_backend().subscribers[asyncio.get_running_loop()]
+        self.assertEqual([subscription.is_staff for subscription in subscriptions], [False])
+        await stream.aclose()
+
+        self.user.is_active = False
+        await self.user.asave()
+        response = await self.async_client.get(f'/api/events/?token={token}')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(LOCKER_EVENTS_HEARTBEAT=0)
+    async def test_stream_closes_when_admin_is_demoted(self):
+        cache.clear()
+        self.user.is_staff = True
+        await self.user.asave()
+        response = await self.async_client.get(f'/api/events/?token={AccessToken.for_user(self.user)}')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        self.assertEqual(await anext(stream), b': keep-alive\n\n')
+        self.user.is_staff = False
+        await self.user.asave()
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(stream), 1)
+
+
+class UnlockCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('hank', password='pass12345')
+        self.other = User.objects.create_user('ivy', password='pass12345')
+        self.admin = User.objects.create_user('boss', password='pass12345', is_staff=True)
+        self.locker = Locker.objects.create(locker_number='U1', location='Block U')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservation = self.client.post('/api/reservations/', {
+                'locker': self.locker.id,
+                'reserved_until': (timezone.now() + timedelta(hours=1)).isoformat()
+            }, format='json').data
+
+    def unlock(self, pin=None, user=None):
+        self.client.force_authenticate(user or self.user)
+        return self.client.post('/api/lockers/unlock/', {
+            'locker_number': 'U1', 'access_pin': pin or self.reservation['access_pin']
+        }, format='json')
+
+    def test_hit_runs_no_queries(self):
+        self.assertEqual(self.unlock().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.unlock()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['locker']['locker_number'], 'U1')
+        self.assertEqual(response.data['reservation']['user'], 'hank')
+
+    def test_cached_entry_still_checks_pin_and_owner(self):
+        self.unlock()
+        wrong_pin = '000000' if self.reservation['access_pin'] != '000000' else '111111'
+        self.assertEqual(self.unlock(pin=wrong_pin).status_code, 403)
+        self.assertEqual(self.unlock(user=self.other).status_code, 403)
+        self.assertEqual(self.unlock(user=self.admin).status_code, 200)
+
+    def test_release_and_deactivation_invalidate_the_entry(self):
+        self.unlock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/reservations/{self.reservation['id']}/release/")
+        self.assertEqual(self.unlock().status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/lockers/{self.locker.id}/')
+        response = self.unlock()
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('deactivated', response.data['error'])
+
+    def test_invalidation_during_a_load_is_not_overwritten(self):
+        load_entry = unlock_cache.load_entry
+
+        def load_then_release(locker_number):
+            entry = load_entry(locker_number)
+            # Released and invalidated by another request while this one was loading
+            Reservation.objects.filter(pk=self.reservation['id']).update(is_active=False)
+            unlock_cache.invalidate([locker_number])
+            return entry
+
+        with mock.patch.object(unlock_cache, 'load_entry', load_then_release):
+            self.assertEqual(self.unlock().status_code, 200)
+        self.assertEqual(self.unlock().status_code, 403)
+
+    def test_delete_invalidates_the_entry_and_frees_the_locker(self):
+        self.assertEqual(self.unlock().status_code, 200)
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/reservations/{self.reservation['id']}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.unlock().status_code, 403)
+        self.locker.refresh_from_db()
+        self.assertEqual(self.locker.status, 'available')
+        self.assertEqual(Tombstone.objects.filter(kind='reservation', object_id=self.reservation['id']).count(), 1)
+
+
+class AsyncViewTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('root', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('jane', password='pass12345')
+        self.other = User.objects.create_user('kim', password='pass12345')
+        lockers = [Locker.objects.create(locker_number=f'Y{i}', location='Block Y') for i in range(5)]
+        until = timezone.now() + timedelta(hours=1)
+        self.reservations = [
+            Reservation.objects.create(user=user, locker=locker, reserved_until=until + timedelta(minutes=i))
+            for i, (user, locker) in enumerate([(self.user, lockers[0]), (self.other, lockers[1])])
+        ]
+        Locker.objects.filter(pk__in=[lockers[0].pk, lockers[1].pk]).update(status='reserved')
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    async def test_responses_match_the_sync_api(self):
+        reservation = self.reservations[0]
+        paths = [
+            'lockers/', 'lockers/?status=reserved', 'lockers/available/',
+            f'lockers/{reservation.locker_id}/', 'reservations/', 'reservations/active/',
+            f'reservations/{reservation.id}/',
+        ]
+        for user in (self.user, self.admin):
+            for path in paths:
+                sync = await self.async_client.get(f'/api/{path}', headers=self.auth(user))
+                response = await self.async_client.get(f'/api/async/{path}', headers=self.auth(user))
+                self.assertEqual(response.status_code, 200, path)
+                self.assertEqual(response.content, sync.content, path)
+
+        body = {'locker_number': 'Y0', 'access_pin': reservation.access_pin}
+        response = await self.async_client.post('/api/async/lockers/unlock/', body,
+                                                content_type='application/json', headers=self.auth(self.user))
+        sync = await self.async_client.post('/api/lockers/unlock/', body,
+                                            content_type='application/json', headers=self.auth(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, sync.content)
+
+    async def test_filters_and_fields_match_the_sync_api(self):
+        other_site = await Locker.objects.acreate(locker_number='Z0', location='Block Z')
+        reservation = self.reservations[0]
+        paths = [
+            f'lockers/?site={other_site.site_id}', 'lockers/?search=block+z', 'lockers/?search=y3',
+            f'lockers/available/?site={other_site.site_id}', 'lockers/available/?fields=id,locker_number',
+            f'lockers/{reservation.locker_id}/?fields=status',
+            'reservations/?fields=id,locker_details.locker_number',
+            'reservations/active/?fields=id&expand=locker_details',
+            f'reservations/{reservation.id}/?fields=access_pin',
+        ]
+        for path in paths:
+            sync = await self.async_client.get(f'/api/{path}', headers=self.auth(self.user))
+            response = await self.async_client.get(f'/api/async/{path}', headers=self.auth(self.user))
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.content, sync.content, path)
+        response = await self.async_client.get(f'/api/async/lockers/?site={other_site.site_id}',
+                                               headers=self.auth(self.user))
+        self.assertEqual([locker['locker_number'] for locker in response.json()['results']], ['Z0'])
+
+        for path in ('lockers/?site=north', 'lockers/?fields=nope'):
+            response = await self.async_client.get(f'/api/async/{path}', headers=self.auth(self.user))
+            self.assertEqual(response.status_code, 400, path)
+
+    async def test_authentication_and_permissions(self):
+        response = await self.async_client.get('/api/async/lockers/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await self.async_client.get('/api/async/lockers/', headers={'Authorization': 'Bearer junk'})
+        self.assertEqual(response.status_code, 401)
+
+        other_reservation = self.reservations[1]
+        response = await self.async_client.get(f'/api/async/reservations/{other_reservation.id}/',
+                                               headers=self.auth(self.user))
+        self.assertEqual(response.status_code, 404)
+
+        body = {'locker_number': 'Y1', 'access_pin': other_reservation.access_pin}
+        response = await self.async_client.post('/api/async/lockers/unlock/', body,
+                                                content_type='application/json', headers=self.auth(self.user))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.post('/api/async/lockers/', {}, headers=self.auth(self.admin))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_follows_cursor_through_all_pages(self):
+        seen = []
+        url = '/api/async/lockers/?page_size=2'
+        while url:
+            response = await self.async_client.get(url, headers=self.auth(self.user))
+            seen += [locker['locker_number'] for locker in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(seen, [f'Y{i}' for i in range(5)])
+
+        seen = []
+        url = '/api/async/reservations/active/?page_size=1'
+        while url:
+            response = await self.async_client.get(url, headers=self.auth(self.admin))
+            seen += [reservation['id'] for reservation in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(seen, [reservation.id for reservation in self.reservations])
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    """Real tokens (not force_authenticate) through ClaimsJWTAuthentication"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('lena', password='pass12345')
+        self.locker = Locker.objects.create(locker_number='Z1', location='Block Z')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_cached_status_skips_the_user_query(self):
+        with self.assertNumQueries(2):  # user status + locker
+            response = self.client.get(f'/api/lockers/{self.locker.id}/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/lockers/{self.locker.id}/')
+
+    def test_account_changes_apply_on_save(self):
+        self.client.get('/api/lockers/')
+        response = self.client.post('/api/lockers/', {'locker_number': 'Z2', 'location': 'Block Z'})
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post('/api/lockers/', {'locker_number': 'Z2', 'location': 'Block Z'})
+        self.assertEqual(response.status_code, 201)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/lockers/').status_code, 401)
+
+    def test_owner_checks_compare_ids(self):
+        self.client.post('/api/reservations/', {
+            'locker': self.locker.id, 'reserved_until': (timezone.now() + timedelta(hours=1)).isoformat()
+        }, format='json')
+        reservation = Reservation.objects.get()
+        self.assertEqual(reservation.user, self.user)
+        response = self.client.put(f'/api/reservations/{reservation.id}/release/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['released_by'], 'user')
+
+    def test_last_login_is_written_once_per_interval(self):
+        self.client.credentials()
+        login = {'username': 'lena', 'password': 'pass12345'}
+        self.assertEqual(self.client.post('/api/auth/login/', login).status_code, 200)
+        self.user.refresh_from_db()
+        first_login = self.user.last_login
+        self.assertIsNotNone(first_login)
+
+        self.client.post('/api/auth/login/', login)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, first_login)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('auditor', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('mona', password='pass12345')
+        self.lockers = [Locker.objects.create(locker_number=f'X{i}', location='Block X') for i in range(3)]
+        for locker in self.lockers:
+            Reservation.objects.create(user=self.user, locker=locker, is_active=False,
+                                       reserved_until=timezone.now() + timedelta(hours=1))
+        self.client.force_authenticate(self.admin)
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/reservations/export/{query}')
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_streams_every_row_in_one_query(self):
+        with self.assertNumQueries(1):
+            response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['locker_number'] for row in rows], ['X0', 'X1', 'X2'])
+        self.assertEqual(rows[0]['username'], 'mona')
+        api_row = self.client.get(f"/api/reservations/{rows[0]['id']}/").data
+        self.assertEqual(rows[0]['reserved_until'], api_row['reserved_until'])
+
+    def test_csv_with_filters(self):
+        response, body = self.export(f'?fmt=csv&locker={self.lockers[1].id}&active=false')
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'user_id', 'username'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn(',X1,', lines[1])
+
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        _, body = self.export(f'?start={tomorrow}')
+        self.assertEqual(body, '')
+
+    def test_rejects_bad_parameters_and_non_admins(self):
+        self.assertEqual(self.client.get('/api/reservations/export/?fmt=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/reservations/export/?start=yesterday').status_code, 400)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/reservations/export/').status_code, 403)
+
+
+class RollupTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('analyst', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('nora', password='pass12345')
+        self.lockers = [Locker.objects.create(locker_number=f'R{i}', location='Block R') for i in range(2)]
+        self.client.force_authenticate(self.user)
+
+    def reserve(self, locker):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/reservations/', {
+                'locker': locker.id, 'reserved_until': (timezone.now() + timedelta(hours=1)).isoformat()
+            }, format='json')
+        return Reservation.objects.get(pk=response.data['id'])
+
+    def totals(self):
+        rows = LocationUsage.objects.all()
+        return (sum(row.started for row in rows), sum(row.ended for row in rows),
+                sum(row.occupied_seconds for row in rows))
+
+    def test_hour_buckets(self):
+        start = timezone.now().replace(hour=9, minute=30, second=0, microsecond=0)
+        buckets = list(rollups.hour_buckets(start, start + timedelta(hours=2)))
+        self.assertEqual([seconds for _, seconds in buckets], [1800, 3600, 1800])
+        self.assertEqual(buckets[1][0] - buckets[0][0], timedelta(hours=1))
+
+    def test_transitions_update_the_rollup_and_rebuild_agrees(self):
+        released = self.reserve(self.lockers[0])
+        expired = self.reserve(self.lockers[1])
+        self.assertEqual(sum(row.started for row in LocationUsage.objects.all()), 2)
+
+        # Pretend both were made two hours ago
+        two_hours_ago = timezone.now() - timedelta(hours=2)
+        Reservation.objects.update(reserved_at=two_hours_ago)
+        released.reserved_at = expired.reserved_at = two_hours_ago
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/reservations/{released.id}/release/')
+        Reservation.objects.filter(pk=expired.pk).update(reserved_until=timezone.now() - timedelta(minutes=30))
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_overdue_reservations()
+
+        rows = LocationUsage.objects.all()
+        self.assertEqual(sum(row.ended for row in rows), 2)
+        # 2h for the released one, 1.5h for the expired one
+        self.assertAlmostEqual(sum(row.occupied_seconds for row in rows), 3.5 * 3600, delta=5)
+
+        # Backdating moved reserved_at, so compare totals rather than hours
+        incremental = self.totals()
+        LocationUsage.objects.all().delete()
+        rollups.rebuild()
+        rebuilt = self.totals()
+        self.assertEqual(rebuilt[:2], incremental[:2])
+        self.assertAlmostEqual(rebuilt[2], incremental[2], delta=5)
+
+    def test_rollup_commits_and_rolls_back_with_the_change(self):
+        until = timezone.now() + timedelta(hours=1)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            reservation = Reservation.objects.create(user=self.user, locker=self.lockers[0], reserved_until=until)
+            reservation.locker = self.lockers[0]
+            announce_reservations([reservation], 'created')
+            self.assertEqual(LocationUsage.objects.get().started, 1)
+            raise RuntimeError('rolled back')
+        self.assertFalse(LocationUsage.objects.exists())
+
+        # Written before any on_commit callback runs
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post('/api/reservations/', {
+                'locker': self.lockers[0].id, 'reserved_until': until.isoformat()
+            }, format='json')
+        self.assertEqual(LocationUsage.objects.get().started, 1)
+
+    def test_utilization_endpoint(self):
+        reservation = self.reserve(self.lockers[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/reservations/{reservation.id}/release/')
+        self.assertEqual(self.client.get('/api/analytics/utilization/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/analytics/utilization/?location=Block R')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status_counts'], [
+            {'location': 'Block R', 'status': 'available', 'count': 2}
+        ])
+        self.assertEqual(response.data['hourly'][0]['started'], 1)
+        self.assertIsNotNone(response.data['hourly'][-1]['utilization'])
+        self.assertEqual(self.client.get('/api/analytics/utilization/?start=2020-01-01').status_code, 400)
+
+
+class BulkStatusTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('closer', password='pass12345', is_staff=True)
+        self.users = [User.objects.create_user(f'holder{i}', password='pass12345') for i in range(3)]
+        self.lockers = [Locker.objects.create(locker_number=f'W{i}', location='Block W') for i in range(6)]
+        Locker.objects.create(locker_number='V1', location='Block V')
+        until = timezone.now() + timedelta(hours=1)
+        for user, locker in zip(self.users, self.lockers):
+            Reservation.objects.create(user=user, locker=locker, reserved_until=until)
+            locker.status = 'reserved'
+            locker.save()
+        self.client.force_authenticate(self.admin)
+
+    def test_deactivate_location_in_fixed_queries(self):
+        # savepoint, lock lockers, reservations + users, 2 UPDATEs,
+        # rollup upsert for the one location-hour (4), release
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(10):
+            response = self.client.post('/api/lockers/bulk/deactivate/', {'location': 'Block W'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['locker_ids']), 6)
+        self.assertEqual(response.data['affected_reservations']['count'], 3)
+        self.assertEqual(sorted(user['username'] for user in response.data['affected_reservations']['users']),
+                         ['holder0', 'holder1', 'holder2'])
+        self.assertEqual(len(callbacks), 2)  # one locker and one reservation announcement
+
+        self.assertFalse(Reservation.objects.filter(is_active=True).exists())
+        self.assertEqual(Locker.objects.filter(status='inactive').count(), 6)
+        self.assertEqual(Locker.objects.get(locker_number='V1').status, 'available')
+
+    def test_reactivate_by_ids(self):
+        self.client.post('/api/lockers/bulk/deactivate/', {'location': 'Block W'}, format='json')
+        ids = [self.lockers[0].id, self.lockers[1].id, Locker.objects.get(locker_number='V1').id]
+        response = self.client.post('/api/lockers/bulk/reactivate/', {'ids': ids}, format='json')
+        self.assertEqual(response.data['locker_ids'], ids[:2])
+        self.assertEqual(Locker.objects.filter(status='available').count(), 3)
+
+    def test_rejects_bad_requests(self):
+        url = '/api/lockers/bulk/deactivate/'
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'location': 'Block W', 'ids': [1]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': 'all'}, format='json').status_code, 400)
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.post(url, {'location': 'Block W'}, format='json').status_code, 403)
+
+
+class MetricsTests(APITestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.admin = User.objects.create_user('gauge', password='pass12345', is_staff=True)
+        for i in range(3):
+            Locker.objects.create(locker_number=f'M{i}', location='Block M')
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_counts_the_request_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/lockers/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for phase in ('db;dur=', 'serialize;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(phase, timing)
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint_exposes_histograms_by_view_and_action(self):
+        self.client.get('/api/lockers/')
+        self.client.post('/api/lockers/unlock/', {'locker_number': 'M0', 'access_pin': '123456'}, format='json')
+        self.client.generic('BREW', '/api/lockers/')
+        body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('# TYPE locker_api_request_duration_seconds histogram', body)
+        self.assertIn('locker_api_request_duration_seconds_count{view="locker-list",method="GET",status="200"} 1', body)
+        self.assertIn('locker_api_request_db_queries_count{view="locker-unlock"} 1', body)
+        self.assertIn('locker_api_request_serialize_seconds_bucket{view="locker-list",le="+Inf"} 1', body)
+        self.assertIn('locker_api_request_duration_seconds_count{view="locker-other",method="other",status="405"} 1', body)
+        self.assertNotIn('brew', body.lower())
+        self.assertNotIn('view="metrics"', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer guess').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_metrics_without_a_token_only_in_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class ConnectionSettingsTests(SimpleTestCase):
+
+    def test_modes(self):
+        persistent = connection_settings('persistent', max_age=120)
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (120, True))
+        self.assertEqual(connection_settings('close')['CONN_MAX_AGE'], 0)
+
+        with mock.patch('core.database.pool_available', return_value=True):
+            pool = connection_settings('pool', pool_min_size=4, pool_max_size=8)
+        self.assertEqual(pool['CONN_MAX_AGE'], 0)
+        self.assertEqual(pool['OPTIONS']['pool'], {'min_size': 4, 'max_size': 8, 'timeout': 10})
+
+    def test_asgi_never_keeps_thread_connections(self):
+        self.assertEqual(connection_settings('persistent', asgi=True)['CONN_MAX_AGE'], 0)
+        with mock.patch('core.database.pool_available', return_value=True):
+            self.assertIn('pool', connection_settings('pool', asgi=True)['OPTIONS'])
+
+    def test_rejects_bad_configuration(self):
+        with self.assertRaises(ImproperlyConfigured):
+            connection_settings('pooled')
+        with mock.patch('core.database.pool_available', return_value=True), \
+                self.assertRaises(ImproperlyConfigured):
+            connection_settings('pool', pool_min_size=20, pool_max_size=10)
+        with mock.patch('core.database.pool_available', return_value=False), \
+                self.assertRaisesMessage(ImproperlyConfigured, 'psycopg[binary,pool]'):
+            connection_settings('pool')
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_warm_up_needs_no_database(self):
+        # SimpleTestCase fails any query
+        self.assertEqual(set(warm_up()), {'urls', 'api settings', 'serializers'})
+
+    def test_finds_routed_serializers(self):
+        from .views import LockerViewSet, ReservationViewSet
+        views = {view_class: initkwargs for view_class, initkwargs in routed_views()}
+        self.assertIn(LockerViewSet, views)
+        self.assertIn(ReservationViewSet, views)
+
+    def test_import_times_by_package(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     django.db.models.fields\n'
+            'import time:       200 |        300 |   django.db.models\n'
+            'import time:       400 |        400 |   django.contrib.admin.sites\n'
+            'import time:        50 |        50 | rest_framework.fields\n'
+        )
+        self.assertEqual(import_times(stderr), {
+            'django.db': 0.0003, 'django.contrib.admin': 0.0004, 'rest_framework': 0.00005,
+        })
+
+
+class LoadTestTests(SimpleTestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('available=3,unlock=1.5', KIOSK_ACTIONS), {'available': 3, 'unlock': 1.5})
+        for mix in ('lockers=1', 'available=x', 'available=0', ''):
+            with self.assertRaises(CommandError):
+                parse_mix(mix, KIOSK_ACTIONS)
+
+    def test_summary(self):
+        samples = {
+            'reserve': [(10.0, 201), (20.0, 409), (30.0, 500), (40.0, 0)],
+            'unlock': [(5.0, 200)],
+        }
+        summary = summarize(samples, seconds=2)
+        self.assertEqual((summary['requests'], summary['throughput_rps'], summary['error_rate']), (5, 2.5, 0.4))
+        reserve = summary['endpoints']['reserve']
+        # 409 (no locker free) is an expected answer to reserve
+        self.assertEqual((reserve['errors'], reserve['statuses']), (2, {'0': 1, '201': 1, '409': 1, '500': 1}))
+        self.assertEqual((reserve['latency_ms']['p50'], reserve['latency_ms']['max']), (25.0, 40.0))
+        self.assertEqual(summary['endpoints']['unlock']['latency_ms']['p99'], 5.0)
+
+    def test_regressions(self):
+        def result(rps, p95, error_rate):
+            return {'kiosks': 50, 'dashboards': 2, 'throughput_rps': rps,
+                    'endpoints': {'unlock': {'latency_ms': {'p95': p95}, 'error_rate': error_rate}}}
+
+        baseline = {(50, 2): result(100, 10, 0)}
+        self.assertEqual(find_regressions([result(95, 11, 0.005)], baseline, 20), [])
+        self.assertEqual(len(find_regressions([result(70, 13, 0.02)], baseline, 20)), 3)
+
+
+class ExpiryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('carol', password='pass12345')
+        self.now = timezone.now()
+
+    def reserve(self, number, until):
+        locker, _ = Locker.objects.get_or_create(
+            locker_number=number, defaults={'location': 'Block E', 'status': 'reserved'}
+        )
+        return Reservation.objects.create(user=self.user, locker=locker, reserved_until=until)
+
+    def test_expires_overdue_reservations_and_frees_lockers(self):
+        overdue = [self.reserve(f'E{i}', self.now - timedelta(minutes=i + 1)) for i in range(5)]
+        current = self.reserve('E9', self.now + timedelta(hours=1))
+
+        self.assertEqual(expire_overdue_reservations(batch_size=3), (3, 3))
+        self.assertEqual(expire_overdue_reservations(batch_size=3), (2, 2))
+        self.assertEqual(expire_overdue_reservations(batch_size=3), (0, 0))
+
+        self.assertFalse(Reservation.objects.filter(id__in=[r.id for r in overdue], is_active=True).exists())
+        self.assertEqual(Locker.objects.filter(status='available').count(), 5)
+        current.refresh_from_db()
+        self.assertTrue(current.is_active)
+        self.assertEqual(current.locker.status, 'reserved')
+
+    def test_does_not_reopen_deactivated_lockers(self):
+        reservation = self.reserve('E1', self.now - timedelta(minutes=1))
+        Locker.objects.filter(pk=reservation.locker_id).update(status='inactive')
+        self.assertEqual(expire_overdue_reservations(), (1, 0))
+        self.assertEqual(Locker.objects.get(locker_number='E1').status, 'inactive')
+
+    def test_batch_runs_fixed_number_of_queries(self):
+        for i in range(20):
+            self.reserve(f'E{i}', self.now - timedelta(minutes=1))
+        # savepoint, SELECT, 2 UPDATEs, release; plus one rollup upsert (UPDATE,
+        # savepoint, INSERT, release) per location-hour, not per reservation
+        with self.assertNumQueries(9):
+            expire_overdue_reservations(batch_size=100)
+
+
+class ArchiveTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('archivist', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('otto', password='pass12345')
+        self.now = timezone.now()
+        self.locker = Locker.objects.create(locker_number='H1', location='Block H')
+
+    def history(self, user, count, ended_days_ago):
+        reservations = [
+            Reservation.objects.create(user=user, locker=self.locker, is_active=False,
+                                       reserved_until=self.now - timedelta(days=ended_days_ago))
+            for _ in range(count)
+        ]
+        # updated_at is when the reservation ended
+        Reservation.objects.filter(id__in=[r.id for r in reservations]).update(
+            updated_at=self.now - timedelta(days=ended_days_ago)
+        )
+        return reservations
+
+    def test_moves_old_released_reservations_in_batches(self):
+        old = self.history(self.user, 5, 100)
+        recent = self.history(self.user, 2, 10)
+        current = Reservation.objects.create(user=self.user, locker=self.locker,
+                                             reserved_until=self.now + timedelta(hours=1))
+        before = self.now - timedelta(days=90)
+
+        with self.assertNumQueries(5):  # savepoint, SELECT, INSERT, DELETE, release
+            self.assertEqual(archive_reservations(before, batch_size=3), 3)
+        self.assertEqual(archive_reservations(before, batch_size=3), 2)
+        self.assertEqual(archive_reservations(before, batch_size=3), 0)
+
+        self.assertEqual(set(ArchivedReservation.objects.values_list('id', flat=True)), {r.id for r in old})
+        self.assertEqual(set(Reservation.objects.values_list('id', flat=True)),
+                         {r.id for r in recent} | {current.id})
+        archived = ArchivedReservation.objects.get(pk=old[0].id)
+        self.assertEqual(archived.reserved_until, old[0].reserved_until)
+
+    def test_archived_history_is_readable(self):
+        mine = self.history(self.user, 2, 100)
+        self.history(self.admin, 1, 100)
+        archive_reservations(self.now - timedelta(days=90))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/reservations/archived/')
+        self.assertEqual([row['id'] for row in response.data['results']], [r.id for r in reversed(mine)])
+        self.assertEqual(response.data['results'][0]['locker_details']['locker_number'], 'H1')
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(len(self.client.get('/api/reservations/archived/').data['results']), 3)
+        response = self.client.get('/api/reservations/export/?archived=true')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertFalse(any(row['is_active'] for row in rows))
+
+    @override_settings(SYNC_TOMBSTONE_DAYS=30)
+    def test_command_keeps_rows_sync_clients_may_hold(self):
+        self.history(self.user, 2, 20)
+        with self.assertRaisesMessage(CommandError, 'SYNC_TOMBSTONE_DAYS'):
+            call_command('archive_reservations', '--days', '10', stdout=io.StringIO())
+        self.assertEqual(Reservation.objects.count(), 2)
+
+        stdout = io.StringIO()
+        call_command('archive_reservations', '--days', '30', stdout=stdout)
+        self.assertIn('Archived 0 reservations', stdout.getvalue())
+
+    def test_rollup_rebuild_counts_archived_reservations(self):
+        self.history(self.user, 3, 100)
+        rollups.rebuild()
+        totals = list(LocationUsage.objects.order_by('hour').values_list('hour', 'started', 'ended'))
+        archive_reservations(self.now - timedelta(days=90))
+        rollups.rebuild()
+        self.assertEqual(list(LocationUsage.objects.order_by('hour').values_list('hour', 'started', 'ended')), totals)
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SyncTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('syncadmin', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('kiosk', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        Locker.objects.bulk_create([
+            Locker(locker_number='K-1', location='Kiosk Hall'),
+            Locker(locker_number='K-2', location='Kiosk Hall', status='reserved'),
+            Locker(locker_number='K-3', location='Kiosk Hall', status='inactive'),
+            Locker(locker_number='X-1', location='Elsewhere'),
+        ])
+        self.site = Site.objects.get(name='Kiosk Hall')
+        self.k1, self.k2 = Locker.objects.get(locker_number='K-1'), Locker.objects.get(locker_number='K-2')
+        self.until = timezone.now() + timedelta(hours=2)
+        self.held = Reservation.objects.create(user=self.user, locker=self.k2, reserved_until=self.until)
+        Reservation.objects.create(user=self.user, locker=self.k1, is_active=False, reserved_until=self.until)
+
+    def sync(self, cursor=None, site=None):
+        params = {'site': site or self.site.id, **({'cursor': cursor} if cursor else {})}
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_snapshot_then_changes_only(self):
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertFalse(data['more'])
+        # Inactive lockers and released reservations are left out of a snapshot
+        self.assertEqual(sorted(locker['locker_number'] for locker in data['lockers']), ['K-1', 'K-2'])
+        self.assertEqual([reservation['id'] for reservation in data['reservations']], [self.held.id])
+        self.assertEqual(data['reservations'][0]['locker_details']['locker_number'], 'K-2')
+        self.assertEqual(data['tombstones'], [])
+
+        # Caught up: three indexed queries, nothing to send
+        with self.assertNumQueries(3):
+            data = self.sync(data['cursor'])
+        self.assertFalse(data['reset'])
+        self.assertEqual((data['lockers'], data['reservations'], data['tombstones']), ([], [], []))
+
+        self.k1.status = 'reserved'
+        self.k1.save()
+        data = self.sync(data['cursor'])
+        self.assertEqual([locker['id'] for locker in data['lockers']], [self.k1.id])
+        self.assertEqual(data['reservations'], [])
+
+    def test_tombstones(self):
+        cursor = self.sync()['cursor']
+        deactivate_lockers(Locker.objects.filter(pk=self.k2.pk))
+        other = Reservation.objects.create(user=self.user, locker=self.k1, reserved_until=self.until)
+        self.assertEqual(self.client.delete(f'/api/reservations/{other.id}/').status_code, 204)
+        Locker.objects.filter(locker_number='K-3').delete()
+
+        data = self.sync(cursor)
+        self.assertEqual(sorted((t['type'], t['reason']) for t in data['tombstones']), [
+            ('locker', 'deleted'), ('locker', 'inactive'), ('reservation', 'deleted'), ('reservation', 'released'),
+        ])
+        self.assertEqual(data['reservations'], [])
+
+        # Deleting a user drops their active reservations
+        cursor = data['cursor']
+        replacement = Reservation.objects.create(user=self.user, locker=self.k1, reserved_until=self.until)
+        self.user.delete()
+        data = self.sync(cursor)
+        self.assertIn({'type': 'reservation', 'id': replacement.id, 'reason': 'deleted'}, data['tombstones'])
+
+        self.assertEqual(prune_tombstones(timezone.now() - timedelta(days=1)), 0)
+        self.assertEqual(prune_tombstones(timezone.now() + timedelta(seconds=1)), 3)
+
+    def test_api_delete_leaves_one_tombstone(self):
+        self.assertEqual(self.client.delete(f'/api/reservations/{self.held.id}/').status_code, 204)
+        self.assertEqual(Tombstone.objects.filter(kind='reservation', object_id=self.held.id).count(), 1)
+
+    @unittest.skipIf(settings.API_ONLY, 'the admin is not installed with API_ONLY')
+    def test_admin_deletes_leave_one_tombstone_each(self):
+        reservation_admin = admin.site.get_model_admin(Reservation)
+        request = RequestFactory().post('/admin/lockers/reservation/')
+        reservation_admin.delete_queryset(request, Reservation.objects.filter(pk=self.held.pk))
+        self.assertFalse(Reservation.objects.filter(pk=self.held.pk).exists())
+        self.assertEqual(Tombstone.objects.filter(kind='reservation', object_id=self.held.id).count(), 1)
+
+        other = Reservation.objects.create(user=self.user, locker=self.k1, reserved_until=self.until)
+        reservation_admin.delete_model(request, other)
+        self.assertEqual(Tombstone.objects.filter(kind='reservation', object_id=other.id).count(), 1)
+
+    @override_settings(SYNC_OVERLAP_SECONDS=5)
+    def test_overlap_catches_late_commits(self):
+        cursor = self.sync()['cursor']
+        # Committed after the last sync, stamped before it
+        Locker.objects.filter(pk=self.k1.pk).update(status='reserved', updated_at=timezone.now() - timedelta(seconds=2))
+        data = self.sync(cursor)
+        self.assertIn(self.k1.id, [locker['id'] for locker in data['lockers']])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_snapshot_pages(self):
+        Locker.objects.bulk_create([Locker(locker_number=f'K-{i}', location='Kiosk Hall') for i in range(10, 15)])
+        data, seen, pages = self.sync(), set(), 1
+        self.assertTrue(data['reset'] and data['more'])
+        seen.update(locker['locker_number'] for locker in data['lockers'])
+        while data['more']:
+            data = self.sync(data['cursor'])
+            self.assertFalse(data['reset'])
+            seen.update(locker['locker_number'] for locker in data['lockers'])
+            pages += 1
+        self.assertEqual(seen, {'K-1', 'K-2', 'K-10', 'K-11', 'K-12', 'K-13', 'K-14'})
+        self.assertEqual(pages, 4)
+
+    def test_scope(self):
+        mine = self.sync()
+        self.client.force_authenticate(self.user)
+        Reservation.objects.create(user=self.admin, locker=self.k1, reserved_until=self.until)
+        data = self.sync()
+        self.assertEqual([reservation['id'] for reservation in data['reservations']], [self.held.id])
+
+        response = self.client.get('/api/sync/', {'site': Site.objects.get(name='Elsewhere').id, 'cursor': mine['cursor']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'site': 'north'}).status_code, 400)
+
+    def test_expired_cursor_starts_over(self):
+        stale = delta_cursor(self.site.id, timezone.now() - timedelta(days=31))
+        self.assertTrue(self.sync(stale)['reset'])
+        recent = delta_cursor(self.site.id, timezone.now() - timedelta(days=1))
+        self.assertFalse(self.sync(recent)['reset'])
+
+
+class BulkLockerTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass12345', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        Locker.objects.create(locker_number='B0', location='Block B')
+
+    def test_bulk_create_reports_bad_rows_without_aborting(self):
+        rows = [{'locker_number': f'B{i}', 'location': 'Block B'} for i in range(1, 6)]
+        rows += [
+            {'locker_number': 'B0', 'location': 'Block B'},    # already exists
+            {'locker_number': 'B1', 'location': 'Block B'},    # duplicate in payload
+            {'locker_number': 'B9'},                           # missing location
+            {'locker_number': 'B8', 'location': 'Block B', 'status': 'reserved'},
+        ]
+        with self.assertNumQueries(5):  # duplicate check, savepoint, site lookup, INSERT, release
+            response = self.client.post('/api/lockers/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual([error['row'] for error in response.data['errors']], [6, 7, 8, 9])
+        self.assertEqual(Locker.objects.count(), 6)
+
+    def test_bulk_created_lockers_are_announced(self):
+        received = []
+        lockers_changed.connect(lambda signal, **kwargs: received.extend(kwargs['lockers']),
+                                dispatch_uid='test-bulk', weak=False)
+        self.addCleanup(lockers_changed.disconnect, dispatch_uid='test-bulk')
+        rows = [{'locker_number': f'B{i}', 'location': 'Block B'} for i in range(1, 4)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/lockers/bulk/', rows, format='json')
+        self.assertEqual([locker['locker_number'] for locker in received], ['B1', 'B2', 'B3'])
+        self.assertEqual({locker['id'] for locker in received},
+                         set(Locker.objects.exclude(locker_number='B0').values_list('id', flat=True)))
+
+    def test_import_reports_malformed_lines_without_aborting(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as source:
+            source.write('{"locker_number": "B1", "location": "Block B"}\n{"locker_number": \n'
+                         '{"locker_number": "B2", "location": "Block B"}\n')
+        self.addCleanup(os.remove, source.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_lockers', source.name, '--chunk-size', '1', stdout=stdout, stderr=stderr)
+        self.assertIn('Created 2 lockers, 1 rows rejected', stdout.getvalue())
+        self.assertIn('Line 2: invalid JSON', stderr.getvalue())
+        self.assertTrue(Locker.objects.filter(locker_number='B2').exists())
+
+        with self.assertRaisesMessage(CommandError, 'Cannot read'):
+            call_command('import_lockers', source.name + '.missing', stdout=stdout)
+
+    def test_bulk_create_is_admin_only(self):
+        self.client.force_authenticate(User.objects.create_user('dave', password='pass12345'))
+        response = self.client.post('/api/lockers/bulk/', [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ReservationCreateTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('erin', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.locker = Locker.objects.create(locker_number='R1', location='Block R')
+        self.until = (timezone.now() + timedelta(hours=1)).isoformat()
+
+    def reserve(self):
+        return self.client.post('/api/reservations/', {
+            'locker': self.locker.id, 'reserved_until': self.until
+        }, format='json')
+
+    def test_second_reservation_for_locker_is_rejected(self):
+        self.assertEqual(self.reserve().status_code, 201)
+        response = self.reserve()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Reservation.objects.filter(locker=self.locker, is_active=True).count(), 1)
+
+    def test_overdue_reservation_is_expired_on_the_spot(self):
+        # e.g. a locker reactivated before the expiry worker ran
+        stale = Reservation.objects.create(user=self.user, locker=self.locker,
+                                           reserved_until=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.reserve().status_code, 201)
+        stale.refresh_from_db()
+        self.assertFalse(stale.is_active)
+        self.locker.refresh_from_db()
+        self.assertEqual(self.locker.status, 'reserved')
+
+    def lock_fails(self, sqlstate):
+        cause = Exception('could not obtain lock')
+        cause.pgcode = sqlstate
+        error = OperationalError('could not obtain lock')
+        error.__cause__ = cause
+        locked = mock.Mock()
+        locked.get.side_effect = error
+        return mock.patch('django.db.models.query.QuerySet.select_for_update', return_value=locked)
+
+    def test_only_a_lock_conflict_means_already_reserved(self):
+        with self.lock_fails('55P03'):
+            response = self.reserve()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already reserved', str(response.data['locker']))
+
+        # e.g. a statement timeout or lost connection is a server error, not a conflict
+        with self.lock_fails('57014'), self.assertRaises(OperationalError):
+            self.reserve()
+
+    def test_lapsed_reservation_on_reserved_locker_is_expired_on_the_spot(self):
+        # The reservation ran out and the expiry worker has not run yet
+        stale = Reservation.objects.create(user=self.user, locker=self.locker,
+                                           reserved_until=timezone.now() - timedelta(minutes=1))
+        Locker.objects.filter(pk=self.locker.pk).update(status='reserved')
+        response = self.reserve()
+        self.assertEqual(response.status_code, 201)
+        stale.refresh_from_db()
+        self.assertFalse(stale.is_active)
+        self.assertEqual(Reservation.objects.get(is_active=True).id, response.data['id'])
+
+    def test_reserved_locker_with_live_reservation_is_rejected(self):
+        Reservation.objects.create(user=self.user, locker=self.locker,
+                                   reserved_until=timezone.now() + timedelta(minutes=30))
+        Locker.objects.filter(pk=self.locker.pk).update(status='reserved')
+        response = self.reserve()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Reservation.objects.filter(locker=self.locker).count(), 1)
+
+
+class AllocateTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ann', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.until = (timezone.now() + timedelta(hours=1)).isoformat()
+        Locker.objects.bulk_create([
+            Locker(locker_number='AL-1', location='North Hall', status='inactive'),
+            Locker(locker_number='AL-2', location='North Hall'),
+            Locker(locker_number='AL-3', location='South Hall'),
+        ])
+
+    def allocate(self, **body):
+        return self.client.post('/api/reservations/allocate/', {'reserved_until': self.until, **body},
+                                format='json')
+
+    def test_reserves_the_first_free_locker(self):
+        response = self.allocate()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['locker_details']['locker_number'], 'AL-2')
+        self.assertEqual(response.data['user'], 'ann')
+        self.assertEqual(len(response.data['access_pin']), 6)
+        self.assertEqual(Locker.objects.get(locker_number='AL-2').status, 'reserved')
+
+        self.assertEqual(self.allocate().data['locker_details']['locker_number'], 'AL-3')
+        response = self.allocate()
+        self.assertEqual(response.status_code, 409)
+
+    def test_scoped_by_site_or_location(self):
+        south = Site.objects.get(name='South Hall')
+        self.assertEqual(self.allocate(site=south.id).data['locker_details']['locker_number'], 'AL-3')
+        self.assertEqual(self.allocate(location='South Hall').status_code, 409)
+        self.assertEqual(self.allocate(location='North Hall').data['locker_details']['locker_number'], 'AL-2')
+
+    def test_skips_lockers_with_an_unrecorded_active_reservation(self):
+        Reservation.objects.create(user=self.user, locker=Locker.objects.get(locker_number='AL-2'),
+                                   reserved_until=timezone.now() + timedelta(hours=1))
+        self.assertEqual(self.allocate().data['locker_details']['locker_number'], 'AL-3')
+
+    def test_rejects_past_end_time(self):
+        response = self.client.post('/api/reservations/allocate/', {
+            'reserved_until': (timezone.now() - timedelta(minutes=1)).isoformat()
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'row locking needs PostgreSQL')
+class ConcurrentReservationTests(TransactionTestCase):
+    """
+    Hammer reservation creation from many threads (one DB connection each)
+    and check that no locker is ever double-booked.
+    """
+    threads = 32
+    # Reservation attempts per second the contended run must reach (logged at INFO)
+    min_throughput = 20
+
+    def setUp(self):
+        self.users = [User(username=f'load_{i}', password='!') for i in range(self.threads)]
+        User.objects.bulk_create(self.users)
+        self.users = list(User.objects.filter(username__startswith='load_'))
+        self.until = (timezone.now() + timedelta(hours=1)).isoformat()
+
+    def reserve(self, user, locker_id, barrier=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            if barrier:
+                barrier.wait()
+            return client.post('/api/reservations/', {
+                'locker': locker_id, 'reserved_until': self.until
+            }, format='json').status_code
+        finally:
+            connection.close()
+
+    def test_simultaneous_requests_for_one_locker(self):
+        locker = Locker.objects.create(locker_number='HOT-1', location='Block H')
+        barrier = threading.Barrier(self.threads)
+        with ThreadPoolExecutor(self.threads) as pool:
+            codes = list(pool.map(lambda user: self.reserve(user, locker.id, barrier), self.users))
+
+        self.assertEqual(codes.count(201), 1)
+        self.assertEqual(codes.count(400), self.threads - 1)
+        self.assertEqual(Reservation.objects.filter(locker=locker, is_active=True).count(), 1)
+
+    def test_throughput_without_double_bookings(self):
+        lockers = Locker.objects.bulk_create(
+            Locker(locker_number=f'TP-{i}', location='Block T') for i in range(200)
+        )
+        # Every locker is requested by two users at once
+        jobs = [(self.users[i % self.threads], lockers[i // 2].id) for i in range(len(lockers) * 2)]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.threads) as pool:
+            codes = list(pool.map(lambda job: self.reserve(*job), jobs))
+        throughput = len(jobs) / (time.perf_counter() - started)
+
+        self.assertEqual(codes.count(201), len(lockers))
+        self.assertFalse(
+            Reservation.objects.filter(is_active=True)
+            .values('locker').annotate(active=Count('id')).filter(active__gt=1).exists()
+        )
+        logger.info('%d reservation attempts at %.0f req/s (%d threads)', len(jobs), throughput, self.threads)
+        self.assertGreaterEqual(throughput, self.min_throughput)
+
+    def allocate(self, user, barrier):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            return client.post('/api/reservations/allocate/', {
+                'reserved_until': self.until
+            }, format='json').status_code
+        finally:
+            connection.close()
+
+    def test_simultaneous_allocations_get_distinct_lockers(self):
+        Locker.objects.bulk_create(
+            Locker(locker_number=f'AA-{i}', location='Block A') for i in range(self.threads // 2)
+        )
+        barrier = threading.Barrier(self.threads)
+        with ThreadPoolExecutor(self.threads) as pool:
+            codes = list(pool.map(lambda user: self.allocate(user, barrier), self.users))
+
+        self.assertEqual(codes.count(201), self.threads // 2)
+        self.assertEqual(codes.count(409), self.threads - self.threads // 2)
+        self.assertEqual(Reservation.objects.filter(is_active=True).values('locker').distinct().count(),
+                         self.threads // 2)
@@ -0,0 +1,206 @@
+"""
+Keyed cache behind the unlock fast path: locker_number -> what unlock needs
+(locker payload, status, and the active reservation's PIN digest, owner and
+expiry). A cache hit answers an unlock without touching the database.
+
+Entries are dropped after commit whenever a reservation is created, released,
+updated or expired, or a locker changes (see the receivers below), and expire
+after UNLOCK_CACHE_TTL seconds as a backstop. With several workers, point
+CACHES at a shared backend (Redis, Memcached) so invalidations reach every
+worker; with the per-process default, the TTL bounds how long another worker
+can serve a stale entry.
+
+A miss loads the entry and then stores it, so an invalidation could land in
+between and be overwritten by what was just loaded. Each locker therefore has
+a generation token that invalidate() replaces: an entry records the token
+read before its load and only counts as a hit while that token is current.
+"""
+import hashlib
+import hmac
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Locker
+from .serializers import LockerSerializer
+from .signals import lockers_changed, reservations_changed
+
+KEY_PREFIX = 'unlock:v1:'
+
+
+def get_cache():
+    return caches[settings.UNLOCK_CACHE_ALIAS]
+
+
+def cache_key(locker_number):
+    return f'{KEY_PREFIX}{hashlib.sha1(locker_number.encode()).hexdigest()}'
+
+
+def generation_key(locker_number):
+    return f'{KEY_PREFIX}gen:{hashlib.sha1(locker_number.encode()).hexdigest()}'
+
+
+def generation_timeout():
+    # Outlives every entry; once it expires, entries stored under it are misses
+    return settings.UNLOCK_CACHE_TTL * 2
+
+
+def new_generation():
+    return uuid.uuid4().hex
+
+
+def pin_digest(locker_number, access_pin):
+    """Keyed digest so raw PINs never sit in the cache"""
+    message = f'{locker_number}:{access_pin}'.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def build_entry(locker_number, locker, reservation):
+    if locker is None:
+        return {'locker': None}
+    return {
+        'locker': dict(LockerSerializer(locker).data),
+        'status': locker.status,
+        'reservation': reservation and {
+            'pin_digest': pin_digest(locker_number, reservation.access_pin),
+            'user_id': reservation.user_id,
+            'username': reservation.user.username,
+            'reserved_until': reservation.reserved_until,
+        },
+    }
+
+
+def active_reservation(locker):
+    # At most one active reservation per locker (one_active_reservation_per_locker)
+    return locker.reservation_set.filter(
+        is_active=True, reserved_until__gte=timezone.now()
+    ).select_related('user')
+
+
+def load_entry(locker_number):
+    """Build the cache entry from the database (two queries)"""
+    locker = Locker.objects.filter(locker_number=locker_number).first()
+    reservation = locker and active_reservation(locker).first()
+    return build_entry(locker_number, locker, reservation)
+
+
+async def aload_entry(locker_number):
+    """load_entry() through the async ORM"""
+    locker = await Locker.objects.filter(locker_number=locker_number).afirst()
+    reservation = locker and await active_reservation(locker).afirst()
+    return build_entry(locker_number, locker, reservation)
+
+
+def entry_timeout(entry):
+    timeout = settings.UNLOCK_CACHE_TTL
+    reservation = entry.get('reservation')
+    if reservation:
+        # Never keep an entry past the reservation's own expiry
+        remaining = (reservation['reserved_until'] - timezone.now()).total_seconds()
+        timeout = max(1, min(timeout, int(remaining)))
+    return timeout
+
+
+def get_entry(locker_number):
+    """
+    Cached entry for locker_number, loading it on a miss. Returns (entry, hit).
+    Unknown locker numbers are not cached, so new lockers show up immediately.
+    """
+    cache = get_cache()
+    key, gen_key = cache_key(locker_number), generation_key(locker_number)
+    found = cache.get_many([key, gen_key])
+    entry, generation = found.get(key), found.get(gen_key)
+    if entry is not None and generation is not None and entry['generation'] == generation:
+        return entry, True
+
+    if generation is None:
+        cache.add(gen_key, new_generation(), generation_timeout())
+        generation = cache.get(gen_key)
+    entry = load_entry(locker_number)
+    if entry['locker'] is not None and generation is not None:
+        entry['generation'] = generation
+        cache.set(key, entry, entry_timeout(entry))
+    return entry, False
+
+
+async def aget_entry(locker_number):
+    """get_entry() for async views"""
+    cache = get_cache()
+    key, gen_key = cache_key(locker_number), generation_key(locker_number)
+    found = await cache.aget_many([key, gen_key])
+    entry, generation = found.get(key), found.get(gen_key)
+    if entry is not None and generation is not None and entry['generation'] == generation:
+        return entry, True
+
+    if generation is None:
+        await cache.aadd(gen_key, new_generation(), generation_timeout())
+        generation = await cache.aget(gen_key)
+    entry = await aload_entry(locker_number)
+    if entry['locker'] is not None and generation is not None:
+        entry['generation'] = generation
+        await cache.aset(key, entry, entry_timeout(entry))
+    return entry, False
+
+
+def check_unlock(entry, locker_number, access_pin, user):
+    """
+    Decide an unlock attempt against a cache entry.
+    Returns (http status, response body); no database access.
+    """
+    if entry['locker'] is None:
+        return 404, {'error': 'Locker not found'}
+
+    # Check if locker is inactive
+    if entry['status'] == 'inactive':
+        return 403, {
+            'error': 'This locker has been deactivated by admin and is no longer accessible'
+        }
+
+    reservation = entry['reservation']
+    granted = (
+        reservation is not None
+        and reservation['reserved_until'] >= timezone.now()
+        and hmac.compare_digest(reservation['pin_digest'], pin_digest(locker_number, access_pin))
+        # Admin can unlock any locker with valid PIN
+        # Regular users can only unlock their own reservations
+        and (user.is_staff or reservation['user_id'] == user.id)
+    )
+
+    if not granted:
+        if user.is_staff:
+            error_msg = 'Invalid PIN or reservation expired/not found'
+        else:
+            error_msg = 'Invalid PIN, reservation expired, or you do not have access to this locker'
+        return 403, {'error': error_msg}
+
+    # Success - locker unlocked
+    return 200, {
+        'message': f'Locker {locker_number} unlocked successfully',
+        'locker': entry['locker'],
+        'reservation': {
+            'user': reservation['username'],
+            'reserved_until': reservation['reserved_until'],
+            'accessed_by': user.username,
+            'is_admin_access': user.is_staff
+        }
+    }
+
+
+def invalidate(locker_numbers):
+    # A new generation first: an entry loaded before this point can no longer be a hit
+    cache = get_cache()
+    cache.set_many({generation_key(number): new_generation() for number in locker_numbers}, generation_timeout())
+    cache.delete_many([cache_key(number) for number in locker_numbers])
+
+
+@receiver(lockers_changed, dispatch_uid='lockers.unlock_cache.lockers_changed')
+def invalidate_lockers(sender, lockers, **kwargs):
+    invalidate({locker['locker_number'] for locker in lockers})
+
+
+@receiver(reservations_changed, dispatch_uid='lockers.unlock_cache.reservations_changed')
+def invalidate_reservations(sender, reservations, **kwargs):
+    invalidate({reservation['locker_number'] for reservation in reservations})
@@ -1,15 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LockerViewSet, ReservationViewSet
+from .views import LockerViewSet, ReservationViewSet, SiteViewSet, event_stream, sync_changes, utilization
 
 # Create router and register viewsets with basename
 router = DefaultRouter()
 router.register(r'lockers', LockerViewSet, basename='locker')
 router.register(r'reservations', ReservationViewSet, basename='reservation')
+router.register(r'sites', SiteViewSet, basename='site')
+
+# The locker lists, scoped to one site
+site_lockers = LockerViewSet.as_view({'get': 'list'}, basename='locker', detail=False)
+site_available_lockers = LockerViewSet.as_view({'get': 'available'}, basename='locker', detail=False)
 
 # The router automatically generates routes for all @action decorated methods
+# List endpoints are cursor-paginated: {"next", "previous", "results"}.
+# Follow the `next` URL to fetch the following page; ?page_size=<n> is optional.
+# Locker and reservation reads take ?fields=a,b,nested.c and ?expand=locker_details.
 # Available routes:
-# GET    /api/lockers/                     - List all lockers
+# GET    /api/lockers/                     - List all lockers (?site=<id>, ?status=, ?search=<text>)
 # POST   /api/lockers/                     - Create locker (admin only)
 # GET    /api/lockers/<id>/                - Get locker details
 # PUT    /api/lockers/<id>/                - Update locker (admin only)
@@ -18,17 +26,37 @@ router.register(r'reservations', ReservationViewSet, basename='reservation')
 # GET    /api/lockers/available/           - Get available lockers
 # POST   /api/lockers/<id>/reactivate/     - Reactivate locker (admin only)
 # POST   /api/lockers/unlock/              - Unlock locker with PIN
+# POST   /api/lockers/bulk/                - Bulk create lockers (admin only)
+# POST   /api/lockers/bulk/deactivate/     - Deactivate lockers by location or ids (admin only)
+# POST   /api/lockers/bulk/reactivate/     - Reactivate lockers by location or ids (admin only)
+#
+# GET    /api/sites/                       - List sites (?search=<text>)
+# GET    /api/sites/<id>/                  - Get site details
+# GET    /api/sites/<id>/lockers/          - Lockers at a site
+# GET    /api/sites/<id>/lockers/available/ - Available lockers at a site
 #
 # GET    /api/reservations/                - List reservations
 # POST   /api/reservations/                - Create reservation
 # GET    /api/reservations/<id>/           - Get reservation details
 # PUT    /api/reservations/<id>/           - Update reservation time (admin only)
 # PATCH  /api/reservations/<id>/           - Partial update reservation (admin only)
+# POST   /api/reservations/allocate/       - Reserve any free locker (optionally by site/location)
 # GET    /api/reservations/active/         - Get active reservations
 # GET    /api/reservations/all/            - Get all reservations (admin only)
+# GET    /api/reservations/export/         - Stream history as NDJSON/CSV (admin only)
+# GET    /api/reservations/archived/       - Archived history (archive_reservations)
 # PUT    /api/reservations/<id>/release/   - Release reservation
 # PATCH  /api/reservations/<id>/release/   - Release reservation
+#
+# GET    /api/events/                      - Server-sent events stream (ASGI only)
+# GET    /api/analytics/utilization/       - Hourly usage per location (admin only)
+# GET    /api/sync/                        - Changes since a cursor, with tombstones (?site=<id>, ?cursor=)
 
 urlpatterns = [
+    path('events/', event_stream, name='events'),
+    path('analytics/utilization/', utilization, name='analytics-utilization'),
+    path('sync/', sync_changes, name='sync'),
+    path('sites/<int:site_pk>/lockers/', site_lockers, name='site-lockers'),
+    path('sites/<int:site_pk>/lockers/available/', site_available_lockers, name='site-lockers-available'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,18 +1,47 @@
+import asyncio
+import time
+from datetime import timedelta
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
 from rest_framework.response import Response
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from .models import Locker, Reservation
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import ArchivedReservation, Locker, Reservation, Site, Tombstone
 from .serializers import (
+    ArchivedReservationSerializer,
     LockerSerializer, 
+    SiteSerializer,
     ReservationSerializer, 
     UserRegistrationSerializer,
     UserSerializer,
     ReservationReleaseSerializer,
+    ReservationAllocateSerializer,
     LockerUnlockSerializer
 )
+from .authentication import ClaimsJWTAuthentication, aget_status
 from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin, IsAdminUser
+from .conditional import ConditionalGetMixin
+from .fastread import locker_reader, reservation_reader
+from .fieldsets import SparseFieldsetMixin
+from .events import Subscription, format_event, get_backend
+from . import exports, rollups, sync, unlock_cache
+from .services import (
+    allocate_locker, bulk_create_lockers, deactivate_lockers, free_lockers, reactivate_lockers
+)
+from .signals import announce_lockers, announce_reservations, reservation_payload
+from .pagination import (
+    LockerCursorPagination,
+    SiteCursorPagination,
+    ReservationCursorPagination,
+    ActiveReservationCursorPagination
+)
 
 
 @api_view(['POST'])
@@ -32,7 +61,123 @@ def register_user(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class LockerViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def utilization(request):
+    """
+    Admin dashboard analytics from the hourly rollup (lockers/rollups.py)
+    GET /api/analytics/utilization/?start=<iso>&end=<iso>&location=<name>
+    (defaults to the last 24 hours, at most ANALYTICS_MAX_DAYS)
+    Returns:
+    - status_counts: [{"location", "status", "count"}] (current)
+    - hourly: [{"location", "hour", "started", "ended", "occupied_seconds", "utilization"}]
+    """
+    params = request.query_params
+    try:
+        end = exports.parse_moment(params['end'], 'end') if params.get('end') else timezone.now()
+        start = (exports.parse_moment(params['start'], 'start') if params.get('start')
+                 else end - timedelta(days=1))
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if start >= end:
+        return Response({
+            'error': 'start must be before end'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end - start > timedelta(days=settings.ANALYTICS_MAX_DAYS):
+        return Response({
+            'error': f'Range is limited to {settings.ANALYTICS_MAX_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    data = rollups.utilization(start, end, location=params.get('location'))
+    return Response({'start': start, 'end': end, **data}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def sync_changes(request):
+    """
+    Lockers and reservations changed since the client's cursor (lockers/sync.py)
+    GET /api/sync/?site=<id>&cursor=<cursor from the previous response>
+    - Without a cursor (or once it is older than SYNC_TOMBSTONE_DAYS): a
+      snapshot of the lockers and active reservations, with "reset": true
+    - Reservations are the user's own unless they are an admin
+    Returns:
+    - lockers, reservations: changed rows, shaped like the list endpoints
+    - tombstones: [{"type": "locker" | "reservation", "id", "reason"}] to drop
+      (inactive, released or deleted)
+    - cursor: pass it to the next call; more: true to call again right away
+    """
+    site = request.query_params.get('site')
+    if site and not site.isdigit():
+        return Response({'site': ['Expected a site id']}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        data = sync.changes(request.user, int(site) if site else None, request.query_params.get('cursor'))
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def released_users_from(reservations, now):
+    """Holders of released reservations that had not run out yet"""
+    return [{
+        'username': reservation['username'],
+        'email': reservation['email'],
+        'reserved_until': str(reservation['reserved_until'])
+    } for reservation in reservations if reservation['reserved_until'] >= now]
+
+
+def search_lockers(queryset, term):
+    """
+    Lockers whose number or site name contains term (case-insensitive).
+    Sites are matched on their own (a small table) rather than through a join,
+    so each side can use its trigram index on PostgreSQL (migration 0010).
+    """
+    return queryset.filter(
+        Q(locker_number__icontains=term) | Q(site__in=Site.objects.filter(name__icontains=term))
+    )
+
+
+def filter_locker_params(queryset, params, site_id=None):
+    """
+    ?site=<id>, ?status= and ?search= on a locker list (shared with async_views.py);
+    site_id (from /api/sites/<id>/lockers/) takes the place of ?site=
+    """
+    if site_id is not None:
+        queryset = queryset.filter(site_id=site_id)
+    elif params.get('site'):
+        if not params['site'].isdigit():
+            raise ValidationError({'site': ['Expected a site id']})
+        queryset = queryset.filter(site_id=params['site'])
+
+    status_filter = params.get('status', None)
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    term = params.get('search', '').strip()
+    if term:
+        queryset = search_lockers(queryset, term)
+    return queryset
+
+
+class SiteViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for Site operations (sites are created from locker locations)
+    - List sites by name: GET /api/sites/?search=<text>
+    - Get site details: GET /api/sites/<id>/
+    - Lockers at a site: GET /api/sites/<id>/lockers/ (LockerViewSet)
+    - Available lockers at a site: GET /api/sites/<id>/lockers/available/
+    """
+    serializer_class = SiteSerializer
+    pagination_class = SiteCursorPagination
+
+    def get_queryset(self):
+        queryset = Site.objects.all()
+        term = self.request.query_params.get('search')
+        if term:
+            queryset = queryset.filter(name__icontains=term)
+        return queryset
+
+
+class LockerViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Locker operations
     - List all lockers: GET /api/lockers/
@@ -42,18 +187,47 @@ class LockerViewSet(viewsets.ModelViewSet):
     - Delete locker (Admin only): DELETE /api/lockers/<id>/
     - Deactivate locker with reservation handling: DELETE /api/lockers/<id>/
     - Reactivate locker: POST /api/lockers/<id>/reactivate/
+    - Bulk create lockers (Admin only): POST /api/lockers/bulk/
+    - Bulk deactivate/reactivate by location or ids (Admin only):
+      POST /api/lockers/bulk/deactivate/, POST /api/lockers/bulk/reactivate/
+    Reads take ?fields=id,locker_number,status (see fieldsets.py)
+    Lists filter with ?site=<id>, ?status= and ?search=<text> (number or site name);
+    /api/sites/<id>/lockers/ and /api/sites/<id>/lockers/available/ are the same lists
     """
     queryset = Locker.objects.all()
     serializer_class = LockerSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = LockerCursorPagination
+    fast_reader = locker_reader
 
     def get_queryset(self):
         """Filter lockers based on query parameters"""
-        queryset = Locker.objects.all()
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        return queryset
+        return self.filter_lockers(Locker.objects.all())
+
+    def filter_lockers(self, queryset):
+        """The site from the URL or ?site=, then ?status= and ?search="""
+        site_id = self.kwargs.get('site_pk')
+        if site_id is not None and not Site.objects.filter(pk=site_id).exists():
+            raise NotFound('Site not found')
+        return filter_locker_params(queryset, self.request.query_params, site_id)
+
+    def perform_create(self, serializer):
+        announce_lockers([serializer.save()])
+
+    def perform_update(self, serializer):
+        previous_number = serializer.instance.locker_number
+        locker = serializer.save()
+        if locker.locker_number != previous_number:
+            # The change announcement only carries the new number
+            transaction.on_commit(lambda: unlock_cache.invalidate([previous_number]))
+        announce_lockers([locker])
+
+    def list(self, request, *args, **kwargs):
+        """
+        List lockers (cursor-paginated, supports ETag / If-None-Match)
+        GET /api/lockers/
+        """
+        return self.conditional_list(Locker.objects.all(), self.get_queryset(), self.paginated_response)
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -63,52 +237,131 @@ class LockerViewSet(viewsets.ModelViewSet):
         DELETE /api/lockers/<id>/
         """
         locker = self.get_object()
-        
-        # Find all active reservations for this locker
-        active_reservations = Reservation.objects.filter(
-            locker=locker,
-            is_active=True,
-            reserved_until__gte=timezone.now()
-        )
-
-        released_count = 0
-        released_users = []
 
-        # Release all active reservations
-        for reservation in active_reservations:
-            reservation.is_active = False
-            reservation.save()
-            released_count += 1
-            released_users.append({
-                'username': reservation.user.username,
-                'email': reservation.user.email,
-                'reserved_until': str(reservation.reserved_until)
-            })
-
-        # Deactivate the locker
+        now = timezone.now()
+        result = deactivate_lockers(Locker.objects.filter(pk=locker.pk), now)
         locker.status = 'inactive'
-        locker.save()
+        locker.updated_at = now
+        # Overdue ones are released too, but only current holders are reported
+        released_users = released_users_from(result['reservations'], now)
 
         return Response({
             'message': f'Locker {locker.locker_number} has been deactivated',
             'action': 'deactivated',
             'locker': LockerSerializer(locker).data,
             'affected_reservations': {
-                'count': released_count,
+                'count': len(released_users),
                 'users': released_users
             },
             'note': 'All active reservations for this locker have been automatically released'
         }, status=status.HTTP_200_OK)
 
+    def bulk_target(self, request):
+        """
+        Lockers selected by a bulk status request, or an error Response.
+        Body: {"location": "Block A"} or {"ids": [1, 2, 3]}
+        """
+        location = request.data.get('location')
+        ids = request.data.get('ids')
+        if (location is None) == (ids is None):
+            return None, Response({
+                'error': 'Provide either "location" or "ids"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if location is not None:
+            return Locker.objects.filter(location=location), None
+
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return None, Response({
+                'error': '"ids" must be a list of locker ids'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.LOCKER_BULK_MAX_ROWS:
+            return None, Response({
+                'error': f'At most {settings.LOCKER_BULK_MAX_ROWS} lockers per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Locker.objects.filter(id__in=ids), None
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser],
+            url_path='bulk/deactivate')
+    def bulk_deactivate(self, request):
+        """
+        Deactivate many lockers at once (admin only), e.g. to close a site
+        - Their active reservations are released in the same transaction
+        - Runs a fixed number of queries however many lockers are affected
+        POST /api/lockers/bulk/deactivate/
+        Body: {"location": "Block A"} or {"ids": [1, 2, 3]}
+        """
+        lockers, error = self.bulk_target(request)
+        if error:
+            return error
+
+        now = timezone.now()
+        result = deactivate_lockers(lockers.exclude(status='inactive'), now)
+        released_users = released_users_from(result['reservations'], now)
+        return Response({
+            'message': f"{len(result['locker_ids'])} lockers have been deactivated",
+            'action': 'deactivated',
+            'locker_ids': result['locker_ids'],
+            'affected_reservations': {
+                'count': len(released_users),
+                'users': released_users
+            }
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser],
+            url_path='bulk/reactivate')
+    def bulk_reactivate(self, request):
+        """
+        Reactivate many deactivated lockers at once (admin only)
+        POST /api/lockers/bulk/reactivate/
+        Body: {"location": "Block A"} or {"ids": [1, 2, 3]}
+        """
+        lockers, error = self.bulk_target(request)
+        if error:
+            return error
+
+        locker_ids = reactivate_lockers(lockers)
+        return Response({
+            'message': f'{len(locker_ids)} lockers have been reactivated',
+            'action': 'reactivated',
+            'locker_ids': locker_ids
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
-    def available(self, request):
+    def available(self, request, **kwargs):
         """
         Custom endpoint to get only available lockers
         GET /api/lockers/available/
         """
-        available_lockers = Locker.objects.filter(status='available')
-        serializer = self.get_serializer(available_lockers, many=True)
-        return Response(serializer.data)
+        available_lockers = self.filter_lockers(Locker.objects.filter(status='available'))
+        return self.conditional_list(Locker.objects.all(), available_lockers, self.paginated_response)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        Create many lockers in one request (admin only)
+        - Locker numbers are checked for duplicates in one query per chunk
+        - Invalid rows are reported and skipped, the rest are still created
+        POST /api/lockers/bulk/
+        Body: [
+            {"locker_number": "A1", "location": "Block A"},
+            {"locker_number": "A2", "location": "Block A", "status": "inactive"}
+        ]
+        """
+        rows = request.data.get('lockers') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({
+                'error': 'Expected a list of lockers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > settings.LOCKER_BULK_MAX_ROWS:
+            return Response({
+                'error': f'At most {settings.LOCKER_BULK_MAX_ROWS} lockers per request; '
+                         f'use the import_lockers command for larger files'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = bulk_create_lockers(rows)
+        response_status = status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def reactivate(self, request, pk=None):
@@ -121,6 +374,7 @@ class LockerViewSet(viewsets.ModelViewSet):
         if locker.status == 'inactive':
             locker.status = 'available'
             locker.save()
+            announce_lockers([locker])
             return Response({
                 'message': f'Locker {locker.locker_number} has been reactivated',
                 'locker': LockerSerializer(locker).data
@@ -137,6 +391,7 @@ class LockerViewSet(viewsets.ModelViewSet):
         - Users can only unlock their own active reservations
         - Admins can unlock any locker with valid PIN
         - Cannot unlock if locker is inactive (even with valid PIN)
+        - Served from the unlock cache; a hit runs no database queries
         
         POST /api/lockers/unlock/
         Body: {
@@ -151,59 +406,13 @@ class LockerViewSet(viewsets.ModelViewSet):
         locker_number = serializer.validated_data['locker_number']
         access_pin = serializer.validated_data['access_pin']
 
-        # Find the locker
-        try:
-            locker = Locker.objects.get(locker_number=locker_number)
-        except Locker.DoesNotExist:
-            return Response({
-                'error': 'Locker not found'
-            }, status=status.HTTP_404_NOT_FOUND)
+        # Find the locker and its active reservation
+        entry, _ = unlock_cache.get_entry(locker_number)
+        response_status, body = unlock_cache.check_unlock(entry, locker_number, access_pin, request.user)
+        return Response(body, status=response_status)
 
-        # Check if locker is inactive
-        if locker.status == 'inactive':
-            return Response({
-                'error': 'This locker has been deactivated by admin and is no longer accessible'
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        # Build query based on user role
-        query_params = {
-            'locker': locker,
-            'access_pin': access_pin,
-            'is_active': True,
-            'reserved_until__gte': timezone.now()
-        }
-
-        # Admin can unlock any locker with valid PIN
-        # Regular users can only unlock their own reservations
-        if not request.user.is_staff:
-            query_params['user'] = request.user
-
-        reservation = Reservation.objects.filter(**query_params).first()
 
-        if not reservation:
-            if request.user.is_staff:
-                error_msg = 'Invalid PIN or reservation expired/not found'
-            else:
-                error_msg = 'Invalid PIN, reservation expired, or you do not have access to this locker'
-            
-            return Response({
-                'error': error_msg
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        # Success - locker unlocked
-        return Response({
-            'message': f'Locker {locker_number} unlocked successfully',
-            'locker': LockerSerializer(locker).data,
-            'reservation': {
-                'user': reservation.user.username,
-                'reserved_until': reservation.reserved_until,
-                'accessed_by': request.user.username,
-                'is_admin_access': request.user.is_staff
-            }
-        }, status=status.HTTP_200_OK)
-
-
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Reservation operations
     - List reservations: GET /api/reservations/
@@ -212,10 +421,17 @@ class ReservationViewSet(viewsets.ModelViewSet):
     - Create reservation: POST /api/reservations/
     - Update reservation time (Admin only): PUT/PATCH /api/reservations/<id>/
     - Release reservation: PUT /api/reservations/<id>/release/
+    - Reserve any free locker: POST /api/reservations/allocate/
+    - Archived history: GET /api/reservations/archived/
+    Reads take ?fields=id,reserved_until&expand=locker_details (see fieldsets.py);
+    the locker join is skipped unless locker_details is selected
     """
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
     permission_classes = [IsOwnerOrAdmin]
+    pagination_class = ReservationCursorPagination
+    fast_reader = reservation_reader
+    sparse_columns = ('user_id',)  # IsOwnerOrAdmin
 
     def get_queryset(self):
         """
@@ -223,15 +439,39 @@ class ReservationViewSet(viewsets.ModelViewSet):
         Regular users see only their own reservations
         """
         user = self.request.user
+        # user and locker are rendered for every row, so join them up front
+        queryset = Reservation.objects.select_related('user', 'locker')
         if user.is_staff:
-            return Reservation.objects.all()
-        return Reservation.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user_id=user.id)
+
+    def list(self, request, *args, **kwargs):
+        """
+        List reservations, newest first (cursor-paginated)
+        GET /api/reservations/
+        """
+        return self.paginated_response(self.filter_queryset(self.get_queryset()))
 
     def perform_create(self, serializer):
         """
         Automatically set the user to the current logged-in user
         """
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
+
+    def perform_destroy(self, instance):
+        """
+        Delete a reservation, leaving a tombstone for /api/sync/, and free its locker
+        DELETE /api/reservations/<id>/
+        """
+        # Captured first: delete() clears the primary key
+        payload = reservation_payload(instance)
+        with transaction.atomic():
+            Tombstone.objects.record_reservations(Reservation.objects.filter(pk=instance.pk))
+            instance.delete()
+            # Drops the unlock cache entry and tells event stream clients
+            announce_reservations([payload], 'deleted')
+            if free_lockers([payload['locker_id']]):
+                announce_lockers([payload['locker_id']])
 
     def update(self, request, *args, **kwargs):
         """
@@ -277,6 +517,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
 
                 reservation.reserved_until = dt
                 reservation.save()
+                announce_reservations([reservation], 'updated')
 
                 return Response({
                     'message': f'Reservation updated successfully by admin {request.user.username}',
@@ -303,23 +544,22 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 'error': 'This reservation is already released'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Mark reservation as inactive
-        reservation.is_active = False
-        reservation.save()
-
-        # Update locker status to available (if no other active reservations)
         locker = reservation.locker
-        active_count = Reservation.objects.filter(
-            locker=locker,
-            is_active=True,
-            reserved_until__gte=timezone.now()
-        ).count()
+        with transaction.atomic():
+            # Mark reservation as inactive; the filter makes a concurrent double release a no-op
+            released = Reservation.objects.filter(
+                pk=reservation.pk, is_active=True
+            ).update(is_active=False, updated_at=timezone.now())
+            reservation.is_active = False
 
-        if active_count == 0 and locker.status != 'inactive':
-            locker.status = 'available'
-            locker.save()
+            # Update locker status to available (if no other active reservations)
+            if released and free_lockers([locker.id]):
+                locker.refresh_from_db(fields=['status', 'updated_at'])
+                announce_lockers([locker])
+            if released:
+                announce_reservations([reservation], 'released')
 
-        released_by = 'user' if request.user == reservation.user else 'admin'
+        released_by = 'user' if reservation.user_id == request.user.id else 'admin'
 
         return Response({
             'message': f'Reservation for locker {locker.locker_number} released successfully',
@@ -328,15 +568,76 @@ class ReservationViewSet(viewsets.ModelViewSet):
             'reservation': ReservationSerializer(reservation).data
         }, status=status.HTTP_200_OK)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def allocate(self, request):
+        """
+        Reserve whichever locker is free, instead of picking one from
+        /api/lockers/available/ and racing other users for it
+        - Optionally limited to a site (id) or location (name)
+        - Concurrent callers never wait on or collide with each other (SKIP LOCKED)
+        - 409 when no locker is free
+        POST /api/reservations/allocate/
+        Body: {
+            "reserved_until": "2025-10-22T18:00:00Z",
+            "site": 3
+        }
+        """
+        serializer = ReservationAllocateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        reservation = allocate_locker(
+            request.user.id, data['reserved_until'], site_id=data.get('site'), location=data.get('location')
+        )
+        if reservation is None:
+            return Response({
+                'error': 'No locker is available'
+            }, status=status.HTTP_409_CONFLICT)
+        return Response(ReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'],
+            pagination_class=ActiveReservationCursorPagination)
     def active(self, request):
         """
-        Get only active reservations
+        Get only active reservations (soonest to expire first)
         GET /api/reservations/active/
         """
+        # Validators: last change to any of the caller's reservations or the listed
+        # reservations' lockers (locker_details), + active count
+        base = Reservation.objects.all()
+        if not request.user.is_staff:
+            base = base.filter(user_id=request.user.id)
         queryset = self.get_queryset().filter(is_active=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(base, queryset, self.paginated_response, per_user=True,
+                                     related=('locker',))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Admin-only streaming export of reservation history, oldest first
+        GET /api/reservations/export/?fmt=ndjson|csv
+        Filters: start, end (ISO date/datetime on reserved_at, end exclusive),
+                 locker, user (ids), active (true/false),
+                 archived (true: export the archive table instead)
+        """
+        export_format = request.query_params.get('fmt', 'ndjson')
+        if export_format not in exports.FORMATS:
+            return Response({
+                'error': f'fmt must be one of: {", ".join(exports.FORMATS)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filters = exports.filters_from_params(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        blocks = exports.buffered(exports.export_lines(exports.export_queryset(**filters), export_format))
+        response = StreamingHttpResponse(
+            exports.streaming_content(request, blocks),
+            content_type=exports.FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="reservations.{export_format}"'
+        return response
 
     @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
     def all(self, request):
@@ -344,6 +645,89 @@ class ReservationViewSet(viewsets.ModelViewSet):
         Admin-only endpoint to see ALL reservations
         GET /api/reservations/all/
         """
-        reservations = Reservation.objects.all()
-        serializer = self.get_serializer(reservations, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        reservations = Reservation.objects.select_related('user', 'locker')
+        return self.paginated_response(reservations)
+
+    @action(detail=False, methods=['get'], serializer_class=ArchivedReservationSerializer)
+    def archived(self, request):
+        """
+        Archived history (released reservations moved out by archive_reservations),
+        newest first; admin sees all, users see only their own
+        GET /api/reservations/archived/
+        """
+        reservations = ArchivedReservation.objects.select_related('user', 'locker')
+        if not request.user.is_staff:
+            reservations = reservations.filter(user_id=request.user.id)
+        return self.paginated_response(reservations)
+
+
+async def event_stream(request):
+    """
+    Server-sent event stream of locker and reservation changes (ASGI only)
+    GET /api/events/?token=<access token>
+    (EventSource cannot send headers, so the JWT may come as ?token=;
+    an Authorization: Bearer header works too)
+
+    Events:
+    - locker:      {"id", "locker_number", "location", "status"}
+    - reservation: {"id", "locker", "locker_number", "is_active", "reserved_until", "action"}
+                   (only sent to the reservation owner and to admins)
+    - resync:      the client fell behind; refetch the lists
+    The user's status comes from ClaimsJWTAuthentication (cached, not the token
+    claims): inactive users are rejected, and the stream closes at a heartbeat
+    once the user is deactivated or their staff flag changes. It also closes
+    when the access token expires, so the client reconnects with a fresh one.
+    """
+    raw_token = request.GET.get('token')
+    header = request.headers.get('Authorization', '')
+    if not raw_token and header.startswith('Bearer '):
+        raw_token = header[len('Bearer '):]
+    if not raw_token:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return JsonResponse({'detail': 'Given token not valid for any token type'}, status=401)
+
+    authentication = ClaimsJWTAuthentication()
+    try:
+        user = await authentication.aget_user(token)
+    except (AuthenticationFailed, InvalidToken) as e:
+        return JsonResponse({'detail': str(e.detail)}, status=401)
+    user_id = user.id
+    is_staff = user.is_staff
+    expires_at = token['exp']
+
+    async def still_allowed():
+        # A deactivated or demoted/promoted user must reconnect to get the right events
+        status = await aget_status(authentication.get_user_id(token))
+        return status is not None and status['is_active'] and status['is_staff'] == is_staff
+
+    async def stream():
+        subscription = Subscription(user_id=user_id, is_staff=is_staff)
+        backend = get_backend()
+        backend.subscribe(subscription)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        min(settings.LOCKER_EVENTS_HEARTBEAT, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    if not await still_allowed():
+                        return
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            backend.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
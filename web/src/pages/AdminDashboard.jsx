@@ -1,11 +1,16 @@
 import { useState, useEffect } from 'react';
-import { lockerAPI, reservationAPI } from '../services/api';
+import { lockerAPI, reservationAPI, analyticsAPI, fetchPage } from '../services/api';
 import { FaEdit, FaTrash, FaPlus, FaUsers, FaSync, FaClock, FaCheck, FaTimes } from 'react-icons/fa';
 import PinDisplay from '../components/PinDisplay';
+import { subscribeToEvents } from '../services/events';
 
 const AdminDashboard = () => {
   const [lockers, setLockers] = useState([]);
   const [reservations, setReservations] = useState([]);
+  const [lockersNext, setLockersNext] = useState(null);
+  const [reservationsNext, setReservationsNext] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [analytics, setAnalytics] = useState({ status_counts: [], hourly: [] });
   const [loading, setLoading] = useState(true);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [showEditModal, setShowEditModal] = useState(false);
@@ -26,15 +31,38 @@ const AdminDashboard = () => {
     fetchData();
   }, []);
 
+  // Apply live locker/reservation changes from the event stream
+  useEffect(() => subscribeToEvents({
+    locker: (locker) => {
+      setLockers((items) => (items.some((item) => item.id === locker.id)
+        ? items.map((item) => (item.id === locker.id ? { ...item, ...locker } : item))
+        : [...items, locker]));
+    },
+    reservation: (reservation) => {
+      if (reservation.action === 'created') {
+        refreshReservations();
+        return;
+      }
+      setReservations((items) => items.map((item) => (item.id === reservation.id
+        ? { ...item, is_active: reservation.is_active, reserved_until: reservation.reserved_until }
+        : item)));
+    },
+    resync: () => fetchData(),
+  }), []);
+
   const fetchData = async () => {
     try {
       setLoading(true);
-      const [lockersRes, reservationsRes] = await Promise.all([
+      const [lockersRes, reservationsRes, analyticsRes] = await Promise.all([
         lockerAPI.getAll(),
         reservationAPI.getAll(),
+        analyticsAPI.getUtilization(),
       ]);
-      setLockers(lockersRes.data);
-      setReservations(reservationsRes.data);
+      setAnalytics(analyticsRes.data);
+      setLockers(lockersRes.data.results);
+      setLockersNext(lockersRes.data.next);
+      setReservations(reservationsRes.data.results);
+      setReservationsNext(reservationsRes.data.next);
       setError('');
     } catch (err) {
       setError('Failed to load data');
@@ -44,6 +72,35 @@ const AdminDashboard = () => {
     }
   };
 
+  const refreshReservations = async () => {
+    try {
+      const response = await reservationAPI.getAll();
+      setReservations(response.data.results);
+      setReservationsNext(response.data.next);
+    } catch (err) {
+      console.error('Error:', err);
+    }
+  };
+
+  // Fetch the next page of a cursor-paginated list and append it
+  const loadMore = async (nextUrl, setItems, setNext) => {
+    try {
+      setLoadingMore(true);
+      const response = await fetchPage(nextUrl);
+      // Rows pushed in by live events may already be on screen
+      setItems((items) => {
+        const seen = new Set(items.map((item) => item.id));
+        return [...items, ...response.data.results.filter((item) => !seen.has(item.id))];
+      });
+      setNext(response.data.next);
+    } catch (err) {
+      setError('Failed to load more');
+      console.error('Error:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleCreateLocker = async (e) => {
     e.preventDefault();
     setError('');
@@ -169,6 +226,22 @@ const AdminDashboard = () => {
     return now.toISOString().slice(0, 16);
   };
 
+  // Totals come from the server-side counts, not from the pages loaded so far
+  const countByStatus = (status) => analytics.status_counts
+    .filter((row) => status === undefined || row.status === status)
+    .reduce((total, row) => total + row.count, 0);
+
+  // Per location: current status counts and average utilization over the last 24h
+  const locationStats = Object.values(analytics.status_counts.reduce((byLocation, row) => {
+    const entry = byLocation[row.location] || { location: row.location, counts: {} };
+    entry.counts[row.status] = row.count;
+    return { ...byLocation, [row.location]: entry };
+  }, {})).map((entry) => {
+    const hours = analytics.hourly.filter((row) => row.location === entry.location && row.utilization !== null);
+    const average = hours.length ? hours.reduce((total, row) => total + row.utilization, 0) / 24 : 0;
+    return { ...entry, utilization: average };
+  });
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -204,22 +277,51 @@ const AdminDashboard = () => {
       <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-8">
         <div className="card text-center">
           <p className="text-gray-600">Total Lockers</p>
-          <p className="text-4xl font-bold text-blue-600">{lockers.length}</p>
+          <p className="text-4xl font-bold text-blue-600">{countByStatus()}</p>
         </div>
         <div className="card text-center">
           <p className="text-gray-600">Active Reservations</p>
           <p className="text-4xl font-bold text-green-600">
-            {reservations.filter(r => r.is_active).length}
+            {countByStatus('reserved')}
           </p>
         </div>
         <div className="card text-center">
           <p className="text-gray-600">Available Lockers</p>
           <p className="text-4xl font-bold text-purple-600">
-            {lockers.filter(l => l.status === 'available').length}
+            {countByStatus('available')}
           </p>
         </div>
       </div>
 
+      {/* Utilization by location */}
+      {locationStats.length > 0 && (
+        <div className="card mb-8 overflow-x-auto">
+          <h2 className="text-2xl font-bold mb-4">Utilization by Location (last 24h)</h2>
+          <table className="w-full text-left text-sm">
+            <thead>
+              <tr className="text-gray-600 border-b">
+                <th className="py-2">Location</th>
+                <th className="py-2">Available</th>
+                <th className="py-2">Reserved</th>
+                <th className="py-2">Inactive</th>
+                <th className="py-2">Utilization</th>
+              </tr>
+            </thead>
+            <tbody>
+              {locationStats.map((entry) => (
+                <tr key={entry.location} className="border-b last:border-0">
+                  <td className="py-2 font-semibold">{entry.location}</td>
+                  <td className="py-2">{entry.counts.available || 0}</td>
+                  <td className="py-2">{entry.counts.reserved || 0}</td>
+                  <td className="py-2">{entry.counts.inactive || 0}</td>
+                  <td className="py-2">{(entry.utilization * 100).toFixed(1)}%</td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+      )}
+
       {/* Two Column Layout */}
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-8 mb-8">
         {/* Lockers Section */}
@@ -295,6 +397,15 @@ const AdminDashboard = () => {
                 </div>
               ))
             )}
+            {lockersNext && (
+              <button
+                onClick={() => loadMore(lockersNext, setLockers, setLockersNext)}
+                disabled={loadingMore}
+                className="btn-secondary w-full"
+              >
+                {loadingMore ? 'Loading...' : 'Load more lockers'}
+              </button>
+            )}
           </div>
         </div>
 
@@ -419,6 +530,15 @@ const AdminDashboard = () => {
               </tbody>
             </table>
           )}
+          {reservationsNext && (
+            <button
+              onClick={() => loadMore(reservationsNext, setReservations, setReservationsNext)}
+              disabled={loadingMore}
+              className="btn-secondary w-full mt-4"
+            >
+              {loadingMore ? 'Loading...' : 'Load more reservations'}
+            </button>
+          )}
         </div>
       </div>
 
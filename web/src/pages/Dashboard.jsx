@@ -1,15 +1,19 @@
 import { useState, useEffect } from 'react';
 import { Navigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { lockerAPI, reservationAPI } from '../services/api';
+import { lockerAPI, reservationAPI, fetchPage } from '../services/api';
 import { FaLock, FaUnlock, FaKey, FaClock, FaMapMarkerAlt, FaTrash } from 'react-icons/fa';
 import { format } from 'date-fns';
 import PinDisplay from '../components/PinDisplay';
+import { subscribeToEvents } from '../services/events';
 
 const Dashboard = () => {
   const { isAdmin } = useAuth();
   const [lockers, setLockers] = useState([]);
   const [reservations, setReservations] = useState([]);
+  const [lockersNext, setLockersNext] = useState(null);
+  const [reservationsNext, setReservationsNext] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [showReserveModal, setShowReserveModal] = useState(false);
   const [selectedLocker, setSelectedLocker] = useState(null);
@@ -24,6 +28,29 @@ const Dashboard = () => {
     }
   }, [isAdmin]);
 
+  // Apply live locker/reservation changes instead of re-fetching everything
+  useEffect(() => {
+    if (isAdmin) {
+      return undefined;
+    }
+    return subscribeToEvents({
+      locker: (locker) => {
+        setLockers((items) => {
+          const others = items.filter((item) => item.id !== locker.id);
+          if (locker.status !== 'available') {
+            return others;
+          }
+          const existing = items.find((item) => item.id === locker.id);
+          return existing ? items.map((item) => (item.id === locker.id ? { ...item, ...locker } : item))
+            : [...items, locker];
+        });
+      },
+      // Only our own reservations are pushed; reload them to pick up PINs and details
+      reservation: () => refreshReservations(),
+      resync: () => fetchData(),
+    });
+  }, [isAdmin]);
+
   if (isAdmin) {
     return <Navigate to="/admin" />;
   }
@@ -35,8 +62,10 @@ const Dashboard = () => {
         lockerAPI.getAvailable(),
         reservationAPI.getActive(),
       ]);
-      setLockers(lockersRes.data);
-      setReservations(reservationsRes.data);
+      setLockers(lockersRes.data.results);
+      setLockersNext(lockersRes.data.next);
+      setReservations(reservationsRes.data.results);
+      setReservationsNext(reservationsRes.data.next);
       setError('');
     } catch (err) {
       setError('Failed to load data');
@@ -46,6 +75,35 @@ const Dashboard = () => {
     }
   };
 
+  const refreshReservations = async () => {
+    try {
+      const response = await reservationAPI.getActive();
+      setReservations(response.data.results);
+      setReservationsNext(response.data.next);
+    } catch (err) {
+      console.error('Error fetching reservations:', err);
+    }
+  };
+
+  // Fetch the next page of a cursor-paginated list and append it
+  const loadMore = async (nextUrl, setItems, setNext) => {
+    try {
+      setLoadingMore(true);
+      const response = await fetchPage(nextUrl);
+      // Rows pushed in by live events may already be on screen
+      setItems((items) => {
+        const seen = new Set(items.map((item) => item.id));
+        return [...items, ...response.data.results.filter((item) => !seen.has(item.id))];
+      });
+      setNext(response.data.next);
+    } catch (err) {
+      setError('Failed to load more');
+      console.error('Error fetching page:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleReserve = async (e) => {
     e.preventDefault();
     setError('');
@@ -170,7 +228,7 @@ const Dashboard = () => {
             <FaUnlock className="text-green-600 text-2xl" />
             <h2 className="text-2xl font-bold text-gray-900">Available Lockers</h2>
             <span className="bg-green-100 text-green-800 px-3 py-1 rounded-full text-sm font-semibold">
-              {lockers.length}
+              {lockers.length}{lockersNext && '+'}
             </span>
           </div>
 
@@ -215,6 +273,15 @@ const Dashboard = () => {
                   </div>
                 </div>
               ))}
+              {lockersNext && (
+                <button
+                  onClick={() => loadMore(lockersNext, setLockers, setLockersNext)}
+                  disabled={loadingMore}
+                  className="btn-secondary w-full"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more lockers'}
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -225,7 +292,7 @@ const Dashboard = () => {
             <FaClock className="text-blue-600 text-2xl" />
             <h2 className="text-2xl font-bold text-gray-900">My Reservations</h2>
             <span className="bg-blue-100 text-blue-800 px-3 py-1 rounded-full text-sm font-semibold">
-              {reservations.length}
+              {reservations.length}{reservationsNext && '+'}
             </span>
           </div>
 
@@ -292,6 +359,15 @@ const Dashboard = () => {
                   </div>
                 </div>
               ))}
+              {reservationsNext && (
+                <button
+                  onClick={() => loadMore(reservationsNext, setReservations, setReservationsNext)}
+                  disabled={loadingMore}
+                  className="btn-secondary w-full"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more reservations'}
+                </button>
+              )}
             </div>
           )}
         </div>
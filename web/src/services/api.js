@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = 'http://127.0.0.1:8000/api';
+export const API_BASE_URL = 'http://127.0.0.1:8000/api';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -65,23 +65,35 @@ export const authAPI = {
 // Locker endpoints
 export const lockerAPI = {
   getAll: (params) => api.get('/lockers/', { params }),
-  getAvailable: () => api.get('/lockers/available/'),
+  getAvailable: (params) => api.get('/lockers/available/', { params }),
   getById: (id) => api.get(`/lockers/${id}/`),
   create: (data) => api.post('/lockers/', data),
   update: (id, data) => api.put(`/lockers/${id}/`, data),
   delete: (id) => api.delete(`/lockers/${id}/`),
   reactivate: (id) => api.post(`/lockers/${id}/reactivate/`),
   unlock: (data) => api.post('/lockers/unlock/', data),
+  // data: { location } or { ids }
+  bulkDeactivate: (data) => api.post('/lockers/bulk/deactivate/', data),
+  bulkReactivate: (data) => api.post('/lockers/bulk/reactivate/', data),
 };
 
 // Reservation endpoints
 export const reservationAPI = {
-  getAll: () => api.get('/reservations/'),
-  getActive: () => api.get('/reservations/active/'),
+  getAll: (params) => api.get('/reservations/', { params }),
+  getActive: (params) => api.get('/reservations/active/', { params }),
   getById: (id) => api.get(`/reservations/${id}/`),
   create: (data) => api.post('/reservations/', data),
   update: (id, data) => api.patch(`/reservations/${id}/`, data),
   release: (id) => api.put(`/reservations/${id}/release/`),
 };
 
+// Admin analytics (hourly rollups; defaults to the last 24 hours)
+export const analyticsAPI = {
+  getUtilization: (params) => api.get('/analytics/utilization/', { params }),
+};
+
+// List endpoints are cursor-paginated ({ next, previous, results }).
+// Pass the `next` URL of a page to fetch the one after it.
+export const fetchPage = (url) => api.get(url);
+
 export default api;
\ No newline at end of file
@@ -0,0 +1,56 @@
+import { jwtDecode } from 'jwt-decode';
+import { API_BASE_URL, authAPI } from './api';
+
+const RECONNECT_DELAY_MS = 5000;
+
+// Make sure the stored access token is still valid for a while, refreshing it if needed
+const freshAccessToken = async () => {
+  const token = localStorage.getItem('access_token');
+  try {
+    if (token && jwtDecode(token).exp * 1000 > Date.now() + 30000) {
+      return token;
+    }
+    const response = await authAPI.refresh(localStorage.getItem('refresh_token'));
+    localStorage.setItem('access_token', response.data.access);
+    return response.data.access;
+  } catch (error) {
+    return null;
+  }
+};
+
+// Subscribe to the server-sent event stream (GET /api/events/).
+// handlers: { locker, reservation, resync } callbacks receiving the parsed event data.
+// Returns a function that closes the stream.
+export const subscribeToEvents = (handlers) => {
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const connect = async () => {
+    const token = await freshAccessToken();
+    if (closed || !token) {
+      return;
+    }
+    source = new EventSource(`${API_BASE_URL}/events/?token=${encodeURIComponent(token)}`);
+    Object.entries(handlers).forEach(([name, handler]) => {
+      source.addEventListener(name, (event) => handler(JSON.parse(event.data)));
+    });
+    // The server ends the stream when the token expires; reconnect with a fresh one
+    source.onerror = () => {
+      source.close();
+      if (!closed) {
+        retryTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+      }
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) {
+      source.close();
+    }
+  };
+};